@@ -0,0 +1,199 @@
+"""
+比较两种图片摆放方式：enumerate（按 15 个候选宽高比穷举）与 analytic（解析求解最接近正方形的可行宽高比，
+放不下时解析求出能放下的最大尺寸，只有连缩小也放不下时才退回穷举）。
+
+1. 逐个搜索比较：记录六个模板排版时的每次单图/双图搜索，分别统计
+   两种方式是否放得下、选中的位置（a/b、comb1-4）和宽高比是否相同、每个 KG 检查的候选数和耗时，
+   以及放不下时 analytic 缩小后保留的面积比例。
+2. 整体布局比较：同一份数据用两种方式排版，统计 placement_type 不同的 KG 比例和每个布局的耗时。
+
+用法：
+
+    python benchmarks/bench_analytic_placement.py [--variants 10] [--repeat 5]
+"""
+import argparse
+import copy
+import json
+import os
+import statistics
+import sys
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_layout_cache import SIZES, variants  # noqa: E402
+from bench_placement import record_searches, timed  # noqa: E402
+
+
+@contextmanager
+def count_checks():
+    """
+    统计解析求解（含缩小）求出的候选数：双图为解出宽高比的分支数，单图为交给打分函数检查的候选数。
+    不含退回穷举，退回部分由 compare_searches 另行计入。
+    """
+    import placement
+
+    solve = placement._solve_branch
+    scorers = dict(placement._SCALAR_PLACEMENTS)
+    counter = {"checks": 0}
+
+    def counted(*args, **kwargs):
+        ratios = solve(*args, **kwargs)
+        counter["checks"] += ratios is not None
+        return ratios
+
+    def counted_scorer(scorer):
+        def run(*args):
+            counter["checks"] += 1
+            return scorer(*args)
+        return run
+
+    placement._solve_branch = counted
+    placement._SCALAR_PLACEMENTS.update((key, counted_scorer(scorer)) for key, scorer in scorers.items())
+    try:
+        yield counter
+    finally:
+        placement._solve_branch = solve
+        placement._SCALAR_PLACEMENTS.update(scorers)
+
+
+def kept_area(result, areas) -> float:
+    """缩小后的图片总面积占原面积的比例。"""
+    boxes = result[:len(areas)]
+    return sum((box[3][0] - box[0][0]) * (box[3][1] - box[0][1]) for box in boxes) / sum(areas)
+
+
+def compare_searches(cases, enumerate_search, analytic_search, largest_search, mode_search, candidates,
+                     repeat) -> dict:
+    """
+    单图或双图搜索的逐个比较。
+    参数：
+        enumerate_search: 穷举搜索
+        analytic_search: 只做解析求解，放不下时返回 None
+        largest_search: 放不下时解析求出能放下的最大尺寸，连缩小也放不下时返回 None
+        mode_search: analytic 模式下实际使用的搜索（解析求解、缩小，最后才退回穷举），用于计时
+        candidates: 穷举时每个位置/组合的候选数
+    """
+    stats = {"searches": len(cases), "enum_fit": 0, "analytic_fit": 0, "only_enum": 0, "only_analytic": 0,
+             "same_place": 0, "same_ratio": 0, "enum_checks": 0, "analytic_checks": 0, "shrunk": 0,
+             "fallback": 0, "kept_area": [], "enum_time": 0.0, "analytic_time": 0.0}
+    for case in cases:
+        expected = enumerate_search(*case)
+        with count_checks() as counter:
+            actual = analytic_search(*case)
+            shrunk = largest_search(*case) if actual is None else None
+        stats["analytic_checks"] += counter["checks"]
+        fit_expected, fit_actual = expected[-1] == 0, actual is not None
+        stats["enum_fit"] += fit_expected
+        stats["analytic_fit"] += fit_actual
+        stats["only_enum"] += fit_expected and not fit_actual
+        stats["only_analytic"] += fit_actual and not fit_expected
+        # 穷举检查到第一个放得下的位置/组合为止
+        enum_checks = candidates * (expected[-2] + 1 if fit_expected else len(case[-1]))
+        stats["enum_checks"] += enum_checks
+        if shrunk is not None:
+            stats["shrunk"] += 1
+            stats["kept_area"].append(kept_area(shrunk, case[:-2]))
+        elif not fit_actual:
+            # 连缩小也放不下时 analytic 模式退回同样的穷举
+            stats["fallback"] += 1
+            stats["analytic_checks"] += enum_checks
+        if fit_expected and fit_actual:
+            stats["same_place"] += expected[-2] == actual[-2]
+            stats["same_ratio"] += expected == actual
+        stats["enum_time"] += timed(lambda: enumerate_search(*case), repeat)
+        stats["analytic_time"] += timed(lambda: mode_search(*case), repeat)
+    return stats
+
+
+def compare_layouts(samples, repeat):
+    """两种方式下完整布局的 placement_type 差异和耗时。"""
+    from layouts import LAYOUT_MODULES, engine
+    from placement import PLACEMENT_ANALYTIC, PLACEMENT_ENUMERATE, use_placement
+
+    rows = []
+    for type in LAYOUT_MODULES:
+        module = engine(type)
+        kgs = differ = 0
+        times = {PLACEMENT_ENUMERATE: 0.0, PLACEMENT_ANALYTIC: 0.0}
+        layouts = 0
+        for sample in samples:
+            for W, H in SIZES:
+                results = {}
+                for mode in times:
+                    with use_placement(mode):
+                        try:
+                            results[mode] = module.raw_layout_poster(copy.deepcopy(sample), W, H)
+                        except ValueError:
+                            break
+                        times[mode] += timed(lambda: module.raw_layout_poster(copy.deepcopy(sample), W, H), repeat)
+                if len(results) < len(times):
+                    continue
+                layouts += 1
+                expected, actual = results[PLACEMENT_ENUMERATE], results[PLACEMENT_ANALYTIC]
+                for VG_key, vg in expected.items():
+                    if not VG_key.startswith("VG"):
+                        continue
+                    for KG_key, kg in vg.items():
+                        if KG_key.startswith("KG") and kg["placement_type"] not in (None, "none"):
+                            kgs += 1
+                            differ += kg["placement_type"] != actual[VG_key][KG_key]["placement_type"]
+        n = max(layouts, 1)
+        rows.append((type, kgs, differ, times[PLACEMENT_ENUMERATE] / n * 1000, times[PLACEMENT_ANALYTIC] / n * 1000))
+    return rows
+
+
+def main():
+    from placement import (PLACEMENT_ANALYTIC, PLACEMENTS, analytic_pair_placement, analytic_single_placement,
+                           best_pair_placement, best_single_placement, enumerate_pair_placement,
+                           enumerate_single_placement, largest_pair_placement, largest_single_placement,
+                           use_placement)
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=os.path.join(ROOT, "result.json"))
+    parser.add_argument("--variants", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.data, encoding="utf-8") as file:
+        data = json.load(file)
+    samples = list(variants(data, args.variants))
+    singles, pairs = record_searches(samples)
+    singles = [(A, g, PLACEMENTS) for A, g in singles]
+
+    def in_analytic_mode(search):
+        def run(*case):
+            with use_placement(PLACEMENT_ANALYTIC):
+                return search(*case)
+        return run
+
+    rows = [
+        ("单图 (2x15)", compare_searches(singles, enumerate_single_placement, analytic_single_placement,
+                                        largest_single_placement, in_analytic_mode(best_single_placement),
+                                        15, args.repeat)),
+        ("双图 (4x225)", compare_searches(pairs, enumerate_pair_placement, analytic_pair_placement,
+                                         largest_pair_placement, in_analytic_mode(best_pair_placement),
+                                         225, args.repeat)),
+    ]
+    print("逐个搜索：")
+    for label, s in rows:
+        n = max(s["searches"], 1)
+        both = max(s["enum_fit"] - s["only_enum"], 1)
+        print(f"  {label}  搜索 {s['searches']}，穷举放得下 {s['enum_fit']}，解析放得下 {s['analytic_fit']}"
+              f"（仅穷举 {s['only_enum']}，仅解析 {s['only_analytic']}）")
+        print(f"    两者都放得下时：位置相同 {s['same_place'] / both:.1%}，宽高比也相同 {s['same_ratio'] / both:.1%}")
+        kept = statistics.median(s["kept_area"]) if s["kept_area"] else 0.0
+        print(f"    放不下时：解析缩小 {s['shrunk']}（保留面积中位数 {kept:.1%}），退回穷举 {s['fallback']}")
+        print(f"    每个 KG 检查候选：穷举 {s['enum_checks'] / n:.1f}，解析 {s['analytic_checks'] / n:.2f}；"
+              f"耗时：穷举 {s['enum_time'] / n * 1e6:.1f} µs，解析 {s['analytic_time'] / n * 1e6:.1f} µs")
+
+    print("整体布局：")
+    print(f"  {'模板':<15}{'KG 数':>8}{'placement_type 不同':>22}{'穷举 ms':>10}{'解析 ms':>10}")
+    for type, kgs, differ, enum_ms, analytic_ms in compare_layouts(samples, args.repeat):
+        print(f"  {type:<15}{kgs:>8}{differ:>12} ({differ / max(kgs, 1):6.1%}){enum_ms:>10.2f}{analytic_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
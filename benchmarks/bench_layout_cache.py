@@ -0,0 +1,129 @@
+"""
+检查布局缓存的缩放复用是否与重新计算一致，并比较三种路径的耗时：
+未命中（完整求解）、尺寸完全相同的命中、同宽高比不同尺寸的缩放命中。
+
+对每个模板和每组数据，先在参考尺寸下计算一次，再对若干缩放倍数分别比较
+"经缓存得到的结果" 与 "直接调用引擎重新计算的结果"：结构（键、None、placement_type）和坐标都要相同，
+坐标允许的相对误差（相对画布尺寸）为 --tolerance。
+
+--scale exact（默认）下只有 2 的整数次幂倍数走缩放，其余倍数重新计算，结果必须与重新计算逐位相同，
+有任何不一致时以退出码 1 结束。--scale any 下所有倍数都走缩放，只统计不一致的比例：
+这些不一致来自引擎在面积相等的候选位置之间按浮点末位取舍，缩放后取舍可能不同。
+
+用法：
+
+    python benchmarks/bench_layout_cache.py [--scale exact|any] [--variants 10] [--tolerance 0]
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SIZES = [(1000, 1000), (1920, 1080), (1080, 1920), (800, 2400)]
+FACTORS = [0.25, 0.5, 0.75, 1.3, 2.0, 3.7, 4.0]
+MARGINS = [(0, 0), (10, 5)]
+
+
+def variants(data: dict, count: int):
+    """result.json 本身，以及从其中的 KG 随机组合出的 1-10 个 VG 的数据。"""
+    yield data
+    rnd = random.Random(0)
+    knowledges = [kg for vg in data["data"] for kg in vg["knowledges"]]
+    for _ in range(count):
+        vgs = []
+        for i in range(rnd.randint(1, 10)):
+            vg = copy.deepcopy(data["data"][i % len(data["data"])])
+            vg["subtask_title"] = f"{vg['subtask_title']} {i}"
+            vg["knowledges"] = [copy.deepcopy(rnd.choice(knowledges)) for _ in range(rnd.randint(1, 4))]
+            for kg in vg["knowledges"]:
+                if rnd.random() < 0.25:
+                    kg["icon_keyword"] = ""
+                if rnd.random() < 0.3:
+                    kg["visualization"]["is_visualization"] = not kg["visualization"]["is_visualization"]
+            vgs.append(vg)
+        yield {"title": data["title"], "data": vgs}
+
+
+def compare(scaled, expected, scale: float) -> tuple[bool, float]:
+    """返回 (结构是否一致, 坐标最大相对误差)。"""
+    if isinstance(scaled, dict):
+        if not isinstance(expected, dict) or scaled.keys() != expected.keys():
+            return False, 0.0
+        results = [compare(scaled[key], expected[key], scale) for key in scaled]
+    elif isinstance(scaled, list):
+        if not isinstance(expected, list) or len(scaled) != len(expected):
+            return False, 0.0
+        results = [compare(a, b, scale) for a, b in zip(scaled, expected)]
+    elif isinstance(scaled, (int, float)) and isinstance(expected, (int, float)):
+        return True, abs(scaled - expected) / scale
+    else:
+        return scaled == expected, 0.0
+    return all(ok for ok, _ in results), max((error for _, error in results), default=0.0)
+
+
+def main():
+    from layout_cache import SCALE_ANY, SCALE_EXACT, LayoutCache, is_power_of_two_ratio
+    from layouts import LAYOUT_MODULES, engine, layout_poster
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=os.path.join(ROOT, "result.json"))
+    parser.add_argument("--scale", default=SCALE_EXACT, choices=[SCALE_EXACT, SCALE_ANY])
+    parser.add_argument("--variants", type=int, default=10)
+    parser.add_argument("--tolerance", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with open(args.data, encoding="utf-8") as file:
+        data = json.load(file)
+    samples = list(variants(data, args.variants))
+
+    times = {"miss": [], "exact": [], "scaled": []}
+    checked = mismatched = 0
+    worst = 0.0
+    for type in LAYOUT_MODULES:
+        module = engine(type)
+        type_mismatched = 0
+        for sample in samples:
+            for W, H in SIZES:
+                for margin, vertical_margin in MARGINS:
+                    cache = LayoutCache(scale=args.scale)
+                    start = time.perf_counter()
+                    try:
+                        layout_poster(type, sample, W, H, margin, vertical_margin, cache=cache)
+                    except ValueError:
+                        continue
+                    times["miss"].append(time.perf_counter() - start)
+                    start = time.perf_counter()
+                    layout_poster(type, sample, W, H, margin, vertical_margin, cache=cache)
+                    times["exact"].append(time.perf_counter() - start)
+
+                    for factor in FACTORS:
+                        size = (W * factor, H * factor, margin * factor, vertical_margin * factor)
+                        start = time.perf_counter()
+                        scaled = layout_poster(type, sample, *size, cache=cache)
+                        if args.scale == SCALE_ANY or is_power_of_two_ratio(size[0], W):
+                            times["scaled"].append(time.perf_counter() - start)
+                        expected = module.layout_poster(copy.deepcopy(sample), *size)
+                        same, error = compare(scaled, expected, max(size[0], size[1]))
+                        checked += 1
+                        worst = max(worst, error)
+                        if not same or error > args.tolerance:
+                            type_mismatched += 1
+                            print(f"不一致：{type} {W}x{H} margins={margin},{vertical_margin} x{factor} "
+                                  f"结构{'相同' if same else '不同'} 相对误差 {error:.3g}")
+        mismatched += type_mismatched
+        print(f"{type:<15}不一致 {type_mismatched}")
+
+    print(f"共比较 {checked} 个缩放结果，不一致 {mismatched}，最大相对误差 {worst:.3g}")
+    for name, values in times.items():
+        print(f"{name:<8}{len(values):>6} 次  平均 {sum(values) / len(values) * 1000:8.3f} ms")
+    sys.exit(1 if mismatched and args.scale == SCALE_EXACT else 0)
+
+
+if __name__ == "__main__":
+    main()
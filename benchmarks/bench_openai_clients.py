@@ -0,0 +1,159 @@
+"""
+对比"每个请求新建 OpenAI client"与"共享连接池 client"的延迟和 TLS 握手次数。
+
+在本地启动一个 HTTPS 假服务（自签名证书，HTTP/1.1 keep-alive）模拟 /v1/chat/completions，
+不访问外网。用法：
+
+    python benchmarks/bench_openai_clients.py --requests 200
+"""
+import argparse
+import datetime
+import json
+import os
+import socket
+import ssl
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from openai import DefaultHttpxClient, OpenAI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from clients import ClientSettings  # noqa: E402
+
+COMPLETION = {
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+def write_self_signed_cert(directory: str) -> tuple[str, str]:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName("localhost")]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as file:
+        file.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as file:
+        file.write(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+    return cert_path, key_path
+
+
+class CompletionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps(COMPLETION).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CountingHTTPSServer(ThreadingHTTPServer):
+    """记录接受的连接数，每个新连接对应一次 TLS 握手。"""
+
+    daemon_threads = True
+
+    def __init__(self, address, handler, context: ssl.SSLContext):
+        super().__init__(address, handler)
+        self.context = context
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def get_request(self):
+        sock, addr = self.socket.accept()
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self._lock:
+            self.connections += 1
+        return self.context.wrap_socket(sock, server_side=True), addr
+
+
+def make_client(base_url: str, cert_path: str, settings: ClientSettings) -> OpenAI:
+    http_client = DefaultHttpxClient(limits=settings.limits(), timeout=settings.timeout, verify=cert_path)
+    return OpenAI(api_key="bench", base_url=base_url, http_client=http_client, max_retries=0)
+
+
+def call(client: OpenAI):
+    client.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": "ping"}])
+
+
+def run(label: str, server: CountingHTTPSServer, requests: int, per_call):
+    server.connections = 0
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        per_call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(
+        f"{label:<22} mean {statistics.mean(latencies):7.2f} ms   "
+        f"p50 {latencies[len(latencies) // 2]:7.2f} ms   "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1]:7.2f} ms   "
+        f"TLS 握手 {server.connections}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert_path, key_path = write_self_signed_cert(directory)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_path, key_path)
+        server = CountingHTTPSServer(("127.0.0.1", 0), CompletionHandler, context)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"https://localhost:{server.server_address[1]}/v1"
+        settings = ClientSettings()
+
+        def per_request_client():
+            client = make_client(base_url, cert_path, settings)
+            try:
+                call(client)
+            finally:
+                client.close()
+
+        shared = make_client(base_url, cert_path, settings)
+        call(shared)  # 预热，建立第一条连接
+        print(f"{args.requests} 次 chat.completions.create 请求（本地 HTTPS 假服务）")
+        run("每个请求新建 client", server, args.requests, per_request_client)
+        run("共享连接池 client", server, args.requests, lambda: call(shared))
+        shared.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+比较三种 PDF 文本提取后端（pypdf2 / pdfplumber / pypdfium2）在 uploads/ 下全部 PDF 上的表现：
+页数/秒、峰值 RSS 和提取出的文本大小。每个后端在独立子进程中运行，峰值 RSS 互不影响。
+
+用法：
+
+    python benchmarks/bench_pdf_backends.py [--dir uploads] [--backends pypdf2 pypdfium2]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def unique_pdfs(directory: str) -> list[str]:
+    """按内容去重，同一份 PDF 只统计一次。"""
+    seen, paths = set(), []
+    for path in sorted(glob.glob(os.path.join(directory, "**", "*.pdf"), recursive=True)):
+        with open(path, "rb") as file:
+            digest = hashlib.sha256(file.read()).hexdigest()
+        if digest not in seen:
+            seen.add(digest)
+            paths.append(path)
+    return paths
+
+
+def run_backend(backend: str, paths: list[str]) -> dict:
+    """在当前进程中用指定后端逐页提取所有 PDF（不使用进程池）。"""
+    from pdf_extract import iter_page_texts
+
+    pages = chars = failed = 0
+    start = time.perf_counter()
+    for path in paths:
+        try:
+            for text in iter_page_texts(path, backend):
+                pages += 1
+                chars += len(text)
+        except Exception as e:
+            failed += 1
+            print(f"{backend} 提取 {path} 失败：{e}", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    return {
+        "backend": backend,
+        "files": len(paths),
+        "failed": failed,
+        "pages": pages,
+        "seconds": elapsed,
+        "pages_per_sec": pages / elapsed if elapsed else 0.0,
+        "chars": chars,
+        # Linux 上 ru_maxrss 单位为 KB
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    from pdf_extract import BACKENDS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=os.path.join(ROOT, "uploads"))
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    paths = unique_pdfs(args.dir)
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, paths)))
+        return
+
+    print(f"{len(paths)} 个 PDF（按内容去重）来自 {args.dir}")
+    print(f"{'backend':<12}{'pages':>7}{'seconds':>10}{'pages/s':>10}{'peak RSS MB':>13}{'chars':>11}{'failed':>8}")
+    for backend in args.backends:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--dir", args.dir, "--worker", backend],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{r['backend']:<12}{r['pages']:>7}{r['seconds']:>10.2f}{r['pages_per_sec']:>10.1f}"
+            f"{r['peak_rss_mb']:>13.1f}{r['chars']:>11}{r['failed']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+比较图片摆放搜索的两种实现：原先逐个候选调用闭包的顺序搜索（此处保留为参照实现），
+与 placement.py 中的实现（双图按组合一次性广播计算全部候选；单图只有 2x15 个候选，仍是纯 Python 循环）。
+
+先运行六个布局引擎，记录每个 KG 的几何参数和图片面积，然后对每个 KG 分别用两种实现求解：
+检查选出的位置、比例、组合和 overflow 完全一致，并报告每个 KG 的平均耗时与加速比。
+有任何不一致时以退出码 1 结束。
+
+用法：
+
+    python benchmarks/bench_placement.py [--variants 10] [--repeat 20]
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+from math import sqrt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_layout_cache import SIZES, variants  # noqa: E402
+
+
+def reference_single(A_img, g):
+    """原先的 try_placement_a/b 顺序搜索。"""
+    from placement import ASPECT_RATIOS
+
+    kg_x, kg_width, y_KG, h_KG, w_highlight, h_highlight = (
+        g.kg_x, g.kg_width, g.y_KG, g.h_KG, g.w_highlight, g.h_highlight)
+
+    def try_placement_a(r):
+        w_img = sqrt(A_img * r)
+        h_img = sqrt(A_img / r)
+        x1 = kg_x + kg_width - w_img
+        y1 = y_KG
+        x2 = kg_x + kg_width
+        y2 = y_KG + h_img
+        overflow_area = 0
+        if y2 > y_KG + h_KG:
+            overflow_area += (y2 - (y_KG + h_KG)) * w_img
+        if x1 < kg_x + w_highlight:
+            overflow_area += (min(x2, kg_x + w_highlight) - x1) * h_img if x2 > kg_x + w_highlight else w_img * h_img
+        return [[x1, y1], [x2, y1], [x1, y2], [x2, y2]], overflow_area
+
+    def try_placement_b(r):
+        w_img = sqrt(A_img * r)
+        h_img = sqrt(A_img / r)
+        x1 = kg_x
+        y1 = y_KG + h_highlight
+        x2 = kg_x + w_img
+        y2 = y_KG + h_highlight + h_img
+        overflow_area = 0
+        if y2 > y_KG + h_KG:
+            overflow_area += (y2 - (y_KG + h_KG)) * w_img
+        if x2 > kg_x + kg_width:
+            overflow_area += (x2 - (kg_x + kg_width)) * h_img
+        return [[x1, y1], [x2, y1], [x1, y2], [x2, y2]], overflow_area
+
+    min_overflow, best = float("inf"), None
+    for idx, placement in enumerate([try_placement_a, try_placement_b]):
+        for r in ASPECT_RATIOS:
+            coords, overflow = placement(r)
+            if overflow == 0:
+                return coords, r, idx, 0
+            if overflow < min_overflow:
+                min_overflow, best = overflow, (coords, r, idx, overflow)
+    return best
+
+
+def reference_pair(A_icon, A_vis, g, comb2_image_overlap=True, comb4_clamp_b=False, comb4_image_overlap=False):
+    """原先的 try_combination_1..4 顺序搜索；参数对应 star / grid_protrait 中的变体。"""
+    from placement import ASPECT_RATIOS
+
+    kg_x, kg_width, y_KG, h_KG, w_highlight, h_highlight = (
+        g.kg_x, g.kg_width, g.y_KG, g.h_KG, g.w_highlight, g.h_highlight)
+
+    def highlight_overlap(x1, y1, x2, w, h, h_limit):
+        if x1 < kg_x + w_highlight and y1 < y_KG + h_highlight:
+            return (min(x2, kg_x + w_highlight) - x1) * min(h, h_limit) if x2 > kg_x + w_highlight else w * min(h, h_limit)
+        return None
+
+    def combination(idx, r_a, r_b):
+        w_a = sqrt(A_icon * r_a)
+        h_a = sqrt(A_icon / r_a)
+        w_b = sqrt(A_vis * r_b)
+        h_b = sqrt(A_vis / r_b)
+        terms = []
+        if idx == 0:
+            x1_a, y1_a, x2_a, y2_a = kg_x + kg_width - w_a, y_KG, kg_x + kg_width, y_KG + h_a
+            x1_b, y1_b, x2_b, y2_b = kg_x + kg_width - w_a - w_b, y_KG, kg_x + kg_width - w_a, y_KG + h_b
+            terms += [(y2_a - (y_KG + h_KG)) * w_a if y2_a > y_KG + h_KG else None,
+                      (y2_b - (y_KG + h_KG)) * w_b if y2_b > y_KG + h_KG else None,
+                      highlight_overlap(x1_a, y1_a, x2_a, w_a, h_a, h_highlight),
+                      highlight_overlap(x1_b, y1_b, x2_b, w_b, h_b, h_highlight)]
+        elif idx == 1:
+            x1_a, y1_a, x2_a, y2_a = kg_x + kg_width - w_a, y_KG, kg_x + kg_width, y_KG + h_a
+            x1_b, y1_b, x2_b, y2_b = kg_x, y_KG + h_highlight, kg_x + w_b, y_KG + h_highlight + h_b
+            terms += [(y2_a - (y_KG + h_KG)) * w_a if y2_a > y_KG + h_KG else None,
+                      (y2_b - (y_KG + h_KG)) * w_b if y2_b > y_KG + h_KG else None,
+                      highlight_overlap(x1_a, y1_a, x2_a, w_a, h_a, h_highlight),
+                      (x2_b - (kg_x + kg_width)) * h_b if x2_b > kg_x + kg_width else None]
+            if comb2_image_overlap and x2_b > x1_a and y1_b < y2_a:
+                terms.append((min(x2_b, x2_a) - x1_a) * (min(y2_a, y2_b) - y1_b))
+        elif idx == 2:
+            x1_a, y1_a, x2_a, y2_a = kg_x + kg_width - w_a, y_KG, kg_x + kg_width, y_KG + h_a
+            x1_b, y1_b, x2_b, y2_b = kg_x + kg_width - w_b, y_KG + h_a, kg_x + kg_width, y_KG + h_a + h_b
+            terms += [(y2_a - (y_KG + h_KG)) * w_a if y2_a > y_KG + h_KG else None,
+                      (y2_b - (y_KG + h_KG)) * w_b if y2_b > y_KG + h_KG else None,
+                      highlight_overlap(x1_a, y1_a, x2_a, w_a, h_a, h_highlight),
+                      highlight_overlap(x1_b, y1_b, x2_b, w_b, h_b, h_highlight - (y1_b - y_KG))]
+        else:
+            x1_a, y1_a, x2_a, y2_a = kg_x, y_KG + h_highlight, kg_x + w_a, y_KG + h_highlight + h_a
+            x1_b, y1_b, x2_b, y2_b = kg_x + kg_width - w_b, y_KG + h_KG - h_b, kg_x + kg_width, y_KG + h_KG
+            terms += [(y2_a - (y_KG + h_KG)) * w_a if y2_a > y_KG + h_KG else None,
+                      (x2_a - (kg_x + kg_width)) * h_a if x2_a > kg_x + kg_width else None]
+            if comb4_clamp_b:
+                terms += [(kg_x - x1_b) * h_b if x1_b < kg_x else None,
+                          (y_KG - y1_b) * w_b if y1_b < y_KG else None]
+            else:
+                terms.append((y2_b - (y_KG + h_KG)) * w_b if y2_b > y_KG + h_KG else None)
+            terms.append(highlight_overlap(x1_b, y1_b, x2_b, w_b, h_b, h_highlight - (y1_b - y_KG)))
+            if comb4_image_overlap and x2_a > x1_b and y2_a > y1_b:
+                terms.append((min(x2_a, x2_b) - x1_b) * (min(y2_a, y2_b) - y1_b))
+        overflow_area = 0
+        for term in terms:
+            if term is not None:
+                overflow_area += term
+        coords_a = [[x1_a, y1_a], [x2_a, y1_a], [x1_a, y2_a], [x2_a, y2_a]]
+        coords_b = [[x1_b, y1_b], [x2_b, y1_b], [x1_b, y2_b], [x2_b, y2_b]]
+        return coords_a, coords_b, overflow_area
+
+    min_overflow, best = float("inf"), None
+    for idx in range(4):
+        for r_a in ASPECT_RATIOS:
+            for r_b in ASPECT_RATIOS:
+                coords_a, coords_b, overflow = combination(idx, r_a, r_b)
+                if overflow == 0:
+                    return coords_a, coords_b, r_a, r_b, idx, 0
+                if overflow < min_overflow:
+                    min_overflow, best = overflow, (coords_a, coords_b, r_a, r_b, idx, overflow)
+    return best
+
+
+# 各模板使用的组合变体，对应 reference_pair 的参数
+REFERENCE_VARIANTS = {
+    "combination_2_no_image_overlap": {"comb2_image_overlap": False},
+    "combination_4_clamped": {"comb4_clamp_b": True},
+    "combination_4_clamped_image_overlap": {"comb4_clamp_b": True, "comb4_image_overlap": True},
+}
+
+
+def record_searches(samples) -> tuple[list, list]:
+    """运行全部模板，记录每次单图/双图搜索的参数。"""
+    import layout_kernel
+    import placement
+    from layouts import LAYOUT_MODULES, engine
+
+    singles, pairs = [], []
+    originals = placement.best_single_placement, placement.best_pair_placement
+
+    def single(A_img, g, placements=placement.PLACEMENTS):
+        singles.append((A_img, g))
+        return originals[0](A_img, g, placements)
+
+    def pair(A_icon, A_vis, g, combinations=placement.COMBINATIONS):
+        pairs.append((A_icon, A_vis, g, combinations))
+        return originals[1](A_icon, A_vis, g, combinations)
+
+    # 所有模板都经 layout_kernel.layout_kg 调用搜索
+    layout_kernel.best_single_placement, layout_kernel.best_pair_placement = single, pair
+    try:
+        for type in LAYOUT_MODULES:
+            module = engine(type)
+            for sample in samples:
+                for W, H in SIZES:
+                    try:
+                        module.raw_layout_poster(copy.deepcopy(sample), W, H)
+                    except ValueError:
+                        pass
+    finally:
+        layout_kernel.best_single_placement, layout_kernel.best_pair_placement = originals
+    return singles, pairs
+
+
+def reference_options(combinations) -> dict:
+    options = {}
+    for combination in combinations:
+        for name, values in REFERENCE_VARIANTS.items():
+            if combination is getattr(__import__("placement"), name):
+                options.update(values)
+    return options
+
+
+def timed(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    from placement import best_pair_placement, best_single_placement
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=os.path.join(ROOT, "result.json"))
+    parser.add_argument("--variants", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.data, encoding="utf-8") as file:
+        data = json.load(file)
+    singles, pairs = record_searches(list(variants(data, args.variants)))
+
+    mismatched = 0
+    rows = []
+    for label, cases, current, reference in (
+        ("单图 (2x15)", singles,
+         lambda case: best_single_placement(*case),
+         lambda case: reference_single(*case)),
+        ("双图 (4x225)", pairs,
+         lambda case: best_pair_placement(*case),
+         lambda case: reference_pair(*case[:3], **reference_options(case[3]))),
+    ):
+        old_time = new_time = 0.0
+        fits = 0
+        for case in cases:
+            expected, actual = reference(case), current(case)
+            if expected != actual:
+                mismatched += 1
+                print(f"不一致：{label} 参照 {expected[2:]} placement.py {actual[2:]}")
+            fits += expected[-1] == 0
+            old_time += timed(lambda: reference(case), args.repeat)
+            new_time += timed(lambda: current(case), args.repeat)
+        n = max(len(cases), 1)
+        rows.append((label, len(cases), fits, old_time / n * 1e6, new_time / n * 1e6))
+
+    print(f"{'搜索':<14}{'KG 数':>8}{'可放下':>8}{'顺序 µs/KG':>14}{'现 µs/KG':>14}{'加速比':>8}")
+    for label, count, fits, old, new in rows:
+        print(f"{label:<14}{count:>8}{fits:>8}{old:>14.1f}{new:>14.1f}{old / new if new else 0:>8.2f}")
+    print(f"不一致 {mismatched}")
+    sys.exit(1 if mismatched else 0)
+
+
+if __name__ == "__main__":
+    main()
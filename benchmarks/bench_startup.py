@@ -0,0 +1,102 @@
+"""
+测量服务启动时 `import main` 的导入耗时，超过预算时以退出码 1 结束，可作为 CI 检查。
+
+每轮在新的子进程中运行 `python -X importtime -c "import main"`，解析 stderr 中的导入耗时，
+取多轮的中位数，并列出 main 直接导入的模块中最慢的几个。openai、PDF 库和 matplotlib
+应在第一次使用时才导入，出现在启动导入中同样视为失败。
+
+导入耗时随机器差异很大（仅 fastapi 在普通机器上就可能超过 1 秒），因此预算是相对的：
+同一台机器上交替测量服务进程无论如何都要付出的 `import fastapi, uvicorn` 作为基线，
+main 的导入耗时不得超过基线的 --budget-ratio 倍（默认 1.75；目前约为 1.3-1.6 倍，
+openai、matplotlib 等在启动时导入时约为 3 倍）。
+
+用法：
+
+    python benchmarks/bench_startup.py [--budget-ratio 1.75] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 启动时不应导入的重依赖
+DEFERRED = ("openai", "pdfplumber", "PyPDF2", "pypdfium2", "matplotlib")
+# 服务进程无论如何都要导入的框架，作为相对预算的基线
+BASELINE = ("fastapi", "uvicorn")
+# main 的导入耗时最多为基线的多少倍
+IMPORT_TIME_BUDGET_RATIO = float(os.getenv("IMPORT_TIME_BUDGET_RATIO", 1.75))
+
+
+def import_times(module: str, env: dict) -> list[tuple[int, int, str]]:
+    """
+    在新进程中导入 module（可以是逗号分隔的多个模块），返回 -X importtime 的每一行。
+    返回：
+        [(层级, 累计耗时 µs, 模块名)]，层级 0 为直接导入的模块
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, int(cumulative), name.strip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ratio", type=float, default=IMPORT_TIME_BUDGET_RATIO)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 缓存和任务库写到临时目录，不影响工作目录中的数据
+        env = dict(os.environ, CACHE_DIR=os.path.join(tmp, "cache"), JOB_DB=os.path.join(tmp, "jobs.sqlite"))
+        env.setdefault("OPENAI_KEY", "")
+        # 基线与 main 交替测量，两者受到的机器负载波动相近
+        baselines, runs = [], []
+        for _ in range(args.runs):
+            rows = import_times(", ".join(BASELINE), env)
+            baselines.append(sum(us for depth, us, name in rows if depth == 0 and name in BASELINE) / 1000)
+            runs.append(import_times(args.module, env))
+
+    totals = [next(us for depth, us, name in rows if depth == 0 and name == args.module) / 1000 for rows in runs]
+    total = statistics.median(totals)
+    baseline = statistics.median(baselines)
+    budget = baseline * args.budget_ratio
+    children: dict[str, list[float]] = {}
+    for rows in runs:
+        for depth, us, name in rows:
+            if depth == 1:
+                children.setdefault(name, []).append(us / 1000)
+    slowest = sorted(((statistics.median(times), name) for name, times in children.items()), reverse=True)
+    deferred = sorted({name.split(".")[0] for rows in runs for _, _, name in rows} & set(DEFERRED))
+
+    print(f"import {', '.join(BASELINE)}（基线）：中位数 {baseline:.1f} ms")
+    print(f"import {args.module}：中位数 {total:.1f} ms（{args.runs} 轮，最小 {min(totals):.1f} ms），"
+          f"为基线的 {total / baseline:.2f} 倍，预算 {budget:.0f} ms（基线的 {args.budget_ratio:g} 倍）")
+    print(f"{args.module} 直接导入中最慢的模块：")
+    for ms, name in slowest[:args.top]:
+        print(f"  {name:<30}{ms:>10.1f} ms")
+    failed = False
+    if deferred:
+        failed = True
+        print(f"启动时导入了应延迟导入的模块：{', '.join(deferred)}")
+    if total > budget:
+        failed = True
+        print(f"超出预算 {total - budget:.1f} ms")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
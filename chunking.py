@@ -0,0 +1,77 @@
+from typing import List
+
+import numpy as np
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：ASCII 字符约 4 个一个 token，其余字符（如中文）约一个字符一个 token。"""
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+
+def estimate_tokens_utf8(data) -> int:
+    """
+    与 estimate_tokens 相同的估算，直接在 UTF-8 字节（bytes / memoryview / mmap）上计数，不需要先解码。
+    UTF-8 中 ASCII 字节只表示 ASCII 字符，续字节（10xxxxxx）之外的每个字节开始一个字符。
+    """
+    octets = np.frombuffer(data, dtype=np.uint8)
+    ascii_chars = int(np.count_nonzero(octets < 0x80))
+    chars = int(np.count_nonzero((octets & 0xC0) != 0x80))
+    return ascii_chars // 4 + (chars - ascii_chars)
+
+
+def _char_counts(text: str) -> tuple[int, int]:
+    """(ASCII 字符数, 其余字符数)。拼接后的计数是各段之和，而 estimate_tokens 的取整不能逐段相加。"""
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return ascii_chars, len(text) - ascii_chars
+
+
+def split_token_windows(text: str, window_tokens: int, overlap_tokens: int) -> List[str]:
+    """
+    按行把文本切成 token 数不超过 window_tokens 的窗口，相邻窗口至少重叠 overlap_tokens，
+    避免跨窗口的内容被截断。单行超过预算时按字符硬切。
+    窗口和重叠部分按拼接后的整段估算 token（逐行估算再相加会因取整而偏小），
+    因此每个窗口的 estimate_tokens 都不超过 window_tokens。
+    """
+    lines = []
+    for line in text.splitlines(keepends=True):
+        ascii_chars, other = _char_counts(line)
+        tokens = ascii_chars // 4 + other
+        if tokens <= window_tokens:
+            lines.append((line, ascii_chars, other))
+            continue
+        start = 0
+        while start < len(line):
+            # 按比例估计片段长度，片段仍超出预算时按比例继续缩短
+            end = min(len(line), start + max(1, len(line) * window_tokens // tokens))
+            piece_ascii, piece_other = _char_counts(line[start:end])
+            while end - start > 1 and piece_ascii // 4 + piece_other > window_tokens:
+                shorter = (end - start) * window_tokens // (piece_ascii // 4 + piece_other)
+                end = start + max(1, min(end - start - 1, shorter))
+                piece_ascii, piece_other = _char_counts(line[start:end])
+            lines.append((line[start:end], piece_ascii, piece_other))
+            start = end
+
+    windows = []
+    start = 0
+    while start < len(lines):
+        end, total_ascii, total_other = start, 0, 0
+        while end < len(lines) and (
+            end == start or (total_ascii + lines[end][1]) // 4 + total_other + lines[end][2] <= window_tokens
+        ):
+            total_ascii += lines[end][1]
+            total_other += lines[end][2]
+            end += 1
+        windows.append("".join(line for line, _, _ in lines[start:end]))
+        if end >= len(lines):
+            break
+        # 下一个窗口从末尾回退 overlap_tokens 处开始，且至少前进一行；overlap_tokens 为 0 时窗口互不重叠
+        next_start, overlap_ascii, overlap_other = end, 0, 0
+        while overlap_tokens > 0 and next_start - 1 > start and (
+            (overlap_ascii + lines[next_start - 1][1]) // 4 + overlap_other + lines[next_start - 1][2] <= overlap_tokens
+        ):
+            next_start -= 1
+            overlap_ascii += lines[next_start][1]
+            overlap_other += lines[next_start][2]
+        start = next_start
+    return windows
@@ -0,0 +1,71 @@
+import os
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+import httpx
+
+if TYPE_CHECKING:
+    # openai 导入较慢，在 lifespan 中创建 client 时才导入
+    from openai import AsyncOpenAI, OpenAI
+
+RECRAFT_BASE_URL = "https://external.api.recraft.ai/v1"
+
+
+@dataclass
+class ClientSettings:
+    """连接池配置，默认值可由环境变量覆盖。"""
+
+    max_connections: int = field(default_factory=lambda: int(os.getenv("HTTP_POOL_SIZE", 32)))  # 每个 client 的最大连接数
+    max_keepalive_connections: int = field(default_factory=lambda: int(os.getenv("HTTP_POOL_KEEPALIVE", 16)))  # 保持复用的空闲连接数
+    keepalive_expiry: float = field(default_factory=lambda: float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 60)))  # 空闲连接保留秒数
+    timeout: float = field(default_factory=lambda: float(os.getenv("HTTP_TIMEOUT", 120)))  # 单次请求超时秒数
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+@dataclass
+class Clients:
+    """应用级共享的各服务商 client，在 FastAPI lifespan 中创建并在关闭时释放连接池。"""
+
+    openai: "OpenAI"
+    openai_async: "AsyncOpenAI"
+    recraft: "OpenAI"
+    recraft_async: "AsyncOpenAI"
+    http: httpx.AsyncClient  # 通用下载（如图标 SVG）
+
+    async def aclose(self):
+        self.openai.close()
+        self.recraft.close()
+        await self.openai_async.close()
+        await self.recraft_async.close()
+        await self.http.aclose()
+
+
+def create_clients(settings: ClientSettings | None = None) -> Clients:
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+    settings = settings or ClientSettings()
+
+    def sync_client(**kwargs) -> OpenAI:
+        http_client = DefaultHttpxClient(limits=settings.limits(), timeout=settings.timeout)
+        return OpenAI(http_client=http_client, **kwargs)
+
+    def async_client(**kwargs) -> AsyncOpenAI:
+        http_client = DefaultAsyncHttpxClient(limits=settings.limits(), timeout=settings.timeout)
+        return AsyncOpenAI(http_client=http_client, **kwargs)
+
+    # 未配置的 key 用空串占位，避免某个服务商缺少 key 时整个应用无法启动；实际调用时由服务端返回鉴权错误
+    openai_key = os.getenv("OPENAI_KEY", "")
+    recraft_key = os.getenv("RECRAFT_KEY", "")
+    return Clients(
+        openai=sync_client(api_key=openai_key),
+        openai_async=async_client(api_key=openai_key),
+        recraft=sync_client(base_url=RECRAFT_BASE_URL, api_key=recraft_key),
+        recraft_async=async_client(base_url=RECRAFT_BASE_URL, api_key=recraft_key),
+        http=httpx.AsyncClient(limits=settings.limits(), timeout=settings.timeout, follow_redirects=True),
+    )
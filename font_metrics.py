@@ -0,0 +1,241 @@
+import os
+import re
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+from text_metrics import WidthMetrics
+
+FONT_DIR = os.getenv("FONT_DIR", "fonts")
+FONT_EXTENSIONS = (".ttf", ".otf")
+# Width tables cover the BMP and the first supplementary planes at most
+MAX_TABLE_SIZE = 0x30000
+# Kerning is only collected for Latin/Greek/Cyrillic and general punctuation, which keeps the pair tables small
+KERN_RANGES = ((0x0000, 0x0500), (0x2000, 0x2070))
+
+_warned: set[str] = set()
+_warn_lock = threading.Lock()
+
+
+def normalize_font_name(name: str) -> str:
+    """Lowercases a font name and drops spaces, dashes and underscores ("Open Sans" == "open-sans")."""
+    return re.sub(r"[\s\-_]+", "", name).casefold()
+
+
+def _warn_once(name: str, message: str):
+    with _warn_lock:
+        if name in _warned:
+            return
+        _warned.add(name)
+    print(message)
+
+
+@lru_cache(maxsize=8)
+def font_index(font_dir: str = FONT_DIR) -> dict[str, str]:
+    """
+    Maps normalized family, full and PostScript names of every font in font_dir to its file.
+    A family name resolves to the Regular style when the directory holds several styles of it.
+    Args:
+        font_dir: Directory searched recursively for .ttf/.otf files.
+    Returns:
+        Dictionary of normalized name -> font path.
+    """
+    from fontTools.ttLib import TTFont
+
+    exact, families = {}, {}
+    for root, _, files in os.walk(font_dir):
+        for file_name in sorted(files):
+            if not file_name.lower().endswith(FONT_EXTENSIONS):
+                continue
+            path = os.path.join(root, file_name)
+            try:
+                with TTFont(path, lazy=True) as font:
+                    names = font["name"]
+                    family = names.getDebugName(1)
+                    subfamily = names.getDebugName(2) or ""
+                    full, postscript = names.getDebugName(4), names.getDebugName(6)
+            except Exception as e:
+                print(f"Skipping font {path}: {e}")
+                continue
+            for name in (full, postscript, os.path.splitext(file_name)[0]):
+                if name:
+                    exact.setdefault(normalize_font_name(name), path)
+            if family:
+                key = normalize_font_name(family)
+                if key not in families or subfamily.casefold() == "regular":
+                    families[key] = path
+    # Exact style names win over family names
+    return {**families, **exact}
+
+
+def _kern_code_points(cmap: dict[int, str]) -> dict[str, list[int]]:
+    """Reverse cmap restricted to KERN_RANGES: glyph name -> code points."""
+    glyph_codes: dict[str, list[int]] = {}
+    for code, glyph in cmap.items():
+        if any(start <= code < stop for start, stop in KERN_RANGES):
+            glyph_codes.setdefault(glyph, []).append(code)
+    return glyph_codes
+
+
+def _pair_arrays(first: list[int], second: list[int], values: np.ndarray):
+    """Expands all (first, second) code point combinations into pair keys with the given value matrix."""
+    first_codes, second_codes = np.array(first, dtype=np.int64), np.array(second, dtype=np.int64)
+    keys = (first_codes[:, None] << 21) | second_codes[None, :]
+    mask = values != 0
+    return keys[mask], values[mask]
+
+
+def _gpos_pairs(font, glyph_codes: dict[str, list[int]]):
+    """
+    Collects pair adjustments (x advance of the first glyph) from GPOS PairPos formats 1 and 2.
+    Returns one (keys, values) entry per lookup; within a lookup the first subtable covering a pair wins.
+    Zero-valued pairs are dropped while collecting, so a zero in an earlier subtable does not hide a later
+    subtable's value for the same pair as it would during shaping; an approximation that only affects such pairs.
+    """
+    keys, values = [], []
+    if "GPOS" not in font or font["GPOS"].table.LookupList is None:
+        return keys, values
+    for lookup in font["GPOS"].table.LookupList.Lookup:
+        lookup_keys, lookup_values = [], []
+        for subtable in lookup.SubTable:
+            if lookup.LookupType == 9:
+                subtable = subtable.ExtSubTable
+            if subtable.LookupType != 2:
+                continue
+            coverage = subtable.Coverage.glyphs
+            if subtable.Format == 1:
+                for glyph, pair_set in zip(coverage, subtable.PairSet):
+                    first = glyph_codes.get(glyph)
+                    if not first:
+                        continue
+                    for record in pair_set.PairValueRecord:
+                        second = glyph_codes.get(record.SecondGlyph)
+                        advance = getattr(record.Value1, "XAdvance", 0) if record.Value1 else 0
+                        if second and advance:
+                            k, v = _pair_arrays(first, second, np.full((len(first), len(second)), float(advance)))
+                            lookup_keys.append(k)
+                            lookup_values.append(v)
+            elif subtable.Format == 2:
+                class1 = subtable.ClassDef1.classDefs
+                class2 = subtable.ClassDef2.classDefs
+                matrix = np.array([
+                    [getattr(record.Value1, "XAdvance", 0) if record.Value1 else 0 for record in row.Class2Record]
+                    for row in subtable.Class1Record
+                ], dtype=np.float64)
+                if not matrix.any():
+                    continue
+                first, first_class = [], []
+                for glyph in coverage:
+                    for code in glyph_codes.get(glyph, ()):
+                        first.append(code)
+                        first_class.append(class1.get(glyph, 0))
+                second, second_class = [], []
+                for glyph, codes in glyph_codes.items():
+                    for code in codes:
+                        second.append(code)
+                        second_class.append(class2.get(glyph, 0))
+                if first and second:
+                    k, v = _pair_arrays(first, second, matrix[np.ix_(first_class, second_class)])
+                    lookup_keys.append(k)
+                    lookup_values.append(v)
+        if lookup_keys:
+            k, keep = np.unique(np.concatenate(lookup_keys), return_index=True)
+            keys.append(k)
+            values.append(np.concatenate(lookup_values)[keep])
+    return keys, values
+
+
+def _sum_pairs(keys: list[np.ndarray], values: list[np.ndarray]):
+    """
+    Merges pair arrays into sorted unique keys, adding up the values of pairs that appear more than once
+    (adjustments from separate GPOS lookups or kern subtables accumulate).
+    """
+    if not keys:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+    return keys, np.bincount(inverse, weights=np.concatenate(values), minlength=len(keys))
+
+
+def _kern_table_pairs(font, glyph_codes: dict[str, list[int]]):
+    """Collects pairs from a legacy 'kern' table (format 0 subtables)."""
+    keys, values = [], []
+    if "kern" not in font:
+        return keys, values
+    for table in font["kern"].kernTables:
+        for (left, right), value in getattr(table, "kernTable", {}).items():
+            first, second = glyph_codes.get(left), glyph_codes.get(right)
+            if first and second and value:
+                k, v = _pair_arrays(first, second, np.full((len(first), len(second)), float(value)))
+                keys.append(k)
+                values.append(v)
+    return keys, values
+
+
+def build_font_metrics(path: str, name: str) -> WidthMetrics:
+    """
+    Builds width ratios and a kerning pair table from a font file.
+    Args:
+        path: Font file path.
+        name: Name the metrics are registered under.
+    Returns:
+        WidthMetrics with advance widths and kerning in units of the font height (em).
+    """
+    from fontTools.ttLib import TTFont
+
+    with TTFont(path, lazy=True) as font:
+        units_per_em = font["head"].unitsPerEm
+        cmap = font.getBestCmap() or {}
+        hmtx = font["hmtx"].metrics
+        average = font["OS/2"].xAvgCharWidth if "OS/2" in font else np.mean([m[0] for m in hmtx.values()])
+        default = float(average) / units_per_em
+
+        codes = [code for code in cmap if code < MAX_TABLE_SIZE]
+        table = np.full(max(codes, default=127) + 1, default, dtype=np.float64)
+        for code in codes:
+            table[code] = hmtx[cmap[code]][0] / units_per_em
+
+        glyph_codes = _kern_code_points(cmap)
+        gpos_keys, gpos_values = _sum_pairs(*_gpos_pairs(font, glyph_codes))
+        kern_keys, kern_values = _sum_pairs(*_kern_table_pairs(font, glyph_codes))
+
+    # GPOS takes precedence over the legacy kern table: kern pairs only fill in pairs GPOS does not adjust
+    legacy = ~np.isin(kern_keys, gpos_keys)
+    keys = np.concatenate([gpos_keys, kern_keys[legacy]])
+    if not len(keys):
+        return WidthMetrics(table, default, name=name)
+    values = np.concatenate([gpos_values, kern_values[legacy]]) / units_per_em
+    order = np.argsort(keys)
+    return WidthMetrics(table, default, keys[order], values[order], name=name)
+
+
+@lru_cache(maxsize=32)
+def load_font_metrics(name: str, font_dir: str = FONT_DIR):
+    """
+    Returns the cached metrics of a font by family, full or PostScript name, e.g. ColorScheme.text_font.
+    Fonts missing from font_dir fall back to the built-in ratio table (returns None), with a warning printed once.
+    """
+    if not name:
+        return None
+    path = font_index(font_dir).get(normalize_font_name(name))
+    if path is None:
+        _warn_once(name, f"Font '{name}' not found in {font_dir}, falling back to the built-in width ratios")
+        return None
+    try:
+        return build_font_metrics(path, name)
+    except Exception as e:
+        _warn_once(name, f"Failed to load metrics for font '{name}' from {path}: {e}")
+        return None
+
+
+def color_scheme_metrics(color_scheme, font_dir: str = FONT_DIR) -> dict:
+    """
+    Metrics for the body text (text_font) and first-level highlights (first_level_font) of a ColorScheme,
+    ready to pass to text_metrics.use_metrics.
+    """
+    if color_scheme is None:
+        return {}
+    return {
+        "text": load_font_metrics(color_scheme.text_font, font_dir),
+        "highlight": load_font_metrics(color_scheme.first_level_font, font_dir),
+    }
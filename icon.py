@@ -1,3 +1,19 @@
+import asyncio
+import os
+import random
+
+import httpx
+
+ICON_MODEL = os.getenv("ICON_MODEL", "recraftv2")
+ICON_STYLE = os.getenv("ICON_STYLE", "icon")
+ICON_MAX_RETRIES = int(os.getenv("ICON_MAX_RETRIES", 5))
+ICON_BACKOFF_BASE = float(os.getenv("ICON_BACKOFF_BASE", 1))  # 首次重试前的最大等待秒数
+ICON_BACKOFF_CAP = float(os.getenv("ICON_BACKOFF_CAP", 16))  # 单次等待上限
+ICON_GENERATE_TIMEOUT = float(os.getenv("ICON_GENERATE_TIMEOUT", 60))  # 单次生成请求超时
+ICON_DOWNLOAD_TIMEOUT = float(os.getenv("ICON_DOWNLOAD_TIMEOUT", 20))  # 单次下载超时
+ICON_MAX_SVG_BYTES = int(os.getenv("ICON_MAX_SVG_BYTES", 5 * 1024 * 1024))
+
+
 def scale_creation(coordinate):
     x0 = coordinate[0][0]
     x1 = coordinate[1][0]
@@ -33,4 +49,109 @@ def scale_creation(coordinate):
     else:
 
       closest_ratio = min(ratio_to_dimension.keys(), key=lambda k: abs(k - r))
-      return ratio_to_dimension[closest_ratio]
\ No newline at end of file
+      return ratio_to_dimension[closest_ratio]
+
+
+def backoff_delay(attempt: int) -> float:
+    """第 attempt 次失败后的等待时间：指数退避 + 全抖动，避免并发请求同时重试。"""
+    return random.uniform(0, min(ICON_BACKOFF_CAP, ICON_BACKOFF_BASE * 2 ** (attempt - 1)))
+
+
+async def request_icon_url(client, keyword: str, colorlist: list[list[int]], size: str,
+                           model: str = ICON_MODEL, style: str = ICON_STYLE) -> str:
+    """调用图像生成接口，返回生成的 SVG 地址；失败时按抖动退避重试。"""
+    # 构建颜色控制列表
+    color_controls = [{'rgb': rgb} for rgb in colorlist]
+    # 重试由这里统一控制，关闭 SDK 自带的重试
+    client = client.with_options(timeout=ICON_GENERATE_TIMEOUT, max_retries=0)
+    for attempt in range(1, ICON_MAX_RETRIES + 1):
+        try:
+            response = await client.images.generate(
+                model=model,
+                prompt=keyword,
+                style=style,
+                n=1,
+                size=size,
+                extra_body={
+                    'controls': {
+                        'colors': color_controls
+                    }
+                }
+            )
+            return response.data[0].url
+        except Exception as e:
+            print(f"第 {attempt} 次生成图像请求失败：{e}")
+            if attempt == ICON_MAX_RETRIES:
+                raise
+            await asyncio.sleep(backoff_delay(attempt))
+
+
+async def download_svg(http: httpx.AsyncClient, url: str) -> str | None:
+    """流式下载 SVG，超过 ICON_MAX_SVG_BYTES 视为失败；重试耗尽后返回 None。"""
+    for attempt in range(1, ICON_MAX_RETRIES + 1):
+        try:
+            async with http.stream("GET", url, timeout=ICON_DOWNLOAD_TIMEOUT) as response:
+                if response.status_code == 200:
+                    chunks, size = [], 0
+                    async for chunk in response.aiter_bytes():
+                        size += len(chunk)
+                        if size > ICON_MAX_SVG_BYTES:
+                            raise ValueError(f"SVG 超过 {ICON_MAX_SVG_BYTES} 字节")
+                        chunks.append(chunk)
+                    return b"".join(chunks).decode("utf-8")
+                print(f"第 {attempt} 次下载 SVG 失败，状态码：{response.status_code}")
+        except Exception as e:
+            print(f"第 {attempt} 次下载 SVG 请求失败：{e}")
+
+        if attempt == ICON_MAX_RETRIES:
+            print("达到最大重试次数，下载 SVG 失败")
+            break
+        await asyncio.sleep(backoff_delay(attempt))
+    return None
+
+
+async def generate_icon_svg(client, http: httpx.AsyncClient, keyword: str, colorlist: list[list[int]],
+                            coordinates: list[list[float]]) -> str | None:
+    """
+    生成图标并返回 SVG 文本，不写本地文件，并发请求之间互不影响。
+
+    参数:
+        client: AsyncOpenAI 风格的图像生成 client（Recraft）
+        http: 用于下载 SVG 的 httpx.AsyncClient
+        keyword: 图标关键词
+        colorlist: RGB 颜色列表
+        coordinates: 图标区域的四角坐标，用于选择生成尺寸
+    返回:
+        SVG 文本；下载失败时返回 None
+    """
+    url = await request_icon_url(client, keyword, colorlist, scale_creation(coordinates))
+    print("获取到的 SVG URL:", url)
+    return await download_svg(http, url)
+
+
+def collect_icon_requests(layout: dict, parser_result) -> list[tuple[str, str, list[list[float]]]]:
+    """
+    从 /layout 的布局结果中收集需要生成的图标。
+
+    参数:
+        layout: 布局结果，形如 {"VG1": {"KG1": {"Icon": 坐标, ...}, ...}, ...}
+        parser_result: 生成该布局所用的 ParserResult，VGn/KGm 对应 data[n-1].knowledges[m-1]
+    返回:
+        [(键 "VGn/KGm", icon_keyword, Icon 坐标), ...]，按布局顺序排列；没有 Icon 区域的知识点会被跳过
+    """
+    requests = []
+    for vg_key, vg in layout.items():
+        if not (vg_key.startswith("VG") and vg_key[2:].isdigit() and isinstance(vg, dict)):
+            continue
+        vg_index = int(vg_key[2:]) - 1
+        if vg_index >= len(parser_result.data):
+            continue
+        knowledges = parser_result.data[vg_index].knowledges
+        for kg_key, kg in vg.items():
+            if not (kg_key.startswith("KG") and kg_key[2:].isdigit() and isinstance(kg, dict)):
+                continue
+            kg_index = int(kg_key[2:]) - 1
+            if kg.get("Icon") is None or kg_index >= len(knowledges):
+                continue
+            requests.append((f"{vg_key}/{kg_key}", knowledges[kg_index].icon_keyword, kg["Icon"]))
+    return requests
@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+from cache import DiskLRUCache
+from icon import ICON_MODEL, ICON_STYLE, generate_icon_svg, scale_creation
+
+HIT = "hit"
+MISS = "miss"
+COALESCED = "coalesced"  # 与正在进行的相同请求共享一次上游调用
+
+
+def normalize_keyword(keyword: str) -> str:
+    return " ".join(keyword.split()).casefold()
+
+
+def icon_cache_key(keyword: str, colorlist: list[list[int]], size: str,
+                   model: str = ICON_MODEL, style: str = ICON_STYLE) -> str:
+    palette = [[int(c) for c in rgb] for rgb in colorlist]
+    payload = json.dumps([normalize_keyword(keyword), palette, size, model, style])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class IconCache:
+    """
+    图标 SVG 缓存：以 (规范化关键词, 调色板, 尺寸档位, 模型, 风格) 为键，磁盘 LRU 淘汰。
+    同一键的并发请求只触发一次上游生成，其余请求等待同一结果。
+    """
+
+    def __init__(self, disk: DiskLRUCache, ttl: Optional[float] = None):
+        self.disk = disk
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def get_or_generate(self, client, http, keyword: str, colorlist: list[list[int]],
+                              coordinates: list[list[float]]) -> tuple[Optional[str], str]:
+        """
+        返回 (SVG 文本, 缓存状态)，状态为 hit / miss / coalesced。
+        生成失败的结果（None 或异常）不写入缓存。
+        """
+        key = icon_cache_key(keyword, colorlist, scale_creation(coordinates))
+        if key not in self._inflight:
+            # SQLite 读写在线程中执行，不阻塞事件循环
+            cached = await asyncio.to_thread(self.disk.get, key)
+            if cached is not None:
+                self.hits += 1
+                return cached.decode("utf-8"), HIT
+
+        # 读盘期间可能已有相同请求开始生成；从这里到登记 _inflight 之间没有 await
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            # shield：某个等待方被取消（如客户端断开）时不影响共享的生成任务
+            return await asyncio.shield(task), COALESCED
+
+        self.misses += 1
+        task = asyncio.create_task(self._generate(key, client, http, keyword, colorlist, coordinates))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task), MISS
+
+    async def _generate(self, key, client, http, keyword, colorlist, coordinates) -> Optional[str]:
+        svg = await generate_icon_svg(client, http, keyword, colorlist, coordinates)
+        if svg is not None:
+            await asyncio.to_thread(self.disk.set, key, svg, self.ttl)
+        return svg
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "disk": self.disk.stats(),
+        }
+
+
+_default_cache: Optional[IconCache] = None
+_default_lock = threading.Lock()
+
+
+def default_icon_cache() -> IconCache:
+    """进程级共享的图标缓存，磁盘文件位于 CACHE_DIR/icons.sqlite。"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            disk = DiskLRUCache(
+                os.path.join(os.getenv("CACHE_DIR", "cache"), "icons.sqlite"),
+                max_bytes=int(os.getenv("ICON_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+            )
+            ttl = os.getenv("ICON_CACHE_TTL")
+            _default_cache = IconCache(disk, ttl=float(ttl) if ttl else None)
+        return _default_cache
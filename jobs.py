@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from pydantic import BaseModel
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# 同一阶段内进度写入 SQLite 的最小间隔（秒）；阶段变化时总是立即写入
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", 0.5))
+
+
+class Job(BaseModel):
+    id: str
+    status: str  # queued / running / succeeded / failed
+    doc_id: str  # 文档内容哈希
+    file_path: str
+    question: str
+    pdf_backend: Optional[str] = None  # 文本提取后端，None 表示使用默认配置
+    progress: dict  # 各阶段进度，由处理函数更新
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+
+class JobStore:
+    """基于 SQLite 的任务持久化存储，服务重启后未完成的任务可以重新入队。"""
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL 模式下 NORMAL 只在检查点时 fsync，进度更新不再每次落盘
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                question TEXT NOT NULL,
+                pdf_backend TEXT,
+                progress TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        # 旧版本创建的数据库没有 pdf_backend 列
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "pdf_backend" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN pdf_backend TEXT")
+
+    @staticmethod
+    def _to_job(row) -> Job:
+        return Job(
+            id=row[0], status=row[1], doc_id=row[2], file_path=row[3], question=row[4],
+            progress=json.loads(row[5]), error=row[6], created_at=row[7], updated_at=row[8], pdf_backend=row[9],
+        )
+
+    def create(self, doc_id: str, file_path: str, question: str, pdf_backend: Optional[str] = None) -> Job:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, doc_id, file_path, question, pdf_backend, progress, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, doc_id, file_path, question, pdf_backend, json.dumps({"stage": QUEUED}), now, now),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, doc_id, file_path, question, progress, error, created_at, updated_at, pdf_backend "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        return self._to_job(row) if row else None
+
+    def get_result(self, job_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def update(self, job_id: str, status: Optional[str] = None, progress: Optional[dict] = None,
+               result: Optional[str] = None, error: Optional[str] = None):
+        fields, values = ["updated_at = ?"], [time.time()]
+        if status is not None:
+            fields.append("status = ?")
+            values.append(status)
+        if progress is not None:
+            fields.append("progress = ?")
+            values.append(json.dumps(progress, ensure_ascii=False))
+        if result is not None:
+            fields.append("result = ?")
+            values.append(result)
+        if error is not None:
+            fields.append("error = ?")
+            values.append(error)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {', '.join(fields)} WHERE id = ?", (*values, job_id))
+
+    def unfinished(self) -> list[str]:
+        """按创建顺序返回排队中或执行中（上次运行被中断）的任务 ID。"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+
+# 处理函数：接收任务和异步的进度回调，返回可 JSON 序列化的结果字符串
+JobHandler = Callable[[Job, Callable[[dict], Awaitable[None]]], Awaitable[str]]
+
+
+class JobQueue:
+    """
+    在事件循环中运行固定数量 worker 的任务队列。
+    start() 时会把持久化存储中未完成的任务重新入队，因此任务在服务重启后仍会被执行。
+    任务执行期间的 SQLite 读写都放到线程中进行，不阻塞事件循环。
+    """
+
+    def __init__(self, store: JobStore, handler: JobHandler, workers: int = 2,
+                 progress_interval: float = JOB_PROGRESS_INTERVAL):
+        self.store = store
+        self.handler = handler
+        self.workers = workers
+        self.progress_interval = progress_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        for job_id in self.store.unfinished():
+            self.store.update(job_id, status=QUEUED, progress={"stage": QUEUED})
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, doc_id: str, file_path: str, question: str, pdf_backend: Optional[str] = None) -> Job:
+        job = await asyncio.to_thread(self.store.create, doc_id, file_path, question, pdf_backend)
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job.status not in (QUEUED, RUNNING):
+            return
+        await asyncio.to_thread(self.store.update, job_id, status=RUNNING, progress={"stage": RUNNING})
+
+        # 同一阶段内的进度按 progress_interval 节流，最新进度在任务结束时一并写入
+        latest = {"progress": None, "stage": RUNNING, "written_at": time.monotonic()}
+
+        async def report_progress(progress: dict):
+            latest["progress"] = dict(progress)
+            now = time.monotonic()
+            if progress.get("stage") == latest["stage"] and now - latest["written_at"] < self.progress_interval:
+                return
+            latest["stage"], latest["written_at"] = progress.get("stage"), now
+            await asyncio.to_thread(self.store.update, job_id, progress=latest["progress"])
+
+        try:
+            result = await self.handler(job, report_progress)
+        except asyncio.CancelledError:
+            # 服务关闭时中断的任务保持 running 状态，下次启动时重新入队
+            raise
+        except Exception as e:
+            print(f"任务 {job_id} 执行失败：{e}")
+            await asyncio.to_thread(self.store.update, job_id, status=FAILED, progress={"stage": FAILED}, error=str(e))
+            return
+        await asyncio.to_thread(self.store.update, job_id, status=SUCCEEDED, progress=latest["progress"], result=result)
@@ -0,0 +1,173 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from fractions import Fraction
+from typing import Optional
+
+LAYOUT_CACHE_ITEMS = int(os.getenv("LAYOUT_CACHE_ITEMS", 512))  # 内存中保留的布局条目数
+# 同宽高比、不同尺寸的请求如何复用缓存：
+#   exact: 只在缩放倍数为 2 的整数次幂时复用，此时浮点运算逐位等比，结果与重新计算完全相同
+#   any:   任意倍数都复用；少数布局在面积相等的候选位置之间取舍不同（见 benchmarks/bench_layout_cache.py）
+#   off:   不复用
+SCALE_OFF = "off"
+SCALE_EXACT = "exact"
+SCALE_ANY = "any"
+LAYOUT_CACHE_SCALE = os.getenv("LAYOUT_CACHE_SCALE", SCALE_EXACT)
+
+# 统计项
+EXACT = "exact"
+SCALED = "scaled"
+MISS = "miss"
+
+
+def parser_result_hash(parser_result) -> str:
+    """parser_result 内容的哈希，键顺序不影响结果。"""
+    if hasattr(parser_result, "model_dump"):
+        parser_result = parser_result.model_dump()
+    canonical = json.dumps(parser_result, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def layout_shape_key(content_hash: str, type: str, W, H, margin=0, vertical_margin=0, fonts=None,
+                     placement=None) -> tuple:
+    """
+    与画布尺度无关的布局键：宽高比和边距都按画布宽度归一化（用分数精确表示），
+    因此 (W, H, margin, vertical_margin) 等比缩放后得到同一个键。
+    """
+    width = Fraction(W)
+    return (
+        content_hash, type, Fraction(W) / Fraction(H),
+        Fraction(margin) / width, Fraction(vertical_margin) / width, fonts, placement,
+    )
+
+
+def is_power_of_two_ratio(a, b) -> bool:
+    """a / b 是否恰好为 2 的整数次幂（含 1）。"""
+    ratio = Fraction(a) / Fraction(b)
+    return ratio > 0 and ratio.numerator & (ratio.numerator - 1) == 0 and ratio.denominator & (ratio.denominator - 1) == 0
+
+
+def scale_layout(layout, factor: float):
+    """把未加 padding 的布局中的所有坐标乘以 factor，其它字段（如 placement_type）原样保留。"""
+    if isinstance(layout, dict):
+        return {key: scale_layout(value, factor) for key, value in layout.items()}
+    if isinstance(layout, list):
+        return [scale_layout(value, factor) for value in layout]
+    if isinstance(layout, (int, float)) and not isinstance(layout, bool):
+        return layout * factor
+    return layout
+
+
+class _Entry:
+    def __init__(self, W, H, raw: dict):
+        self.W = W
+        self.H = H
+        self.raw = raw  # 参考尺寸下未加 padding 的布局
+        self.padded: OrderedDict[tuple, dict] = OrderedDict()  # 已返回过的尺寸 -> 加 padding 后的布局
+
+
+class LayoutCache:
+    """
+    布局结果的进程内 LRU 缓存。
+    同一 (parser_result, 模板, 归一化宽高比与边距, 字体) 只保存一份参考尺寸下未加 padding 的布局：
+    尺寸完全相同的请求直接返回；同宽高比、不同尺寸的请求按 scale 模式把参考布局等比缩放后再加 padding，
+    不再重新求解。padding 是固定值，不随画布缩放，所以缓存的是加 padding 之前的布局。
+    """
+
+    def __init__(self, max_items: int = LAYOUT_CACHE_ITEMS, scale: str = LAYOUT_CACHE_SCALE, sizes_per_item: int = 8):
+        if scale not in (SCALE_OFF, SCALE_EXACT, SCALE_ANY):
+            raise ValueError(f"Unknown layout cache scale mode: {scale}")
+        self.max_items = max_items
+        self.scale = scale
+        self.sizes_per_item = sizes_per_item
+        self.counts = {EXACT: 0, SCALED: 0, MISS: 0}
+        self._memory: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _can_scale(self, entry: _Entry, W) -> bool:
+        if self.scale == SCALE_ANY:
+            return True
+        return self.scale == SCALE_EXACT and is_power_of_two_ratio(W, entry.W)
+
+    def get(self, key: tuple, W, H, pad, scalable: bool = True) -> Optional[tuple[dict, str]]:
+        """
+        查找缓存：尺寸完全相同时返回 (布局, EXACT)，可缩放时返回 (布局, SCALED)，否则返回 None。
+        参数：
+            key: layout_shape_key 生成的键
+            W, H: 画布尺寸
+            pad: pad(raw) 返回加 padding 后的布局
+            scalable: 该模板的布局是否随画布等比缩放
+        """
+        size = (W, H)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            self._memory.move_to_end(key)
+            layout = entry.padded.get(size)
+            if layout is not None:
+                entry.padded.move_to_end(size)
+                self.counts[EXACT] += 1
+                return copy.deepcopy(layout), EXACT
+        if not (scalable and self._can_scale(entry, W)):
+            return None
+        layout = pad(scale_layout(entry.raw, W / entry.W))
+        # 参考条目已存在，只记录这个尺寸的结果
+        self._store(key, W, H, None, layout, SCALED)
+        return layout, SCALED
+
+    def put(self, key: tuple, W, H, raw: dict, pad) -> dict:
+        """保存新计算出的未加 padding 的布局，返回加 padding 后的布局。"""
+        layout = pad(raw)
+        self._store(key, W, H, raw, layout, MISS)
+        return layout
+
+    def _store(self, key: tuple, W, H, raw: Optional[dict], layout: dict, status: str):
+        with self._lock:
+            self.counts[status] += 1
+            entry = self._memory.get(key)
+            if entry is None:
+                if raw is None:
+                    return
+                entry = self._memory[key] = _Entry(W, H, raw)
+                while len(self._memory) > self.max_items:
+                    self._memory.popitem(last=False)
+            entry.padded[(W, H)] = copy.deepcopy(layout)
+            while len(entry.padded) > self.sizes_per_item:
+                entry.padded.popitem(last=False)
+
+    def get_or_compute(self, key: tuple, W, H, compute, pad, scalable: bool = True) -> tuple[dict, str]:
+        """
+        参数：
+            compute: compute() 返回 (W, H) 下未加 padding 的布局
+            其余同 get
+        返回：
+            (加 padding 后的布局, EXACT / SCALED / MISS)
+        """
+        cached = self.get(key, W, H, pad, scalable)
+        if cached is not None:
+            return cached
+        return self.put(key, W, H, compute(), pad), MISS
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counts, "entries": len(self._memory)}
+
+
+_default_cache: Optional[LayoutCache] = None
+_default_lock = threading.Lock()
+
+
+def default_layout_cache() -> LayoutCache:
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = LayoutCache()
+        return _default_cache
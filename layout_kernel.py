@@ -0,0 +1,1048 @@
+from dataclasses import dataclass
+from math import sqrt
+from typing import Callable, Optional
+
+from placement import COMBINATIONS, KGBox, best_pair_placement, best_single_placement
+from text_metrics import highlight_width, prime_knowledge_widths, text_width
+
+# Every template shares this kernel: a spec picks an arrangement (how VGs are placed on the poster) plus the
+# per-template variants of the KG layout, and layout_template solves the font size and lays out every KG
+# through the single layout_kg hot path. The float operations are the ones the per-template modules used,
+# in the same order, so the layouts are unchanged.
+
+# How an overflowing Icon + Visualization pair in combination 4 shrinks the Visualization
+COMB4_CLAMP = "clamp"                  # Clamp to the KG like combinations 1-3, anchored at top-left
+COMB4_SCALE = "scale"                  # Anchor at bottom-right, scale it clear of the Highlight
+COMB4_SCALE_CLAMPED = "scale_clamped"  # As COMB4_SCALE, first clamped to the KG and then clear of the Icon
+COMB4_FALLBACKS = (COMB4_CLAMP, COMB4_SCALE, COMB4_SCALE_CLAMPED)
+
+# Shrink applied to the VGs named in TemplateSpec.shrink, as a fraction of min(W, H)
+SHRINK_ALPHA = 0.08
+
+
+@dataclass(frozen=True)
+class TemplateSpec:
+    """
+    A layout template: an arrangement plus the data it needs.
+
+    Attributes:
+        name: Template name, as used by layouts.layout_poster.
+        arrange: arrange_stack, arrange_columns, arrange_rows or arrange_nested.
+        structures: Number of VGs -> structure for the arrangement (rows: lists of VG indices per SG;
+            nested: ('SGH', [...]) rows of 1-based VG labels, ('SGV', [...]) columns and the virtual VG).
+        reorder: Number of VGs -> order in which VGs are laid out; keys are mapped back afterwards.
+        shrink: Number of VGs -> [(VG key, anchor at left edge, 'both' | 'horizontal' | 'vertical')].
+        pair_combinations: Icon + Visualization combinations searched, in order (see placement.py).
+        comb4_fallback: One of COMB4_FALLBACKS.
+        placement_type: placement_type of KGs without images.
+        aliases: Other names accepted for the template.
+    """
+    name: str
+    arrange: Callable
+    structures: Optional[dict] = None
+    reorder: Optional[dict] = None
+    shrink: Optional[dict] = None
+    pair_combinations: tuple = COMBINATIONS
+    comb4_fallback: str = COMB4_CLAMP
+    placement_type: Optional[str] = "none"
+    aliases: tuple = ()
+
+    def structure(self, n_VG):
+        structure = (self.structures or {}).get(n_VG)
+        if structure is None:
+            raise ValueError("Unsupported number of VGs (must be 1 to 10)")
+        return structure
+
+
+TEMPLATES: dict[str, TemplateSpec] = {}
+
+
+def register_template(spec):
+    """
+    Registers a template under its name and aliases.
+
+    Returns:
+        The spec, so modules can write SPEC = register_template(TemplateSpec(...)).
+    """
+    if spec.comb4_fallback not in COMB4_FALLBACKS:
+        raise ValueError(f"Unknown comb4_fallback: {spec.comb4_fallback}")
+    for name in (spec.name, *spec.aliases):
+        TEMPLATES[name] = spec
+    return spec
+
+
+def get_template(name):
+    """The registered spec for a template name or alias; raises ValueError for unknown templates."""
+    spec = TEMPLATES.get(name)
+    if spec is None:
+        raise ValueError("Invalid type")
+    return spec
+
+
+def layout_template(spec, valentine_data, W, H, margin=0, vertical_margin=0):
+    """
+    Lays out a poster with the given template.
+
+    Args:
+        spec: TemplateSpec.
+        valentine_data: Dictionary containing "data" with VGs, each having "knowledges".
+        W: Poster width (float).
+        H: Poster height (float).
+        margin: Horizontal margin for KGs in VGs with multiple KGs (float, default=0).
+        vertical_margin: Vertical spacing between KGs (float, default=0).
+
+    Returns:
+        Dictionary mapping element keys to their unpadded coordinates (as lists of [x, y] points).
+    """
+    VGs = valentine_data["data"]
+    # Measure all KG strings in one vectorized pass; later text_width calls are cache lookups
+    prime_knowledge_widths(VGs)
+    return spec.arrange(spec, VGs, W, H, margin, vertical_margin)
+
+
+def solve_font_size(a, b, c):
+    """Positive root x of b * x^2 + a * x + c = 0 (the linear root when b is 0)."""
+    discriminant = a**2 - 4 * b * c
+    if discriminant < 0:
+        raise ValueError("No solution for font size x")
+    x = (-a + sqrt(discriminant)) / (2 * b) if b != 0 else -c / a
+    if x <= 0:
+        raise ValueError("Invalid font size x")
+    return x
+
+
+def content_coefficient(KG):
+    """Area of a KG at font size 1: text, highlight (2x height, so 4x area) and one text area per image."""
+    n_images = (1 if KG["icon_keyword"] != "" else 0) + (1 if KG["visualization"]["is_visualization"] else 0)
+    s_text = text_width(KG["knowledge_content"], 1.0)
+    return s_text + 4 * highlight_width(KG["first_level_highlight"], 1.0) + s_text * n_images
+
+
+def kg_area(KG, x):
+    """Area of a KG at font size x."""
+    A_text = x * text_width(KG["knowledge_content"], x)
+    A_highlight = 2.0 * x * highlight_width(KG["first_level_highlight"], 2.0 * x)
+    A_icon = A_text if KG["icon_keyword"] != "" else 0.0
+    A_vis = A_text if KG["visualization"]["is_visualization"] else 0.0
+    return A_text + A_highlight + A_icon + A_vis
+
+
+def layout_kg(spec, KG, x, kg_x, kg_width, y_KG):
+    """
+    Lays out one KG: Highlight at the top-left, Icon / Visualization placed by the image search
+    (resized to fit when no candidate fits), and Text in the largest remaining block.
+
+    Returns:
+        (KG layout dict, KG height)
+    """
+    text = KG["knowledge_content"]
+    highlight = KG["first_level_highlight"]
+    has_icon = KG["icon_keyword"] != ""
+    has_vis = KG["visualization"]["is_visualization"]
+
+    # Calculate areas; an image takes as much area as the text
+    A_text = x * text_width(text, x)
+    w_highlight_text = highlight_width(highlight, 2.0 * x)
+    A_highlight = 2.0 * x * w_highlight_text
+    A_icon = A_text if has_icon else 0.0
+    A_vis = A_text if has_vis else 0.0
+    A_KG = A_text + A_highlight + A_icon + A_vis
+    h_KG = A_KG / kg_width if kg_width > 0 else 0.0
+
+    h_highlight = 2.0 * x
+    w_highlight = min(w_highlight_text, kg_width)
+    kg = {
+        "coords": [
+            [kg_x, y_KG], [kg_x + kg_width, y_KG],
+            [kg_x, y_KG + h_KG], [kg_x + kg_width, y_KG + h_KG]
+        ],
+        "Highlight": [
+            [kg_x, y_KG], [kg_x + w_highlight, y_KG],
+            [kg_x, y_KG + h_highlight], [kg_x + w_highlight, y_KG + h_highlight]
+        ],
+        "Icon": None,
+        "Vis": None,
+        "placement_type": spec.placement_type,
+    }
+
+    # Image placement: vectorized search over all candidates (see placement.py)
+    box = KGBox(kg_x, kg_width, y_KG, h_KG, w_highlight, h_highlight)
+
+    # Place images and set placement_type
+    if has_icon and has_vis:
+        coords_a, coords_b, r_a, r_b, comb_idx, min_overflow = best_pair_placement(A_icon, A_vis, box, spec.pair_combinations)
+        if min_overflow == 0:
+            kg["Icon"] = coords_a
+            kg["Vis"] = coords_b
+            kg["placement_type"] = f"comb{comb_idx + 1}"
+        if min_overflow > 0:
+            w_a = sqrt(A_icon * r_a)
+            h_a = sqrt(A_icon / r_a)
+            x1_a, y1_a = coords_a[0]
+            x2_a, y2_a = coords_a[3]
+            w_b = sqrt(A_vis * r_b)
+            h_b = sqrt(A_vis / r_b)
+            x1_b, y1_b = coords_b[0]
+            x2_b, y2_b = coords_b[3]
+
+            if comb_idx == 0:  # Combination 1
+                if x1_a < kg_x + w_highlight:
+                    w_a = kg_width - (kg_x + w_highlight - x1_a)
+                if y2_a > y_KG + h_KG:
+                    h_a = h_KG - (y1_a - y_KG)
+                w_a_new = min(w_a, h_a * r_a)
+                h_a_new = w_a_new / r_a
+                coords_a = [
+                    [x1_a, y1_a], [x1_a + w_a_new, y1_a],
+                    [x1_a, y1_a + h_a_new], [x1_a + w_a_new, y1_a + h_a_new]
+                ]
+                if x1_b < kg_x + w_highlight:
+                    w_b = kg_width - (kg_x + w_highlight - x1_b)
+                if y2_b > y_KG + h_KG:
+                    h_b = h_KG - (y1_b - y_KG)
+                w_b_new = min(w_b, h_b * r_b)
+                h_b_new = w_b_new / r_b
+                coords_b = [
+                    [x1_b, y1_b], [x1_b + w_b_new, y1_b],
+                    [x1_b, y1_b + h_b_new], [x1_b + w_b_new, y1_b + h_b_new]
+                ]
+            elif comb_idx == 1:  # Combination 2
+                # Resize Icon (A), anchored at top-right
+                if x1_a < kg_x + w_highlight:
+                    w_a = kg_width - (kg_x + w_highlight - x1_a)  # Max width from Highlight's right edge
+                if y2_a > y_KG + h_KG:
+                    h_a = h_KG - (y1_a - y_KG)  # Max height within KG
+                w_a_new = min(w_a, h_a * r_a)  # Preserve aspect ratio
+                h_a_new = w_a_new / r_a
+                # Anchor at top-right (x2_a = kg_x + kg_width, y1_a = y_KG)
+                x2_a_new = kg_x + kg_width
+                x1_a_new = x2_a_new - w_a_new  # Adjust left edge based on new width
+                coords_a = [
+                    [x1_a_new, y1_a], [x2_a_new, y1_a],
+                    [x1_a_new, y1_a + h_a_new], [x2_a_new, y1_a + h_a_new]
+                ]
+                # Resize Visualization (B), then check overlap with resized Icon
+                if x2_b > kg_x + kg_width:
+                    w_b = kg_width - (x1_b - kg_x)  # Max width within KG
+                if y2_b > y_KG + h_KG:
+                    h_b = h_KG - (y1_b - y_KG)  # Max height within KG
+                # Apply aspect ratio constraint first
+                w_b_new = min(w_b, h_b * r_b)
+                h_b_new = w_b_new / r_b
+                # Compute tentative right edge of B after initial resizing
+                x2_b_tentative = x1_b + w_b_new
+                # Check if Visualization's top-right corner overlaps Icon's bottom-left corner
+                if x2_b_tentative > x1_a_new and y1_b < y1_a + h_a_new:
+                    w_b_new = min(w_b_new, x1_a_new - x1_b)  # Limit width so x2_b does not exceed x1_a_new
+                    h_b_new = w_b_new / r_b  # Recalculate height to maintain aspect ratio
+                coords_b = [
+                    [x1_b, y1_b], [x1_b + w_b_new, y1_b],
+                    [x1_b, y1_b + h_b_new], [x1_b + w_b_new, y1_b + h_b_new]
+                ]
+            elif comb_idx == 2:  # Combination 3
+                if x1_a < kg_x + w_highlight:
+                    w_a = kg_width - (kg_x + w_highlight - x1_a)
+                if y2_a > y_KG + h_KG:
+                    h_a = h_KG - (y1_a - y_KG)
+                w_a_new = min(w_a, h_a * r_a)
+                h_a_new = w_a_new / r_a
+                coords_a = [
+                    [x1_a, y1_a], [x1_a + w_a_new, y1_a],
+                    [x1_a, y1_a + h_a_new], [x1_a + w_a_new, y1_a + h_a_new]
+                ]
+                if x1_b < kg_x + w_highlight:
+                    w_b = kg_width - (kg_x + w_highlight - x1_b)
+                if y2_b > y_KG + h_KG:
+                    h_b = h_KG - (y1_b - y_KG)
+                w_b_new = min(w_b, h_b * r_b)
+                h_b_new = w_b_new / r_b
+                coords_b = [
+                    [x1_b, y1_b], [x1_b + w_b_new, y1_b],
+                    [x1_b, y1_b + h_b_new], [x1_b + w_b_new, y1_b + h_b_new]
+                ]
+            elif comb_idx == 3:  # Combination 4
+                if x2_a > kg_x + kg_width:
+                    w_a = kg_width - (x1_a - kg_x)
+                if y2_a > y_KG + h_KG:
+                    h_a = h_KG - (y1_a - y_KG)
+                w_a_new = min(w_a, h_a * r_a)
+                h_a_new = w_a_new / r_a
+                coords_a = [
+                    [x1_a, y1_a], [x1_a + w_a_new, y1_a],
+                    [x1_a, y1_a + h_a_new], [x1_a + w_a_new, y1_a + h_a_new]
+                ]
+                if spec.comb4_fallback == COMB4_CLAMP:
+                    if x1_b < kg_x + w_highlight:
+                        w_b = kg_width - (kg_x + w_highlight - x1_b)
+                    if y2_b > y_KG + h_KG:
+                        h_b = h_KG - (y1_b - y_KG)
+                    w_b_new = min(w_b, h_b * r_b)
+                    h_b_new = w_b_new / r_b
+                    coords_b = [
+                        [x1_b, y1_b], [x1_b + w_b_new, y1_b],
+                        [x1_b, y1_b + h_b_new], [x1_b + w_b_new, y1_b + h_b_new]
+                    ]
+                else:
+                    # Resize Visualization (B), anchored at bottom-right
+                    if spec.comb4_fallback == COMB4_SCALE_CLAMPED:
+                        if x1_b < kg_x:
+                            w_b = kg_width  # Max width if exceeding left edge
+                        if y1_b < y_KG:
+                            h_b = h_KG  # Max height if exceeding top
+                        w_b_new = min(w_b, h_b * r_b)
+                        h_b_new = w_b_new / r_b
+                        x1_b_new = x2_b - w_b_new  # Tentative left edge
+                        y1_b_new = y2_b - h_b_new  # Tentative top edge
+                    else:
+                        w_b_new = w_b
+                        h_b_new = h_b
+                        x1_b_new = x1_b
+                        y1_b_new = y1_b
+                    # Scale past the Highlight if the corner overlaps it
+                    if x1_b_new < kg_x + w_highlight and y1_b_new < y_KG + h_highlight:
+                        ratio_x = (kg_width - w_highlight) / w_b
+                        ratio_y = (h_KG - h_highlight) / h_b
+                        scale = max(ratio_x, ratio_y)
+                        w_b_new = w_b * scale
+                        h_b_new = h_b * scale
+                    if spec.comb4_fallback == COMB4_SCALE_CLAMPED:
+                        # Check if Icon's bottom-right corner overlaps Visualization's top-left corner
+                        x1_b_tentative = x2_b - w_b_new
+                        y1_b_tentative = y2_b - h_b_new
+                        if x1_a + w_a_new > x1_b_tentative and y1_a + h_a_new > y1_b_tentative:
+                            w_b_new = min(w_b_new, kg_x + kg_width - (x1_a + w_a_new))
+                            h_b_new = w_b_new / r_b
+                    x1_b_new = x2_b - w_b_new
+                    y1_b_new = y2_b - h_b_new
+                    coords_b = [
+                        [x1_b_new, y1_b_new], [x2_b, y1_b_new],
+                        [x1_b_new, y2_b], [x2_b, y2_b]
+                    ]
+            kg["Icon"] = coords_a
+            kg["Vis"] = coords_b
+            kg["placement_type"] = f"comb{comb_idx + 1}"
+
+    elif has_icon:
+        coords, r, placement_idx, min_overflow = best_single_placement(A_icon, box)
+        if min_overflow == 0:
+            kg["Icon"] = coords
+            kg["placement_type"] = 'a' if placement_idx == 0 else 'b'
+        if min_overflow > 0:
+            w_img = sqrt(A_icon * r)
+            h_img = sqrt(A_icon / r)
+            x1, y1 = coords[0]
+            x2, y2 = coords[3]
+            if placement_idx == 0:  # Placement A
+                if x1 < kg_x + w_highlight:
+                    w_img = kg_width - w_highlight
+                if y2 > y_KG + h_KG:
+                    h_img = h_KG - (y1 - y_KG)
+                w_img_new = min(w_img, h_img * r)
+                h_img_new = w_img_new / r
+                coords = [
+                        [x2 - w_img_new, y1],  # New top-left
+                        [x2, y1],              # New top-right
+                        [x2 - w_img_new, y1 + h_img_new],              # New bottom-left
+                        [x2, y1 + h_img_new]                           # Bottom-right (fixed)
+                    ]
+            elif placement_idx == 1:  # Placement B
+                if x2 > kg_x + kg_width:
+                    w_img = kg_width - (x1 - kg_x)
+                if y2 > y_KG + h_KG:
+                    h_img = h_KG - (y1 - y_KG)
+                w_img_new = min(w_img, h_img * r)
+                h_img_new = w_img_new / r
+                coords = [
+                    [x1, y1], [x1 + w_img_new, y1],
+                    [x1, y1 + h_img_new], [x1 + w_img_new, y1 + h_img_new]
+                ]
+            kg["Icon"] = coords
+            kg["placement_type"] = 'a' if placement_idx == 0 else 'b'
+
+    elif has_vis:
+        coords, r, placement_idx, min_overflow = best_single_placement(A_vis, box)
+        if min_overflow == 0:
+            kg["Vis"] = coords
+            kg["placement_type"] = 'a' if placement_idx == 0 else 'b'
+        if min_overflow > 0:
+            w_img = sqrt(A_vis * r)
+            h_img = sqrt(A_vis / r)
+            x1, y1 = coords[0]
+            x2, y2 = coords[3]
+            if placement_idx == 0:  # Placement A
+                if x1 < kg_x + w_highlight:
+                    w_img = kg_width - w_highlight
+                if y2 > y_KG + h_KG:
+                    h_img = h_KG - (y1 - y_KG)
+                w_img_new = min(w_img, h_img * r)
+                h_img_new = w_img_new / r
+                coords = [
+                        [x2 - w_img_new, y1],  # New top-left
+                        [x2, y1],              # New top-right
+                        [x2 - w_img_new, y1 + h_img_new],              # New bottom-left
+                        [x2, y1 + h_img_new]                           # Bottom-right (fixed)
+                    ]
+            elif placement_idx == 1:  # Placement B
+                if x2 > kg_x + kg_width:
+                    w_img = kg_width - (x1 - kg_x)
+                if y2 > y_KG + h_KG:
+                    h_img = h_KG - (y1 - y_KG)
+                w_img_new = min(w_img, h_img * r)
+                h_img_new = w_img_new / r
+                coords = [
+                    [x1, y1], [x1 + w_img_new, y1],
+                    [x1, y1 + h_img_new], [x1 + w_img_new, y1 + h_img_new]
+                ]
+            kg["Vis"] = coords
+            kg["placement_type"] = 'a' if placement_idx == 0 else 'b'
+
+    ### BEGIN ADDED CODE ###
+    # Calculate text block based on placement type
+    kg_coords = kg["coords"]
+    highlight_coords = kg["Highlight"]
+    icon_coords = kg["Icon"]
+    vis_coords = kg["Vis"]
+    placement_type = kg["placement_type"]
+
+    x1_KG, y1_KG = kg_coords[0]
+    x2_KG, y2_KG = kg_coords[3]
+    x1_highlight, y1_highlight = highlight_coords[0]
+    x2_highlight, y2_highlight = highlight_coords[3]
+
+    possible_blocks = []
+
+    if placement_type == 'a':
+        if icon_coords:
+            x1_img, y1_img = icon_coords[0]
+            x2_img, y2_img = icon_coords[3]
+        elif vis_coords:
+            x1_img, y1_img = vis_coords[0]
+            x2_img, y2_img = vis_coords[3]
+        if y2_highlight < y2_img:
+            possible_blocks = [
+                [(x1_KG, y2_img), (x2_KG, y2_KG)],
+                [(x1_KG, y2_highlight), (x1_img, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_img, y2_KG)]
+            ]
+        else:
+            possible_blocks = [
+                [(x1_KG, y2_highlight), (x2_KG, y2_KG)],
+                [(x2_highlight, y2_img), (x2_KG, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_img, y2_KG)]
+            ]
+    elif placement_type == 'b':
+        if icon_coords:
+            x1_img, y1_img = icon_coords[0]
+            x2_img, y2_img = icon_coords[3]
+        elif vis_coords:
+            x1_img, y1_img = vis_coords[0]
+            x2_img, y2_img = vis_coords[3]
+        if x2_highlight < x2_img:
+            possible_blocks = [
+                [(x2_highlight, y1_KG), (x2_KG, y2_highlight)],
+                [(x2_img, y1_KG), (x2_KG, y2_KG)],
+                [(x1_KG, y2_img), (x2_KG, y2_KG)]
+            ]
+        else:
+            possible_blocks = [
+                [(x2_highlight, y1_KG), (x2_KG, y2_KG)],
+                [(x2_img, y2_highlight), (x2_KG, y2_KG)],
+                [(x1_KG, y2_img), (x2_KG, y2_KG)]
+            ]
+    elif placement_type == 'comb1':
+        x1_a, y1_a = icon_coords[0]
+        x2_a, y2_a = icon_coords[3]
+        x1_b, y1_b = vis_coords[0]
+        x2_b, y2_b = vis_coords[3]
+        if y2_highlight <= y2_b <= y2_a:
+            possible_blocks = [
+                [(x1_KG, y2_highlight), (x1_b, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_b, y2_KG)],
+                [(x1_KG, y2_b), (x1_a, y2_KG)],
+                [(x1_KG, y2_a), (x2_KG, y2_KG)]
+            ]
+        elif y2_highlight <= y2_a <= y2_b:
+            possible_blocks = [
+                [(x1_KG, y2_highlight), (x1_b, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_b, y2_KG)],
+                [(x1_KG, y2_b), (x2_KG, y2_KG)],
+                [(x2_b, y2_a), (x2_KG, y2_KG)]
+            ]
+        elif y2_b <= y2_highlight <= y2_a:
+            possible_blocks = [
+                [(x1_KG, y2_highlight), (x1_a, y2_KG)],
+                [(x1_KG, y2_a), (x2_KG, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_b, y2_KG)],
+                [(x2_highlight, y2_b), (x1_a, y2_KG)]
+            ]
+        elif y2_b <= y2_a <= y2_highlight:
+            possible_blocks = [
+                [(x1_KG, y2_highlight), (x2_KG, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_b, y2_KG)],
+                [(x2_highlight, y2_b), (x1_a, y2_KG)],
+                [(x2_highlight, y2_a), (x2_KG, y2_KG)]
+            ]
+        elif y2_a <= y2_highlight <= y2_b:
+            possible_blocks = [
+                [(x1_KG, y2_highlight), (x2_b, y2_KG)],
+                [(x1_KG, y2_b), (x2_KG, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_b, y2_KG)],
+                [(x1_a, y2_a), (x2_KG, y2_KG)]
+            ]
+        elif y2_a <= y2_b <= y2_highlight:
+            possible_blocks = [
+                [(x1_KG, y2_highlight), (x2_KG, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_b, y2_KG)],
+                [(x2_highlight, y2_b), (x2_KG, y2_KG)],
+                [(x1_a, y2_a), (x2_KG, y2_KG)]
+            ]
+    elif placement_type == 'comb2':
+        x1_a, y1_a = icon_coords[0]
+        x2_a, y2_a = icon_coords[3]
+        x1_b, y1_b = vis_coords[0]
+        x2_b, y2_b = vis_coords[3]
+        if x2_highlight > x2_b and y2_a <= y2_highlight:
+            possible_blocks = [
+                [(x1_KG, y2_b), (x2_KG, y2_KG)],
+                [(x2_b, y2_highlight), (x2_KG, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_a, y2_KG)],
+                [(x2_highlight, y2_a), (x2_KG, y2_KG)]
+            ]
+        elif x2_highlight > x2_b and y2_highlight <= y2_a <= y2_b:
+            possible_blocks = [
+                [(x1_KG, y2_b), (x2_KG, y2_KG)],
+                [(x2_b, y2_highlight), (x1_a, y2_KG)],
+                [(x2_b, y2_a), (x2_KG, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_a, y2_KG)]
+            ]
+        elif x2_highlight > x2_b and y2_a >= y2_b:
+            possible_blocks = [
+                [(x1_KG, y2_b), (x1_a, y2_KG)],
+                [(x1_KG, y2_a), (x2_KG, y2_KG)],
+                [(x2_b, y2_highlight), (x1_a, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_a, y2_KG)]
+            ]
+        elif x2_highlight <= x2_b and y2_a <= y2_highlight:
+            possible_blocks = [
+                [(x1_KG, y2_b), (x2_KG, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_a, y1_b)],
+                [(x2_b, y1_KG), (x1_a, y2_KG)] if x2_b < x1_a else [],
+                [(x2_b, y2_a), (x2_KG, y2_KG)]
+            ]
+            possible_blocks = [b for b in possible_blocks if b]  # Remove empty lists
+        elif x2_highlight <= x2_b and y2_highlight <= y2_a <= y2_b:
+            possible_blocks = [
+                [(x1_KG, y2_b), (x2_KG, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_a, y1_b)],
+                [(x2_b, y1_KG), (x1_a, y2_KG)],
+                [(x2_b, y2_a), (x2_KG, y2_KG)]
+            ]
+        elif x2_highlight <= x2_b and y2_a >= y2_b:
+            possible_blocks = [
+                [(x1_KG, y2_a), (x2_KG, y2_KG)],
+                [(x1_KG, y2_b), (x1_a, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_a, y1_b)],
+                [(x2_b, y1_KG), (x1_a, y2_KG)]
+            ]
+    elif placement_type == 'comb3':
+        x1_a, y1_a = icon_coords[0]
+        x2_a, y2_a = icon_coords[3]
+        x1_b, y1_b = vis_coords[0]
+        x2_b, y2_b = vis_coords[3]
+        if y2_highlight > y2_a and y2_b < y2_highlight and x1_a > x1_b:
+            possible_blocks = [
+                [(x1_KG, y2_highlight), (x2_KG, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_a, y2_a)],
+                [(x2_highlight, y1_KG), (x1_b, y2_KG)],
+                [(x2_highlight, y2_b), (x2_KG, y2_KG)]
+            ]
+        elif y2_highlight > y2_a and y2_b >= y2_highlight and x1_a > x1_b:
+            possible_blocks = [
+                [(x1_KG, y2_highlight), (x2_KG, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_a, y2_a)],
+                [(x2_highlight, y1_KG), (x1_b, y2_KG)],
+                [(x1_KG, y2_b), (x2_KG, y2_KG)]
+            ]
+        elif y2_highlight > y2_a and y2_b < y2_highlight and x1_a <= x1_b:
+            possible_blocks = [
+                [(x1_KG, y2_highlight), (x2_KG, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_a, y2_KG)],
+                [(x2_highlight, y2_a), (x1_b, y2_KG)],
+                [(x2_highlight, y2_b), (x2_KG, y2_KG)]
+            ]
+        elif y2_highlight > y2_a and y2_b >= y2_highlight and x1_a <= x1_b:
+            possible_blocks = [
+                [(x1_KG, y2_highlight), (x1_b, y2_KG)],
+                [(x1_KG, y2_b), (x2_KG, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_a, y2_KG)],
+                [(x2_highlight, y2_a), (x1_b, y2_KG)]
+            ]
+        elif y2_highlight <= y2_a and x1_b >= x1_a:
+            possible_blocks = [
+                [(x1_KG, y2_highlight), (x1_a, y2_KG)],
+                [(x1_KG, y2_a), (x1_b, y2_KG)],
+                [(x1_KG, y2_b), (x2_KG, y2_KG)],
+                [(x2_highlight, y1_KG), (x2_a, y2_KG)]
+            ]
+        elif y2_highlight <= y2_a and x1_b <= x2_highlight:
+            possible_blocks = [
+                [(x1_KG, y2_highlight), (x1_a, y2_a)],
+                [(x1_KG, y2_highlight), (x1_b, y2_KG)],
+                [(x1_KG, y2_b), (x2_KG, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_a, y2_a)]
+            ]
+        elif y2_highlight <= y2_a and x2_highlight <= x1_b <= x1_a:
+            possible_blocks = [
+                [(x1_KG, y2_highlight), (x1_a, y2_a)],
+                [(x1_KG, y2_highlight), (x1_b, y2_KG)],
+                [(x1_KG, y2_b), (x2_KG, y2_KG)],
+                [(x2_highlight, y1_KG), (x1_a, y2_a)],
+                [(x2_highlight, y1_KG), (x1_b, y2_KG)]
+            ]
+    elif placement_type == 'comb4':
+        x1_a, y1_a = icon_coords[0]
+        x2_a, y2_a = icon_coords[3]
+        x1_b, y1_b = vis_coords[0]
+        x2_b, y2_b = vis_coords[3]
+        if x2_a < x2_highlight and y1_b <= y2_highlight:
+            possible_blocks = [
+                [(x1_KG, y2_a), (x1_b, y2_KG)],
+                [(x2_a, y1_a), (x1_b, y2_KG)],
+                [(x2_highlight, y1_KG), (x2_KG, y1_b)],
+                [(x2_highlight, y1_KG), (x1_b, y2_KG)]
+            ]
+        elif x2_a < x2_highlight and y2_highlight <= y1_b <= y2_a and x1_b > x2_highlight:
+            possible_blocks = [
+                [(x1_KG, y2_a), (x1_b, y2_KG)],
+                [(x2_a, y1_a), (x1_b, y2_KG)],
+                [(x2_highlight, y1_KG), (x2_KG, y1_b)],
+                [(x2_highlight, y1_KG), (x1_b, y2_KG)],
+                [(x2_a, y1_a), (x2_KG, y1_b)]
+            ]
+        elif x2_a < x2_highlight and y2_highlight <= y1_b <= y2_a and x1_b <= x2_highlight:
+            possible_blocks = [
+                [(x1_KG, y2_a), (x1_b, y2_KG)],
+                [(x2_a, y1_a), (x1_b, y2_KG)],
+                [(x2_a, y1_a), (x2_KG, y1_b)],
+                [(x2_highlight, y1_KG), (x2_KG, y1_b)]
+            ]
+        elif x2_a < x2_highlight and y1_b >= y2_a and x1_b >= x2_highlight:
+            possible_blocks = [
+                [(x1_KG, y2_a), (x1_b, y2_KG)],
+                [(x2_a, y1_a), (x1_b, y2_KG)],
+                [(x2_highlight, y1_KG), (x2_KG, y1_b)],
+                [(x2_highlight, y1_KG), (x1_b, y2_KG)],
+                [(x2_a, y1_a), (x2_KG, y1_b)],
+                [(x1_KG, y2_a), (x2_KG, y1_b)]
+            ]
+        elif x2_a < x2_highlight and y1_b >= y2_a and x2_a <= x1_b <= x2_highlight:
+            possible_blocks = [
+                [(x1_KG, y2_a), (x1_b, y2_KG)],
+                [(x2_a, y1_a), (x1_b, y2_KG)],
+                [(x2_highlight, y1_KG), (x2_KG, y1_b)],
+                [(x2_a, y1_a), (x2_KG, y1_b)],
+                [(x1_KG, y2_a), (x2_KG, y1_b)]
+            ]
+        elif x2_a < x2_highlight and y1_b >= y2_a and x1_b <= x2_a:
+            possible_blocks = [
+                [(x1_KG, y2_a), (x1_b, y2_KG)],
+                [(x2_highlight, y1_KG), (x2_KG, y1_b)],
+                [(x2_a, y1_a), (x2_KG, y1_b)],
+                [(x1_KG, y2_a), (x2_KG, y1_b)]
+            ]
+        elif x2_a >= x2_highlight and y1_b <= y2_highlight:
+            possible_blocks = [
+                [(x1_KG, y2_a), (x1_b, y2_KG)],
+                [(x2_highlight, y1_KG), (x2_KG, y1_b)],
+                [(x2_highlight, y1_KG), (x1_b, y1_a)],
+                [(x2_a, y1_KG), (x1_b, y2_KG)]
+            ]
+        elif x2_a >= x2_highlight and y2_highlight <= y1_b <= y2_a:
+            possible_blocks = [
+                [(x1_KG, y2_a), (x1_b, y2_KG)],
+                [(x2_highlight, y1_KG), (x2_KG, y2_a)],
+                [(x2_a, y1_KG), (x1_b, y2_KG)],
+                [(x2_a, y1_KG), (x2_KG, y1_b)]
+            ]
+        elif x2_a >= x2_highlight and y1_b >= y2_a and x1_b > x2_a:
+            possible_blocks = [
+                [(x1_KG, y2_a), (x1_b, y2_KG)],
+                [(x1_KG, y2_a), (x2_KG, y1_b)],
+                [(x2_highlight, y1_KG), (x2_KG, y2_a)],
+                [(x2_a, y1_KG), (x1_b, y2_KG)],
+                [(x2_a, y1_KG), (x2_KG, y1_b)]
+            ]
+        elif x2_a >= x2_highlight and y1_b >= y2_a and x1_b <= x2_a:
+            possible_blocks = [
+                [(x1_KG, y2_a), (x1_b, y2_KG)],
+                [(x1_KG, y2_a), (x2_KG, y1_b)],
+                [(x2_highlight, y1_KG), (x2_KG, y2_a)],
+                [(x2_a, y1_KG), (x2_KG, y1_b)]
+            ]
+    else:  # No placement (no Icon or Vis)
+        possible_blocks = [
+            [(x1_KG, y2_highlight), (x2_KG, y2_KG)],
+            [(x2_highlight, y1_KG), (x2_KG, y2_KG)]
+        ]
+
+    # Find the block with maximum area
+    max_area = -1
+    best_block = None
+    for (x1, y1), (x2, y2) in possible_blocks:
+        # Ensure coordinates are within KG bounds
+        x1 = max(x1_KG, min(x2_KG, x1))
+        x2 = max(x1_KG, min(x2_KG, x2))
+        y1 = max(y1_KG, min(y2_KG, y1))
+        y2 = max(y1_KG, min(y2_KG, y2))
+        if x1 < x2 and y1 < y2:  # Valid rectangle
+            area = (x2 - x1) * (y2 - y1)
+            if area > max_area:
+                max_area = area
+                best_block = (x1, y1, x2, y2)
+
+    if best_block:
+        x1, y1, x2, y2 = best_block
+        kg["Text"] = [
+            [x1, y1], [x2, y1],
+            [x1, y2], [x2, y2]
+        ]
+    else:
+        kg["Text"] = None
+
+    return kg, h_KG
+
+
+def layout_kgs(spec, layout_VG, knowledges, x, kg_x, kg_width, y, vertical_margin):
+    """
+    Stacks the KGs of a VG top to bottom from y into layout_VG (keys KG1, KG2, ...).
+
+    Returns:
+        y below the last KG.
+    """
+    n_KG = len(knowledges)
+    for j, KG in enumerate(knowledges, 1):
+        layout_VG[f"KG{j}"], h_KG = layout_kg(spec, KG, x, kg_x, kg_width, y)
+        y += h_KG
+        if j < n_KG:
+            y += vertical_margin
+    return y
+
+
+def _box(x, y, w, h):
+    return [[x, y], [x + w, y], [x, y + h], [x + w, y + h]]
+
+
+def _kg_span(x_VG, w_VG, n_KG, margin):
+    """x-position and width of the KGs in a VG; VGs with several KGs keep a horizontal margin."""
+    if n_KG == 1:
+        return x_VG, w_VG
+    return x_VG + margin, w_VG - 2 * margin
+
+
+def _subtitle(layout_VG, x_VG, w_VG, y, x, n_KG, vertical_margin):
+    """Places the VG subtitle at y and returns the y where its first KG starts."""
+    layout_VG["Subtitle"] = _box(x_VG, y, w_VG, 1.5 * x)
+    y = y + 1.5 * x
+    if n_KG > 1:
+        y += vertical_margin
+    return y
+
+
+def arrange_stack(spec, VGs, W, H, margin, vertical_margin):
+    """
+    VGs stacked top to bottom at full width (portrait). The font size x makes the poster exactly H tall:
+    the title takes 3x, each subtitle 1.5x and each KG its area divided by its width.
+    """
+    a = 3.0 + 1.5 * len(VGs)
+    b = 0.0
+    c = 0.0
+    for VG in VGs:
+        knowledges = VG["knowledges"]
+        n_KG = len(knowledges)
+        kg_width = W if n_KG == 1 else W - 2 * margin
+        if n_KG > 1:
+            c += (n_KG - 1) * vertical_margin
+        for KG in knowledges:
+            n_images = (1 if KG["icon_keyword"] != "" else 0) + (1 if KG["visualization"]["is_visualization"] else 0)
+            s_KG = (text_width(KG["knowledge_content"], 1.0) * (1 + n_images)
+                    + 4 * highlight_width(KG["first_level_highlight"], 1.0))
+            b += s_KG / kg_width
+    # b * x^2 + a * x + c = H
+    x = solve_font_size(a, b, c - H)
+
+    layout = {"Title": [[0.0, 0.0], [W, 0.0], [0.0, 3.0 * x], [W, 3.0 * x]]}
+    y = 3.0 * x
+    for i, VG in enumerate(VGs, 1):
+        knowledges = VG["knowledges"]
+        n_KG = len(knowledges)
+        kg_width = W if n_KG == 1 else W - 2 * margin
+        kg_x = 0.0 if n_KG == 1 else margin
+
+        layout_VG = layout[f"VG{i}"] = {}
+        y_VG_start = y
+        layout_VG["Subtitle"] = [[0.0, y], [W, y], [0.0, y + 1.5 * x], [W, y + 1.5 * x]]
+        y += 1.5 * x
+        if n_KG > 1:
+            y += vertical_margin
+        y = layout_kgs(spec, layout_VG, knowledges, x, kg_x, kg_width, y, vertical_margin)
+        layout_VG["coords"] = [[0.0, y_VG_start], [W, y_VG_start], [0.0, y], [W, y]]
+    return layout
+
+
+def arrange_columns(spec, VGs, W, H, margin, vertical_margin):
+    """
+    VGs side by side below the title (landscape), each as wide as its share of the content area
+    needs to fill the remaining height; the widths are then scaled to add up to W.
+    """
+    a = 3.0 * W  # From title height 3x
+    b = 0.0
+    c = - H * W  # Total available area term
+    for VG in VGs:
+        for KG in VG["knowledges"]:
+            b += content_coefficient(KG)
+    x = solve_font_size(a, b, c)
+
+    h_title = 3.0 * x
+    h_remain = H - h_title
+    w_VG_ideals = []
+    for VG in VGs:
+        knowledges = VG["knowledges"]
+        n_KG = len(knowledges)
+        A_VG = 0.0
+        for KG in knowledges:
+            A_VG += kg_area(KG, x)
+        if n_KG == 1:
+            denominator = h_remain - 1.5 * x
+        else:
+            denominator = h_remain - 1.5 * x - (n_KG - 1) * vertical_margin
+        w_VG_ideals.append(A_VG / denominator if denominator > 0 else 0.0)
+
+    # Scale widths to fit total width W
+    W_ideal = sum(w_VG_ideals)
+    scaling_factor = W / W_ideal if W_ideal > 0 else 1.0
+    w_VGs = [w * scaling_factor for w in w_VG_ideals]
+
+    layout = {"Title": [[0.0, 0.0], [W, 0.0], [0.0, h_title], [W, h_title]]}
+    x_VG = 0.0
+    for i, (VG, w_VG) in enumerate(zip(VGs, w_VGs), 1):
+        knowledges = VG["knowledges"]
+        n_KG = len(knowledges)
+        kg_x, kg_width = _kg_span(x_VG, w_VG, n_KG, margin)
+
+        layout_VG = layout[f"VG{i}"] = {}
+        y = _subtitle(layout_VG, x_VG, w_VG, h_title, x, n_KG, vertical_margin)
+        layout_kgs(spec, layout_VG, knowledges, x, kg_x, kg_width, y, vertical_margin)
+        # VG spans from h_title to H
+        layout_VG["coords"] = [[x_VG, h_title], [x_VG + w_VG, h_title], [x_VG, H], [x_VG + w_VG, H]]
+        x_VG += w_VG
+    return layout
+
+
+def arrange_rows(spec, VGs, W, H, margin, vertical_margin):
+    """
+    Rows of Super Groups (SGs) from spec.structures; VGs within an SG have widths proportional to their
+    content areas and the SG is as tall as its tallest VG. Optionally reorders the VGs first
+    (spec.reorder) and shrinks some VGs afterwards (spec.shrink).
+    """
+    n_VG = len(VGs)
+    sg_structure = spec.structure(n_VG)
+    order = spec.reorder[n_VG] if spec.reorder else None
+    if order is not None:
+        VGs = [VGs[i] for i in order]
+    n_SG = len(sg_structure)
+
+    # b * x^2 + a * x + c = 0: title (3x * W) and one subtitle row (1.5x * W) per SG
+    a = 3.0 * W + 1.5 * n_SG * W
+    b = 0.0
+    c = -H * W
+    vg_areas = []
+    for VG in VGs:
+        sum_s_KG = 0.0
+        for KG in VG["knowledges"]:
+            s_KG = content_coefficient(KG)
+            sum_s_KG += s_KG
+            b += s_KG
+        vg_areas.append(sum_s_KG)
+    for VG in VGs:
+        n_KG = len(VG["knowledges"])
+        if n_KG > 1:
+            c += (n_KG - 1) * vertical_margin * W
+    x = solve_font_size(a, b, c)
+
+    layout = {"Title": [[0.0, 0.0], [W, 0.0], [0.0, 3.0 * x], [W, 3.0 * x]]}
+    y = 3.0 * x
+    for sg in sg_structure:
+        total_area_in_sg = sum(vg_areas[i] for i in sg) if sg else 0.0
+        w_VGs = [W * (vg_areas[i] / total_area_in_sg) if total_area_in_sg > 0 else W for i in sg]
+        vg_heights = []
+        x_VG = 0.0
+        for vg_idx, w_VG in zip(sg, w_VGs):
+            knowledges = VGs[vg_idx]["knowledges"]
+            n_KG = len(knowledges)
+            kg_x, kg_width = _kg_span(x_VG, w_VG, n_KG, margin)
+
+            layout_VG = layout[f"VG{vg_idx + 1}"] = {}
+            y_VG = _subtitle(layout_VG, x_VG, w_VG, y, x, n_KG, vertical_margin)
+            y_VG = layout_kgs(spec, layout_VG, knowledges, x, kg_x, kg_width, y_VG, vertical_margin)
+            vg_heights.append(y_VG - y)
+            x_VG += w_VG
+
+        h_SG = max(vg_heights) if vg_heights else 0.0
+        x_VG = 0.0
+        for vg_idx, w_VG in zip(sg, w_VGs):
+            layout[f"VG{vg_idx + 1}"]["coords"] = _box(x_VG, y, w_VG, h_SG)
+            x_VG += w_VG
+        y += h_SG
+
+    if order is not None:
+        # Map VG keys back to the original VG indices
+        reordered, layout = layout, {"Title": layout["Title"]}
+        inverse_order = [order.index(i) for i in range(n_VG)]
+        for i, orig_idx in enumerate(inverse_order):
+            key = f"VG{orig_idx + 1}"
+            if key in reordered:
+                layout[f"VG{i + 1}"] = reordered[key]
+    if spec.shrink:
+        shrink_vgs(layout, spec.shrink.get(n_VG, []), W, H)
+    return layout
+
+
+def _scale_points(points, ref_x, ref_y, sx, sy):
+    return [[(x - ref_x) * sx + ref_x, (y - ref_y) * sy + ref_y] for x, y in points]
+
+
+def shrink_vgs(layout, rules, W, H):
+    """
+    Shrinks VGs in place by SHRINK_ALPHA / 2 * min(W, H) horizontally and SHRINK_ALPHA * min(W, H)
+    vertically, about their vertical center and their left or right edge.
+
+    Args:
+        rules: [(VG key, anchor at left edge, 'both' | 'horizontal' | 'vertical')].
+    """
+    min_HW = min(H, W)
+    new_width = SHRINK_ALPHA / 2 * min_HW
+    new_height = SHRINK_ALPHA * min_HW
+    for VG_key, use_left, direction in rules:
+        layout_VG = layout.get(VG_key)
+        if layout_VG is None:
+            continue
+        coords = layout_VG["coords"]
+        x_left = min(p[0] for p in coords)
+        x_right = max(p[0] for p in coords)
+        y_top = min(p[1] for p in coords)
+        y_bottom = max(p[1] for p in coords)
+        old_width = x_right - x_left
+        old_height = y_bottom - y_top
+
+        ref_x = x_left if use_left else x_right
+        ref_y = (y_top + y_bottom) / 2
+        sx = 1 - new_width / old_width if old_width > 0 and direction in ['both', 'horizontal'] else 1
+        sy = 1 - new_height / old_height if old_height > 0 and direction in ['both', 'vertical'] else 1
+
+        layout_VG["coords"] = _scale_points(coords, ref_x, ref_y, sx, sy)
+        if "Subtitle" in layout_VG:
+            layout_VG["Subtitle"] = _scale_points(layout_VG["Subtitle"], ref_x, ref_y, sx, sy)
+        for kg_key, kg in layout_VG.items():
+            if kg_key.startswith("KG"):
+                for part in ("coords", "Highlight", "Icon", "Vis", "Text"):
+                    if kg.get(part) is not None:
+                        kg[part] = _scale_points(kg[part], ref_x, ref_y, sx, sy)
+
+
+def _vg_index(label, n_original):
+    """1-based VG label -> index; labels past the original VGs are the virtual VG."""
+    return label - 1 if label <= n_original else n_original
+
+
+def _vg_height(VG, w_VG, x, margin, vertical_margin):
+    if VG.get("is_virtual", False):
+        return 0.0
+    knowledges = VG["knowledges"]
+    n_KG = len(knowledges)
+    kg_width = w_VG if n_KG == 1 else w_VG - 2 * margin
+    h_VG = 1.5 * x  # Subtitle height
+    if n_KG > 1:
+        h_VG += vertical_margin
+    for KG in knowledges:
+        A_KG = kg_area(KG, x)
+        h_VG += A_KG / kg_width if kg_width > 0 else 0.0
+        if n_KG > 1:
+            h_VG += vertical_margin
+    if n_KG > 1:
+        h_VG -= vertical_margin  # Remove extra margin at the end
+    return h_VG
+
+
+def _element_labels(element):
+    """VG labels of an SGH element: a single label or an ('SGV', [labels]) column."""
+    if isinstance(element, int):
+        return [element]
+    if isinstance(element, tuple) and element[0] == 'SGV':
+        return element[1]
+    return []
+
+
+def arrange_nested(spec, VGs, W, H, margin, vertical_margin):
+    """
+    Rows (SGHs) of VGs and stacked VG columns (SGVs) from spec.structures, around a virtual VG whose
+    area is 1/4 of the non-subtitle parts of all VGs and which stays empty (star).
+    """
+    n_original_VG = len(VGs)
+    structure = spec.structure(n_original_VG)
+    VGs = VGs + [{"knowledges": [], "is_virtual": True}]
+
+    # b * x^2 + a * x + c = 0: title (3x * W) and one subtitle row (1.5x * W) per SGH;
+    # stacked SGVs add another subtitle row
+    has_sgv = any(isinstance(element, tuple) for _, elements in structure for element in elements)
+    a = 3.0 * W + 1.5 * (len(structure) + has_sgv) * W
+    b = 0.0
+    c = -H * W
+    vg_areas = []
+    for VG in VGs[:n_original_VG]:
+        sum_s_KG = 0.0
+        for KG in VG["knowledges"]:
+            s_KG = content_coefficient(KG)
+            sum_s_KG += s_KG
+            b += s_KG
+        vg_areas.append(sum_s_KG)
+    b *= 5/4
+    vg_areas.append(sum(vg_areas) / 4)
+    for VG in VGs[:n_original_VG]:
+        n_KG = len(VG["knowledges"])
+        if n_KG > 1:
+            c += (n_KG - 1) * vertical_margin * W
+    x = solve_font_size(a, b, c)
+
+    layout = {"Title": [[0.0, 0.0], [W, 0.0], [0.0, 3.0 * x], [W, 3.0 * x]]}
+    y = 3.0 * x
+    for kind, elements in structure:
+        assert kind == 'SGH'
+        columns = [[_vg_index(label, n_original_VG) for label in _element_labels(element)] for element in elements]
+        areas = [sum(vg_areas[i] for i in column) if isinstance(element, tuple) else vg_areas[column[0]]
+                 for element, column in zip(elements, columns)]
+        total_area_in_sgh = sum(areas)
+        widths = [W * (area / total_area_in_sgh) if total_area_in_sgh > 0 else W / len(elements) for area in areas]
+        heights = [[_vg_height(VGs[i], w, x, margin, vertical_margin) for i in column]
+                   for w, column in zip(widths, columns)]
+        element_heights = [sum(column) if isinstance(element, tuple) else column[0]
+                           for element, column in zip(elements, heights)]
+        h_SGH = max(element_heights) if element_heights else 0.0
+
+        x_start = 0.0
+        for element, column, w_VG, column_heights in zip(elements, columns, widths, heights):
+            y_VG = y
+            for vg_idx, h_VG in zip(column, column_heights):
+                # A single VG fills the SGH height, VGs in an SGV keep their own heights
+                h_VG = h_SGH if isinstance(element, int) else h_VG
+                layout_VG = layout[f"VG{vg_idx + 1}"] = {"coords": _box(x_start, y_VG, w_VG, h_VG)}
+                VG = VGs[vg_idx]
+                if not VG.get("is_virtual", False):
+                    knowledges = VG["knowledges"]
+                    n_KG = len(knowledges)
+                    kg_x, kg_width = _kg_span(x_start, w_VG, n_KG, margin)
+                    y_KG = _subtitle(layout_VG, x_start, w_VG, y_VG, x, n_KG, vertical_margin)
+                    layout_kgs(spec, layout_VG, knowledges, x, kg_x, kg_width, y_KG, vertical_margin)
+                y_VG += h_VG
+            x_start += w_VG
+        y += h_SGH
+    return layout
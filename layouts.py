@@ -0,0 +1,196 @@
+import importlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Optional
+
+from font_metrics import color_scheme_metrics
+from layout_cache import default_layout_cache, layout_shape_key, parser_result_hash
+from layout_kernel import TEMPLATES, get_template, layout_template
+from placement import PLACEMENT_ENUMERATE, use_placement
+from text_metrics import use_metrics
+from util import add_padding_to_layout
+
+# 模板名（含前端使用的别名）-> 布局引擎模块
+LAYOUT_TYPES = {
+    "portrait": "portrait", "Portrait": "portrait",
+    "landscape": "landscape", "Landscape": "landscape",
+    "grid": "grid", "Grid": "grid",
+    "grid_protrait": "grid_protrait", "PortraitGrid": "grid_protrait",
+    "star": "star", "Star": "star",
+    "spiral": "spiral", "Spiral": "spiral",
+}
+LAYOUT_MODULES = ("portrait", "landscape", "grid", "grid_protrait", "star", "spiral")
+# 其它模板通过 layout_kernel.register_template 注册，按注册的模板名或别名使用
+# /layout/all 的进程池大小，默认等于 CPU 核数；为 1 时在当前进程中依次计算
+LAYOUT_WORKERS = int(os.getenv("LAYOUT_WORKERS", os.cpu_count() or 1))
+# 未加 padding 的布局随 (W, H, margin, vertical_margin) 等比缩放的模板，
+# 见 benchmarks/bench_layout_cache.py 对缩放结果与重新计算的比对；
+# layout_kernel 的各种排列方式都是等比的，注册的模板同样可以缩放
+SCALE_INVARIANT = set(LAYOUT_MODULES)
+
+
+def layout_name(type: str) -> str:
+    """模板名或别名对应的模板名（内置模板为引擎模块名），未知模板抛出 ValueError。"""
+    name = LAYOUT_TYPES.get(type)
+    if name is None:
+        name = get_template(type).name
+    return name
+
+
+def engine(type: str):
+    """按模板名导入对应的布局引擎模块。"""
+    return importlib.import_module(layout_name(type))
+
+
+def template(type: str):
+    """模板名或别名对应的 TemplateSpec；内置模板在引擎模块导入时注册。"""
+    name = layout_name(type)
+    if name in LAYOUT_MODULES and name not in TEMPLATES:
+        importlib.import_module(name)
+    return get_template(name)
+
+
+def preload_engines():
+    """导入全部内置布局引擎并注册模板，服务启动时调用，避免第一次排版请求时才导入。"""
+    for name in LAYOUT_MODULES:
+        template(name)
+
+
+def _scalable(name: str) -> bool:
+    return name in SCALE_INVARIANT or name in TEMPLATES
+
+
+def font_key(color_scheme):
+    if color_scheme is None:
+        return None
+    return color_scheme.text_font, color_scheme.first_level_font
+
+
+def raw_layout(type: str, valentine_data: dict, W, H, margin=0, vertical_margin=0, color_scheme=None,
+               placement=PLACEMENT_ENUMERATE) -> dict:
+    """
+    不经缓存计算未加 padding 的布局；有配色方案时按其中字体的真实字宽排版。
+    placement 为图片摆放方式，见 placement.PLACEMENT_MODES。
+    """
+    return _raw_layout(template(type), valentine_data, W, H, margin, vertical_margin, color_scheme, placement)
+
+
+def _raw_layout(spec, valentine_data: dict, W, H, margin, vertical_margin, color_scheme, placement) -> dict:
+    # 进程池中直接传 TemplateSpec，子进程无需导入注册它的模块
+    with use_metrics(**color_scheme_metrics(color_scheme)), use_placement(placement):
+        return layout_template(spec, valentine_data, W, H, margin, vertical_margin)
+
+
+def layout_poster(type: str, valentine_data: dict, W, H, margin=0, vertical_margin=0, color_scheme=None,
+                  cache=None, placement=PLACEMENT_ENUMERATE) -> dict:
+    """
+    计算加 padding 后的布局，结果按 parser_result 内容、模板、归一化宽高比、边距、字体和摆放方式缓存。
+    参数：
+        cache: LayoutCache，默认使用进程级共享缓存
+        placement: 图片摆放方式，enumerate（按候选宽高比穷举）或 analytic（解析求解）
+    返回：
+        与各引擎 layout_poster 相同格式的布局
+    """
+    name = layout_name(type)
+    cache = cache or default_layout_cache()
+    key = layout_shape_key(parser_result_hash(valentine_data), name, W, H, margin, vertical_margin,
+                           font_key(color_scheme), placement)
+    layout, _ = cache.get_or_compute(
+        key, W, H,
+        compute=lambda: raw_layout(name, valentine_data, W, H, margin, vertical_margin, color_scheme, placement),
+        pad=add_padding_to_layout,
+        scalable=_scalable(name),
+    )
+    return layout
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn 避免在带线程的服务进程（事件循环、线程池）中 fork
+            _pool = ProcessPoolExecutor(max_workers=LAYOUT_WORKERS, mp_context=get_context("spawn"))
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """子进程异常退出后进程池不可再用，丢弃后下次调用重新创建。"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _layout_error(type: str, e: BaseException) -> dict:
+    return {"type": type, "layout": None, "error": {"kind": e.__class__.__name__, "message": str(e)}}
+
+
+def layout_all(types: list[str], valentine_data: dict, W, H, margin=0, vertical_margin=0, color_scheme=None,
+               cache=None, workers: Optional[int] = None, placement=PLACEMENT_ENUMERATE) -> list[dict]:
+    """
+    按 types 的顺序计算多个模板的布局：缓存中没有的模板分发到进程池并行求解，结果写回缓存。
+    单个模板出错（如 VG 超过 10 个、字号无解）不影响其它模板。
+    返回：
+        [{"type": 模板名, "layout": 布局或 None, "error": None 或 {"kind": 异常类型, "message": 异常信息}}]
+    """
+    cache = cache or default_layout_cache()
+    workers = LAYOUT_WORKERS if workers is None else workers
+    content_hash = parser_result_hash(valentine_data)
+    results: dict[str, dict] = {}
+    pending = []
+    for type in types:
+        try:
+            name = layout_name(type)
+        except ValueError as e:
+            results[type] = _layout_error(type, e)
+            continue
+        key = layout_shape_key(content_hash, name, W, H, margin, vertical_margin, font_key(color_scheme), placement)
+        cached = cache.get(key, W, H, add_padding_to_layout, scalable=_scalable(name))
+        if cached is not None:
+            results[type] = {"type": type, "layout": cached[0], "error": None}
+        else:
+            pending.append((type, name, key))
+
+    args = (valentine_data, W, H, margin, vertical_margin, color_scheme, placement)
+    if workers > 1 and len(pending) > 1:
+        pool = _get_pool()
+        futures = [(type, key, pool.submit(_raw_layout, template(name), *args)) for type, name, key in pending]
+        outcomes = []
+        for type, key, future in futures:
+            try:
+                outcomes.append((type, key, future.result(), None))
+            except BrokenProcessPool as e:
+                _discard_pool(pool)
+                outcomes.append((type, key, None, e))
+            except Exception as e:
+                outcomes.append((type, key, None, e))
+    else:
+        outcomes = []
+        for type, name, key in pending:
+            try:
+                outcomes.append((type, key, raw_layout(name, *args), None))
+            except Exception as e:
+                outcomes.append((type, key, None, e))
+
+    for type, key, raw, error in outcomes:
+        if error is not None:
+            results[type] = _layout_error(type, error)
+        else:
+            results[type] = {"type": type, "layout": cache.put(key, W, H, raw, add_padding_to_layout), "error": None}
+    return [results[type] for type in types]
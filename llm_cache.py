@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+from cache import DiskLRUCache
+
+# 各阶段缓存的默认有效期（秒），None 表示不过期
+DEFAULT_STAGE_TTLS: dict[str, Optional[float]] = {
+    "title": 7 * 24 * 3600,
+    "subtasks": 7 * 24 * 3600,
+    "knowledges": 7 * 24 * 3600,
+    "visualization": 30 * 24 * 3600,
+    "colors": 24 * 3600,
+}
+
+
+def _cached_completion(content: Optional[str] = None, parsed=None):
+    """构造与 ChatCompletion 结构相同的对象，调用方无需区分是否命中缓存。"""
+    message = SimpleNamespace(content=content, parsed=parsed)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None, cached=True)
+
+
+class LLMCache:
+    """
+    结构化 LLM 调用的两级缓存：进程内有界 LRU + 磁盘 DiskLRUCache。
+    缓存键为 (model, messages, response_format 的 JSON schema, 其余请求参数)，
+    只要消息相同就会命中，与所属文档无关。
+    异步方法中内存层命中直接返回，磁盘层的 SQLite 读写放到线程中执行，不阻塞事件循环。
+    """
+
+    def __init__(
+        self,
+        disk: Optional[DiskLRUCache] = None,
+        memory_items: int = 1024,
+        stage_ttls: Optional[dict[str, Optional[float]]] = None,
+        default_ttl: Optional[float] = None,
+    ):
+        self.disk = disk
+        self.memory_items = memory_items
+        self.stage_ttls = {**DEFAULT_STAGE_TTLS, **(stage_ttls or {})}
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, tuple[Optional[float], str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, messages: list, response_format=None, **kwargs) -> str:
+        if isinstance(response_format, type) and hasattr(response_format, "model_json_schema"):
+            schema = response_format.model_json_schema()
+        else:
+            schema = response_format
+        payload = json.dumps(
+            {"model": model, "messages": messages, "schema": schema, "kwargs": kwargs},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+        return None
+
+    def _get_disk(self, key: str) -> Optional[str]:
+        entry = self.disk.get_entry(key) if self.disk is not None else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        # 磁盘命中时回填内存层，沿用磁盘条目的过期时间
+        value, expires_at = entry[0].decode("utf-8"), entry[1]
+        self._remember(key, value, expires_at)
+        return value
+
+    def _get(self, key: str) -> Optional[str]:
+        value = self._get_memory(key)
+        return value if value is not None else self._get_disk(key)
+
+    async def _aget(self, key: str) -> Optional[str]:
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        if self.disk is None:
+            return self._get_disk(key)  # 只计入未命中，没有磁盘 I/O
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def _remember(self, key: str, value: str, expires_at: Optional[float]):
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _set(self, key: str, value: str, stage: str):
+        ttl = self._remember_stage(key, value, stage)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl=ttl)
+
+    async def _aset(self, key: str, value: str, stage: str):
+        ttl = self._remember_stage(key, value, stage)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value, ttl)
+
+    def _remember_stage(self, key: str, value: str, stage: str) -> Optional[float]:
+        ttl = self.stage_ttls.get(stage, self.default_ttl)
+        self._remember(key, value, time.time() + ttl if ttl is not None else None)
+        return ttl
+
+    @staticmethod
+    def _cached_parse(cached: Optional[str], response_format, validate: Optional[Callable]):
+        """缓存的解析结果；未命中、条目损坏或 schema 已变化、未通过 validate（如此前写入的不完整结果）时返回 None，视为未命中。"""
+        if cached is None:
+            return None
+        try:
+            parsed = response_format.model_validate_json(cached)
+        except ValueError:  # pydantic 的 ValidationError 是 ValueError 的子类
+            return None
+        if validate is not None and not validate(parsed):
+            return None
+        return _cached_completion(content=cached, parsed=parsed)
+
+    @staticmethod
+    def _parsed_to_cache(completion, validate: Optional[Callable]) -> Optional[str]:
+        parsed = completion.choices[0].message.parsed
+        if parsed is None or (validate is not None and not validate(parsed)):
+            return None
+        return parsed.model_dump_json()
+
+    def parse(self, client, stage: str, *, model: str, messages: list, response_format, bypass: bool = False,
+              validate: Optional[Callable] = None, **kwargs):
+        """
+        带缓存的 client.beta.chat.completions.parse；bypass=True 时跳过读取但仍写入缓存。
+        validate(parsed) 返回 False 的结果不写入缓存（调用方会拒绝并重试的结果不应在之后被读回）。
+        """
+        key = self.make_key(model, messages, response_format, **kwargs)
+        if not bypass:
+            cached = self._cached_parse(self._get(key), response_format, validate)
+            if cached is not None:
+                return cached
+        completion = client.beta.chat.completions.parse(
+            model=model, messages=messages, response_format=response_format, **kwargs
+        )
+        value = self._parsed_to_cache(completion, validate)
+        if value is not None:
+            self._set(key, value, stage)
+        return completion
+
+    def create(self, client, stage: str, *, model: str, messages: list, bypass: bool = False, **kwargs):
+        """带缓存的 client.chat.completions.create，缓存返回的文本内容。"""
+        key = self.make_key(model, messages, **kwargs)
+        if not bypass:
+            cached = self._get(key)
+            if cached is not None:
+                return _cached_completion(content=cached)
+        completion = client.chat.completions.create(model=model, messages=messages, **kwargs)
+        content = completion.choices[0].message.content
+        if content is not None:
+            self._set(key, content, stage)
+        return completion
+
+    async def aparse(self, client, stage: str, *, model: str, messages: list, response_format, bypass: bool = False,
+                     validate: Optional[Callable] = None, **kwargs):
+        key = self.make_key(model, messages, response_format, **kwargs)
+        if not bypass:
+            cached = self._cached_parse(await self._aget(key), response_format, validate)
+            if cached is not None:
+                return cached
+        completion = await client.beta.chat.completions.parse(
+            model=model, messages=messages, response_format=response_format, **kwargs
+        )
+        value = self._parsed_to_cache(completion, validate)
+        if value is not None:
+            await self._aset(key, value, stage)
+        return completion
+
+    async def acreate(self, client, stage: str, *, model: str, messages: list, bypass: bool = False, **kwargs):
+        key = self.make_key(model, messages, **kwargs)
+        if not bypass:
+            cached = await self._aget(key)
+            if cached is not None:
+                return _cached_completion(content=cached)
+        completion = await client.chat.completions.create(model=model, messages=messages, **kwargs)
+        content = completion.choices[0].message.content
+        if content is not None:
+            await self._aset(key, content, stage)
+        return completion
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {"hits": self.hits, "misses": self.misses, "memory_entries": len(self._memory)}
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
+
+
+_default_cache: Optional[LLMCache] = None
+_default_lock = threading.Lock()
+
+
+def default_llm_cache() -> LLMCache:
+    """进程级共享的 LLM 缓存，磁盘文件位于 CACHE_DIR/llm_calls.sqlite。"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            disk = DiskLRUCache(
+                os.path.join(os.getenv("CACHE_DIR", "cache"), "llm_calls.sqlite"),
+                max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", 128 * 1024 * 1024)),
+            )
+            _default_cache = LLMCache(disk, memory_items=int(os.getenv("LLM_CACHE_MEMORY_ITEMS", 1024)))
+        return _default_cache
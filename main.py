@@ -1,23 +1,55 @@
+import asyncio
 import json
 import os
-import uuid
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
-from openai import OpenAI
-from pdf_parser import ColorScheme, ParserResult, PdfParser
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from pdf_parser import ColorScheme, ParserResult, PdfParser, VisualizationBatchStats, parser_result_cache_key
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from icon import scale_creation
+from icon import collect_icon_requests
+from icon_cache import default_icon_cache
+from upload_store import save_upload
+from pdf_extract import BACKENDS
+from text_cache import default_text_cache
+from retrieval import default_retrieval_cache
+from layout_cache import default_layout_cache
+from placement import PLACEMENT_ENUMERATE, PLACEMENT_MODES
+from cache import DiskLRUCache
+from llm_cache import default_llm_cache
+from jobs import SUCCEEDED, Job, JobQueue, JobStore
+from prompt_registry import default_prompt_registry
+from clients import Clients, create_clients
 from pydantic import BaseModel
-import requests
-
-import time
-import requests
 
+import layouts
+import pdf_extract
+import util
 from util import reorder_valentine_data
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 预加载全部提示词和布局引擎
+    default_prompt_registry()
+    layouts.preload_engines()
+    # 创建带连接池的共享 client，所有请求复用同一组 TCP/TLS 连接
+    app.state.clients = create_clients()
+    util.set_client(app.state.clients.openai)
+    # 结果缓存和任务库在启动时才创建，导入 main 的脚本不会在工作目录生成 SQLite 文件
+    app.state.result_cache = DiskLRUCache(os.path.join(CACHE_DIR, "parser_results.sqlite"), max_bytes=RESULT_CACHE_MAX_BYTES)
+    # 启动解析任务的 worker，并重新入队上次未完成的任务
+    app.state.job_queue = JobQueue(JobStore(JOB_DB), parse_job, workers=JOB_WORKERS)
+    app.state.job_queue.start()
+    yield
+    await app.state.job_queue.stop()
+    await app.state.clients.aclose()
+    layouts.shutdown_pool()
+    pdf_extract.shutdown_pool()
+
 #print(os.getenv("OPENAI_KEY"))
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,37 +61,165 @@ app.add_middleware(
 
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+# 设置 USE_MOCK_RESULT=1 时解析任务直接返回 result.json，不调用 LLM
+USE_MOCK_RESULT = os.getenv("USE_MOCK_RESULT") == "1"
+PARSER_MODEL = os.getenv("PARSER_MODEL", "gpt-4o-mini")
+# 流式解析时同时在途的 LLM 请求上限
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+# 可视化分类的批处理方式：none 逐条请求，subtask 按子任务合并，document 整篇文档合并为一次请求
+VISUALIZATION_BATCH = os.getenv("VISUALIZATION_BATCH", "none")
+if VISUALIZATION_BATCH not in ("none", "subtask", "document"):
+    raise ValueError(f"VISUALIZATION_BATCH 只能是 none / subtask / document，收到 {VISUALIZATION_BATCH!r}")
+# 本进程内所有解析累计的批处理统计，通过 /cache/stats 查看
+batch_stats_total = VisualizationBatchStats()
+
+CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+# 以 (文档哈希, 问题, 模型, 提示词版本) 为键缓存完整的 ParserResult，在 lifespan 中创建
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# 后台解析任务持久化到 SQLite；JOB_WORKERS 为同时执行的任务数
+JOB_DB = os.getenv("JOB_DB", "jobs.sqlite")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+# /icons 批量生成时同时进行的图标请求数
+ICON_BATCH_CONCURRENCY = int(os.getenv("ICON_BATCH_CONCURRENCY", 6))
+
+def get_clients(request: Request) -> Clients:
+    return request.app.state.clients
+
+def get_result_cache(request: Request) -> DiskLRUCache:
+    return request.app.state.result_cache
+
+def get_job_queue(request: Request) -> JobQueue:
+    return request.app.state.job_queue
 
 @app.get("/")
 def hello():
     return "hello"
 
-@app.post("/upload",response_model=ParserResult)
-def upload_pdf(question: str = Form(...), file: UploadFile = File(...)):
-       
-    '''
-     if file.filename and not file.filename.endswith(".pdf"):
-         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+async def build_parser(file_path: str, question: str, doc_id: str, pdf_backend: str | None = None) -> PdfParser:
+    clients: Clients = app.state.clients
+    # PDF 文本提取是同步的 CPU 操作，放到线程池中执行
+    return await run_in_threadpool(
+        PdfParser, file_path, question, clients.openai,
+        model=PARSER_MODEL, async_client=clients.openai_async,
+        max_concurrency=LLM_MAX_CONCURRENCY, doc_id=doc_id, pdf_backend=pdf_backend,
+        visualization_batch=VISUALIZATION_BATCH,
+    )
+
+async def parse_job(job: Job, report_progress) -> str:
+    """后台任务的处理函数：解析 PDF 并逐阶段上报进度，返回 ParserResult 的 JSON。"""
+    if USE_MOCK_RESULT:
+        #先用假数据
+        with open("result.json", "r",encoding="utf-8") as f:
+            return f.read()
+
+    result_cache: DiskLRUCache = app.state.result_cache
+    cache_key = parser_result_cache_key(job.doc_id, job.question, PARSER_MODEL, job.pdf_backend)
+    # 结果缓存是同步的 SQLite 读写，放到线程中执行，不阻塞事件循环
+    cached = await asyncio.to_thread(result_cache.get, cache_key)
+    if cached is not None:
+        await report_progress({"stage": "done", "cached": True})
+        return cached.decode("utf-8")
+
+    await report_progress({"stage": "extracting_text"})
+    pdf_parser = await build_parser(job.file_path, job.question, job.doc_id, job.pdf_backend)
+    progress = {"stage": "decomposing", "title": False, "subtasks": 0, "knowledges": 0}
+    await report_progress(progress)
+    result = None
+    async for event in pdf_parser.astream():
+        if event["event"] == "title":
+            progress["title"] = True
+        elif event["event"] == "subtask":
+            progress["stage"] = "extracting_knowledges"
+            progress["subtasks"] += 1
+        elif event["event"] == "knowledge":
+            progress["knowledges"] += 1
+        elif event["event"] == "done":
+            progress["stage"] = "done"
+            result = json.dumps(event["result"], ensure_ascii=False)
+            if VISUALIZATION_BATCH != "none":
+                progress["visualization_batch"] = pdf_parser.batch_stats.model_dump()
+                batch_stats_total.add(pdf_parser.batch_stats)
+        await report_progress(progress)
+    await asyncio.to_thread(result_cache.set, cache_key, result)
+    return result
+
+def check_pdf_backend(pdf_backend: str | None):
+    if pdf_backend is not None and pdf_backend.lower() not in BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unknown pdf_backend, expected one of: {', '.join(BACKENDS)}")
+
+@app.post("/upload",response_model=Job)
+async def upload_pdf(question: str = Form(...), file: UploadFile = File(...), pdf_backend: str | None = Form(None),
+                     job_queue: JobQueue = Depends(get_job_queue)):
+    """
+    保存上传的 PDF 并创建后台解析任务，立即返回任务信息；通过 /jobs/{id} 查询进度。
+    pdf_backend 可指定本次使用的文本提取后端（pypdf2 / pdfplumber / pypdfium2）。
+    """
+    if file.filename and not file.filename.endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    check_pdf_backend(pdf_backend)
+
+    # 边接收边计算 SHA-256，相同内容的 PDF 只存一份
+    doc_id, file_path = await run_in_threadpool(save_upload, file.file, UPLOAD_DIR)
+    return await job_queue.submit(doc_id, file_path, question, pdf_backend)
+
+@app.get("/jobs/{job_id}",response_model=Job)
+def get_job(job_id: str, job_queue: JobQueue = Depends(get_job_queue)):
+    job = job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
+@app.get("/jobs/{job_id}/result",response_model=ParserResult)
+def get_job_result(job_id: str, job_queue: JobQueue = Depends(get_job_queue)):
+    job = job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != SUCCEEDED:
+        raise HTTPException(status_code=409, detail={"status": job.status, "error": job.error})
+    return ParserResult.model_validate_json(job_queue.store.get_result(job_id))
 
-     new_filename = f"{uuid.uuid4().hex}.pdf"
-     file_path = os.path.join(UPLOAD_DIR, new_filename)
+@app.post("/upload/stream")
+async def upload_pdf_stream(question: str = Form(...), file: UploadFile = File(...), pdf_backend: str | None = Form(None),
+                            result_cache: DiskLRUCache = Depends(get_result_cache)):
+    """
+    /upload 的流式版本，以 NDJSON 逐行返回解析事件：先是标题和各个子任务，
+    随后每个知识点的可视化结果一就绪就返回一行，最后一行 done 事件携带完整的 ParserResult。
+    """
+    if file.filename and not file.filename.endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    check_pdf_backend(pdf_backend)
 
-     with open(file_path, "wb") as f:
-         f.write(file.file.read())
+    doc_id, file_path = await run_in_threadpool(save_upload, file.file, UPLOAD_DIR)
+    cache_key = parser_result_cache_key(doc_id, question, PARSER_MODEL, pdf_backend)
+    cached = await asyncio.to_thread(result_cache.get, cache_key)
 
-     client = OpenAI(
-     api_key=os.getenv("OPENAI_KEY"),
-     #base_url= os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
-     )
-     pdf_parser = PdfParser(file_path, question, client)
-     return pdf_parser.run()
-    
-    '''      
-     #先用假数据
-    with open("result.json", "r",encoding="utf-8") as f:
-        data = json.load(f)
-    return data
+    async def events():
+        if cached is not None:
+            for event in PdfParser.result_events(ParserResult.model_validate_json(cached)):
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+            return
+
+        pdf_parser = await build_parser(file_path, question, doc_id, pdf_backend)
+        async for event in pdf_parser.astream():
+            if event["event"] == "done":
+                await asyncio.to_thread(result_cache.set, cache_key, json.dumps(event["result"], ensure_ascii=False))
+                batch_stats_total.add(pdf_parser.batch_stats)
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.get("/cache/stats")
+def cache_stats(result_cache: DiskLRUCache = Depends(get_result_cache)):
+    return {
+        "parser_results": result_cache.stats(),
+        "llm_calls": default_llm_cache().stats(),
+        "icons": default_icon_cache().stats(),
+        "texts": default_text_cache().stats(),
+        "retrieval": default_retrieval_cache().stats(),
+        "layouts": default_layout_cache().stats(),
+        "visualization_batch": {"mode": VISUALIZATION_BATCH, **batch_stats_total.model_dump()},
+    }
 
 
 
@@ -69,82 +229,68 @@ class IconItem(BaseModel):
     coordinates: list[list[float]]
 
 @app.post("/icon")
-def generate_icon(item: IconItem):
-    # 构建颜色控制列表
-    color_controls = [{'rgb': rgb} for rgb in item.colorlist]
-    
-    client = OpenAI(
-        base_url='https://external.api.recraft.ai/v1',
-        api_key=os.getenv("RECRAFT_KEY"),
+async def generate_icon(item: IconItem, response: Response, clients: Clients = Depends(get_clients)):
+    # 生成与下载都是异步的，等待远端时不占用线程池；SVG 直接随响应返回，不再写共享的 output.svg
+    # 相同 (关键词, 调色板, 尺寸档位) 的图标从缓存返回，X-Icon-Cache 头标明 hit / miss / coalesced
+    svg, status = await default_icon_cache().get_or_generate(
+        clients.recraft_async, clients.http, item.keyword, item.colorlist, item.coordinates
     )
-    
-    max_retries = 5   # 最大重试次数
-    delay = 1         # 初始等待时间（秒）
-    
-    # 重试调用生成图像接口
-    for attempt in range(1, max_retries + 1):
-        try:
-            response = client.images.generate(
-                model='recraftv2',
-                prompt=item.keyword,
-                style='icon',
-                n=1,
-                size=scale_creation(item.coordinates),
-                extra_body={
-                    'controls': {
-                        'colors': color_controls
-                    }
-                }
-            )
-            # 成功获取响应，退出重试循环
-            break
-        except Exception as e:
-            print(f"第 {attempt} 次生成图像请求失败：{e}")
-            if attempt == max_retries:
-                raise e
-            time.sleep(delay)
-            delay *= 2  # 指数退避
-    
-    # 获取返回的 SVG URL
-    svg_url = response.data[0].url
-    print("获取到的 SVG URL:", svg_url)
-    
-    # 重置重试参数，开始下载 SVG 文件内容
-    delay = 1
-    for attempt in range(1, max_retries + 1):
+    response.headers["X-Icon-Cache"] = status
+    return svg
+
+
+class IconBatchItem(BaseModel):
+    layout: dict  # /layout 返回的布局
+    parser_result: ParserResult  # 生成该布局所用的解析结果
+    colorlist: list[list[int]]  # 所有图标共用的调色板
+
+@app.post("/icons")
+async def generate_icons(item: IconBatchItem, concurrency: int | None = None,
+                         clients: Clients = Depends(get_clients)):
+    """
+    为布局中的所有图标并发生成 SVG，以 NDJSON 逐行返回：每个图标完成即返回一行
+    {"event": "icon", "key": "VGn/KGm", ...}，失败时为 icon_error，最后一行为 done。
+    concurrency 覆盖默认并发数 ICON_BATCH_CONCURRENCY。
+    """
+    icon_requests = collect_icon_requests(item.layout, item.parser_result)
+    semaphore = asyncio.Semaphore(max(1, concurrency or ICON_BATCH_CONCURRENCY))
+    icon_cache = default_icon_cache()
+
+    async def generate(key: str, keyword: str, coordinates: list[list[float]]) -> dict:
+        async with semaphore:
+            try:
+                svg, status = await icon_cache.get_or_generate(
+                    clients.recraft_async, clients.http, keyword, item.colorlist, coordinates
+                )
+            except Exception as e:
+                return {"event": "icon_error", "key": key, "keyword": keyword, "error": str(e)}
+        if svg is None:
+            return {"event": "icon_error", "key": key, "keyword": keyword, "error": "SVG 下载失败"}
+        return {"event": "icon", "key": key, "keyword": keyword, "svg": svg, "cache": status}
+
+    async def events():
+        tasks = [asyncio.create_task(generate(*request)) for request in icon_requests]
+        failed = 0
         try:
-            svg_response = requests.get(svg_url)
-            if svg_response.status_code == 200:
-                # 将 SVG 内容保存到本地文件
-                with open('output.svg', 'wb') as file:
-                    file.write(svg_response.content)
-                print("SVG 文件已保存为 output.svg")
-                return svg_response.content
-            else:
-                print(f"第 {attempt} 次下载 SVG 失败，状态码：{svg_response.status_code}")
-        except Exception as e:
-            print(f"第 {attempt} 次下载 SVG 请求失败：{e}")
-        
-        if attempt == max_retries:
-            print("达到最大重试次数，下载 SVG 失败")
-            break
-        time.sleep(delay)
-        delay *= 2  # 指数退避
-
-    return None
-
-      
+            for next_done in asyncio.as_completed(tasks):
+                event = await next_done
+                failed += event["event"] == "icon_error"
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        finally:
+            # 客户端提前断开时取消尚未完成的生成
+            for task in tasks:
+                task.cancel()
+        yield json.dumps({"event": "done", "total": len(tasks), "failed": failed}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
 
 
 
 @app.post("/color",response_model=ColorScheme)
-def color(knowledgeContent: ParserResult,infographic_size:tuple[int, int]|None=None):
-    client = OpenAI(
-    api_key=os.getenv("OPENAI_KEY"),
-    #base_url= os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
-    )
+def color(knowledgeContent: ParserResult,infographic_size:tuple[int, int]|None=None,
+          clients: Clients = Depends(get_clients)):
     knowledge_content =PdfParser.extract_knowledge_from_parser_result(knowledgeContent)
-    return PdfParser.generate_colors(knowledge_content, client)
+    return PdfParser.generate_colors(knowledge_content, clients.openai)
 
 @app.post("/rank",response_model=list[str])
 def rank(parser_result: ParserResult, infographic_size: tuple[int, int]):
@@ -152,31 +298,34 @@ def rank(parser_result: ParserResult, infographic_size: tuple[int, int]):
 
 
 
-def layout_poster(type:str,valentine_data:dict, W, H, margin=0, vertical_margin=0):
-    if type == "portrait" or type == "Portrait":
-        from portrait import layout_poster
-        return layout_poster(valentine_data, W, H, margin, vertical_margin)
-    elif type == "landscape" or type == "Landscape":
-        from landscape import layout_poster
-        return layout_poster(valentine_data, W, H, margin, vertical_margin)
-    elif type == "grid" or type == "Grid":
-        from grid import layout_poster
-        return layout_poster(valentine_data, W, H, margin, vertical_margin)
-    elif type == "grid_protrait" or type == "PortraitGrid":
-        from grid_protrait import layout_poster
-        return layout_poster(valentine_data, W, H, margin, vertical_margin)
-    elif type == "star" or type == "Star":
-        from star import layout_poster
-        return layout_poster(valentine_data, W, H, margin, vertical_margin)
-    elif type == "spiral" or type == "Spiral":
-        from spiral import layout_poster
-        return layout_poster(valentine_data, W, H, margin, vertical_margin)
-    else:
-        raise ValueError("Invalid type")
-    
+def layout_poster(type:str,valentine_data:dict, W, H, margin=0, vertical_margin=0, color_scheme=None,
+                  placement=PLACEMENT_ENUMERATE):
+    # 结果按 parser_result 内容、模板、宽高比、边距、字体和摆放方式缓存，同宽高比的尺寸复用缩放后的布局
+    return layouts.layout_poster(type, valentine_data, W, H, margin, vertical_margin, color_scheme,
+                                 placement=placement)
+
+def check_placement(placement: str):
+    if placement not in PLACEMENT_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown placement, expected one of: {', '.join(PLACEMENT_MODES)}")
+
 @app.post("/layout",response_model=dict)
-def layout(type:str,infographic_size: tuple[int, int],parser_result:dict):
-    return layout_poster(type,parser_result,infographic_size[0], infographic_size[1],margin=0, vertical_margin=0)
+def layout(type:str,infographic_size: tuple[int, int],parser_result:dict,color_scheme: ColorScheme | None = None,
+           placement: str = PLACEMENT_ENUMERATE):
+    # placement=analytic 时按解析解摆放图片，见 placement.py
+    check_placement(placement)
+    return layout_poster(type,parser_result,infographic_size[0], infographic_size[1],margin=0, vertical_margin=0,
+                         color_scheme=color_scheme, placement=placement)
+
+@app.post("/layout/all",response_model=dict)
+def layout_all(infographic_size: tuple[int, int],parser_result: ParserResult,color_scheme: ColorScheme | None = None,
+               placement: str = PLACEMENT_ENUMERATE):
+    # 一次计算全部六个模板，按 rank_infographic 的顺序返回；单个模板失败时只在该模板的 error 中返回原因
+    check_placement(placement)
+    valentine_data = parser_result.model_dump()
+    rank = PdfParser.rank(parser_result, infographic_size)
+    results = layouts.layout_all(rank, valentine_data, infographic_size[0], infographic_size[1],
+                                 margin=0, vertical_margin=0, color_scheme=color_scheme, placement=placement)
+    return {"rank": rank, "layouts": results}
 
 @app.post("/submit")
 def submit(type:str,layout:dict,parser_result:dict):
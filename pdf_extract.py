@@ -0,0 +1,184 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Iterator, Optional
+
+PYPDF2 = "pypdf2"
+PDFPLUMBER = "pdfplumber"
+PYPDFIUM2 = "pypdfium2"
+
+# PdfParser 默认使用的提取后端，可被单次请求覆盖
+PDF_BACKEND = os.getenv("PDF_BACKEND", PYPDF2)
+# 进程池大小，默认等于 CPU 核数；为 1 时不启用进程池
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+# 页数不少于该值时才分发到进程池，小文档的进程间通信开销大于收益
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 32))
+# 每个子任务处理的页数
+PDF_PAGES_PER_CHUNK = int(os.getenv("PDF_PAGES_PER_CHUNK", 16))
+
+
+class PdfBackend(ABC):
+    """
+    PDF 文本提取后端的接口：统计页数，并按页码范围逐页产出文本。
+    各后端依赖的 PDF 库导入较慢，在第一次使用该后端时才导入。
+    """
+
+    name: str
+
+    @abstractmethod
+    def page_count(self, pdf_path: str) -> int:
+        ...
+
+    @abstractmethod
+    def iter_pages(self, pdf_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        ...
+
+
+class PyPDF2Backend(PdfBackend):
+    name = PYPDF2
+
+    def page_count(self, pdf_path: str) -> int:
+        import PyPDF2
+
+        return len(PyPDF2.PdfReader(pdf_path).pages)
+
+    def iter_pages(self, pdf_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        import PyPDF2
+
+        reader = PyPDF2.PdfReader(pdf_path)
+        stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+        for index in range(start, stop):
+            yield reader.pages[index].extract_text() or ""
+
+
+class PdfplumberBackend(PdfBackend):
+    name = PDFPLUMBER
+
+    def page_count(self, pdf_path: str) -> int:
+        import pdfplumber
+
+        with pdfplumber.open(pdf_path) as pdf:
+            return len(pdf.pages)
+
+    def iter_pages(self, pdf_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        import pdfplumber
+
+        with pdfplumber.open(pdf_path) as pdf:
+            for page in pdf.pages[start:stop]:
+                yield page.extract_text() or ""
+                # pdfplumber 会缓存已解析的页面对象，处理完立即释放
+                page.close()
+
+
+class Pypdfium2Backend(PdfBackend):
+    name = PYPDFIUM2
+
+    def page_count(self, pdf_path: str) -> int:
+        import pypdfium2
+
+        pdf = pypdfium2.PdfDocument(pdf_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    def iter_pages(self, pdf_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        import pypdfium2
+
+        pdf = pypdfium2.PdfDocument(pdf_path)
+        try:
+            stop = len(pdf) if stop is None else min(stop, len(pdf))
+            for index in range(start, stop):
+                page = pdf[index]
+                textpage = page.get_textpage()
+                # pdfium 以 \r\n 分行，统一为 \n 与其他后端一致
+                yield textpage.get_text_bounded().replace("\r\n", "\n")
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+
+
+BACKENDS: dict[str, PdfBackend] = {
+    backend.name: backend for backend in (PyPDF2Backend(), PdfplumberBackend(), Pypdfium2Backend())
+}
+
+
+def get_backend(name: Optional[str] = None) -> PdfBackend:
+    """按名称获取提取后端，name 为 None 时使用 PDF_BACKEND 配置。"""
+    name = (name or PDF_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend: {name}，可选值：{', '.join(BACKENDS)}")
+    return BACKENDS[name]
+
+
+def page_count(pdf_path: str, backend: Optional[str] = None) -> int:
+    return get_backend(backend).page_count(pdf_path)
+
+
+def iter_page_texts(pdf_path: str, backend: Optional[str] = None, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    """
+    逐页提取文本的生成器，每次只持有一页的内容，峰值内存不随文档页数增长。
+
+    参数:
+        pdf_path: PDF 文件路径
+        backend: 提取后端名称（pypdf2 / pdfplumber / pypdfium2），None 表示使用 PDF_BACKEND
+        start, stop: 页码范围 [start, stop)，stop 为 None 表示到最后一页
+    返回:
+        逐页的文本，无法提取文本的页为空串
+    """
+    return get_backend(backend).iter_pages(pdf_path, start, stop)
+
+
+def _extract_range(pdf_path: str, backend: str, start: int, stop: int) -> list[str]:
+    # 在子进程中执行，每个进程独立打开文件
+    return list(iter_page_texts(pdf_path, backend, start, stop))
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn 避免在带线程的服务进程（事件循环、线程池）中 fork
+            _pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS, mp_context=get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_pages(pdf_path: str, backend: Optional[str] = None, workers: Optional[int] = None) -> list[str]:
+    """
+    提取全部页面的文本，按页码顺序返回。
+    页数较多时按 PDF_PAGES_PER_CHUNK 切分页码范围，分发到进程池并行提取。
+    """
+    backend = get_backend(backend).name
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    total = page_count(pdf_path, backend)
+    if workers <= 1 or total < PDF_PARALLEL_MIN_PAGES:
+        return list(iter_page_texts(pdf_path, backend))
+
+    chunk = max(1, min(PDF_PAGES_PER_CHUNK, -(-total // workers)))
+    ranges = [(start, min(start + chunk, total)) for start in range(0, total, chunk)]
+    pool = _get_pool()
+    futures = [pool.submit(_extract_range, pdf_path, backend, start, stop) for start, stop in ranges]
+    pages = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
+
+
+def extract_text(pdf_path: str, backend: Optional[str] = None, separator: str = "", workers: Optional[int] = None) -> str:
+    """提取全文，各页文本以 separator 连接（一次 join，避免逐页拼接字符串）。"""
+    return separator.join(extract_pages(pdf_path, backend, workers))
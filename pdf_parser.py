@@ -1,12 +1,25 @@
-from openai import OpenAI
-import PyPDF2
+import asyncio
+import contextvars
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel
-from typing import List, Optional,Literal
+from typing import TYPE_CHECKING, List, Optional,Literal
 import os
 from dotenv import load_dotenv
 import json
 
+from chunking import estimate_tokens, split_token_windows
+from llm_cache import LLMCache, default_llm_cache
+from pdf_extract import get_backend
+from text_cache import TextCache, default_text_cache
+from prompt_registry import default_prompt_registry
+from retrieval import RETRIEVAL_TOKEN_BUDGET, default_retrieval_cache
+from upload_store import hash_file
 from util import rank_infographic
+
+if TYPE_CHECKING:
+    # openai 导入较慢，只在需要构造 client 时导入
+    from openai import AsyncOpenAI, OpenAI
 load_dotenv()
 
 
@@ -49,6 +62,22 @@ class knowledgeItemViz(KnowledgeItem):
 class KnowledgeResponse(BaseModel):
     knowledges: List[KnowledgeItem]
 
+class VisualizationBatch(BaseModel):
+    visualizations: List[Visualization]  # 与输入的知识点按下标一一对应
+
+class VisualizationBatchStats(BaseModel):
+    batch_calls: int = 0  # 批量请求次数
+    batched_items: int = 0  # 由批量请求成功分类的知识点数
+    fallback_items: int = 0  # 批量结果不完整、退回逐条请求的知识点数
+    calls_saved: int = 0  # 相比逐条请求节省的调用次数
+    prompt_tokens: int = 0  # 批量请求实际消耗的 prompt tokens
+    prompt_tokens_saved: int = 0  # 相比逐条请求估算节省的 prompt tokens
+
+    def add(self, other: "VisualizationBatchStats"):
+        """把另一次解析的统计累加到当前对象上。"""
+        for name in type(self).model_fields:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
 class ParserResultItem(Subtask):
     knowledges: List[knowledgeItemViz]
 
@@ -66,55 +95,220 @@ class ColorScheme(BaseModel):
     text_color: List[int]  # 文本颜色
     text_font: str  # 文本字体
 
+def prompts_version() -> str:
+    """prompts/ 下所有 markdown 提示词的整体哈希，提示词有改动时缓存随之失效。"""
+    return default_prompt_registry().version()
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.split()).casefold()
+
+def parser_result_cache_key(doc_id: str, question: str, model: str, pdf_backend: Optional[str] = None) -> str:
+    """ParserResult 缓存键：(文档内容哈希, 规范化后的问题, 模型名, 提示词版本, 文本提取后端)。"""
+    payload = json.dumps([doc_id, normalize_question(question), model, prompts_version(), get_backend(pdf_backend).name])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# 超过该 token 数的文档改用分窗口 map-reduce 拆解子任务
+SUBTASK_MAP_REDUCE_THRESHOLD = int(os.getenv("SUBTASK_MAP_REDUCE_THRESHOLD", 24000))
+SUBTASK_WINDOW_TOKENS = int(os.getenv("SUBTASK_WINDOW_TOKENS", 8000))  # 每个窗口的 token 预算
+SUBTASK_WINDOW_OVERLAP = int(os.getenv("SUBTASK_WINDOW_OVERLAP", 800))  # 相邻窗口重叠的 token 数
+MAX_SUBTASKS = 10
+# 设置 SUBTASK_RETRIEVAL=1 时默认开启拆解前的段落检索
+SUBTASK_RETRIEVAL = os.getenv("SUBTASK_RETRIEVAL") == "1"
+# 当前 astream 调用的并发上限；每次调用在自己的任务上下文中设置，并发或重复调用互不共享
+_request_limit: contextvars.ContextVar[Optional[asyncio.Semaphore]] = contextvars.ContextVar("_request_limit", default=None)
+
+def _normalize_title(title: str) -> str:
+    return "".join(ch for ch in title.casefold() if ch.isalnum())
+
+def dedupe_subtasks(subtasks: List[Subtask]) -> List[Subtask]:
+    """合并标题相同（忽略大小写和标点）的子任务，保留较长的内容，顺序按首次出现。"""
+    merged: dict[str, Subtask] = {}
+    for subtask in subtasks:
+        key = _normalize_title(subtask.subtask_title)
+        kept = merged.get(key)
+        if kept is None:
+            merged[key] = subtask
+        elif subtask.subtask_content not in kept.subtask_content:
+            if kept.subtask_content in subtask.subtask_content:
+                kept.subtask_content = subtask.subtask_content
+            else:
+                kept.subtask_content = f"{kept.subtask_content}\n{subtask.subtask_content}"
+    return list(merged.values())
+
+def finalize_subtasks(subtasks: List[Subtask]) -> List[Subtask]:
+    """截断到 MAX_SUBTASKS 个，并清除指向已不存在子任务的关联。"""
+    subtasks = subtasks[:MAX_SUBTASKS]
+    titles = {subtask.subtask_title for subtask in subtasks}
+    for subtask in subtasks:
+        if subtask.related_subtask.title is not None and subtask.related_subtask.title not in titles:
+            subtask.related_subtask = RelatedSubtask(title=None, relation=None)
+    return subtasks
+
 class PdfParser:
     def __init__(
-        self, pdf_path: str, question: str, client: OpenAI, model: str = "gpt-4o-mini"
+        self,
+        pdf_path: str,
+        question: str,
+        client: "OpenAI",
+        model: str = "gpt-4o-mini",
+        async_client: Optional["AsyncOpenAI"] = None,
+        max_concurrency: int = 8,
+        visualization_batch: Literal["none", "subtask", "document"] = "none",
+        doc_id: Optional[str] = None,
+        llm_cache: Optional[LLMCache] = None,
+        bypass_cache: bool = False,
+        pdf_backend: Optional[str] = None,
+        text_cache: Optional[TextCache] = None,
+        subtask_mode: Literal["auto", "single", "map_reduce"] = "auto",
+        retrieval: Optional[bool] = None,
     ):
         self.pdf_path = pdf_path
+        # 文本提取后端：pypdf2 / pdfplumber / pypdfium2，None 时使用 PDF_BACKEND 配置
+        self.pdf_backend = get_backend(pdf_backend).name
+        # 文档 ID 为 PDF 内容的 SHA-256，各级缓存都以它为键
+        self.doc_id = doc_id or hash_file(pdf_path)
         self.client = client
+        self.async_client = async_client
         self.model = model
         self.question = question
+        # arun 同时在途的 LLM 请求上限
+        self.max_concurrency = max_concurrency
+        # 可视化分类的批量粒度：none 逐条请求，subtask 每个子任务一次，document 整篇文档一次
+        self.visualization_batch = visualization_batch
+        # 子任务拆解方式：single 整篇一次请求，map_reduce 分窗口拆解后合并，auto 按文档长度自动选择
+        self.subtask_mode = subtask_mode
+        # 开启后，超过 RETRIEVAL_TOKEN_BUDGET 的文档只把与问题最相关的段落送去拆解子任务；None 时读取 SUBTASK_RETRIEVAL
+        self.retrieval = SUBTASK_RETRIEVAL if retrieval is None else retrieval
+        self.batch_stats = VisualizationBatchStats()
+        # 所有结构化调用都经过 LLM 缓存；bypass_cache=True 时强制重新请求并刷新缓存
+        self.llm_cache = llm_cache or default_llm_cache()
+        self.bypass_cache = bypass_cache
+        # 提取文本按 (文档哈希, 后端) 缓存为 mmap 文件，同一文档再次解析时跳过提取
+        self.text_cache = text_cache or default_text_cache()
         self.pdf_text = self.pdf_to_text()
 
     def pdf_to_text(self):
-       
-        reader = PyPDF2.PdfReader(self.pdf_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text()
-        return text
+        # 未缓存时，大文档按页码范围分发到进程池并行提取；self.pages 保留逐页访问
+        self.pages = self.text_cache.get_or_extract(self.pdf_path, self.doc_id, self.pdf_backend)
+        return self.pages.text()
     @staticmethod
     def _read_prompt_from_md(md_path: str):
-        with open(md_path, "r",encoding="utf-8") as file:
-            prompt = file.read()
-        return prompt
+        # 提示词常驻内存，只有文件 mtime 变化时才重新读盘
+        return default_prompt_registry().read(md_path)
 
-    def generate_title(self):
+    def _title_messages(self):
         system_prompt = self._read_prompt_from_md("prompts/generate_title.md")
-        completion = self.client.chat.completions.create(
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": self.question},
+        ]
+
+    def _subtasks_messages(self, text: Optional[str] = None):
+        system_prompt = self._read_prompt_from_md("prompts/generate_subtasks.md")
+        user_prompt = f"""
+        Text: {self.pdf_text if text is None else text}
+        Question: {self.question}
+        """
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    def _merge_subtasks_messages(self, candidates: List[Subtask]):
+        system_prompt = self._read_prompt_from_md("prompts/merge_subtasks.md")
+        user_prompt = json.dumps(
+            {"question": self.question, "subtasks": [subtask.model_dump() for subtask in candidates]},
+            ensure_ascii=False,
+        )
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    def _use_map_reduce(self) -> bool:
+        if self.subtask_mode == "auto":
+            return self.pages.estimate_tokens() > SUBTASK_MAP_REDUCE_THRESHOLD
+        return self.subtask_mode == "map_reduce"
+
+    def _retrieved_text(self) -> Optional[str]:
+        """检索开启且文档超出预算时，返回按 BM25 选出的段落；否则返回 None，使用全文。"""
+        if not self.retrieval or self.pages.estimate_tokens() <= RETRIEVAL_TOKEN_BUDGET:
+            return None
+        # 索引按 (文档哈希, 提取后端) 缓存，同一文档的后续问题无需重建
+        index = default_retrieval_cache().get_or_build(f"{self.doc_id}.{self.pdf_backend}", self.pdf_text)
+        text = index.select(self.pdf_text, self.question, RETRIEVAL_TOKEN_BUDGET)
+        print(f"段落检索：{len(index)} 个段落，送入拆解约 {estimate_tokens(text)} tokens")
+        return text
+
+    def _subtask_windows(self) -> List[str]:
+        return split_token_windows(self.pdf_text, SUBTASK_WINDOW_TOKENS, SUBTASK_WINDOW_OVERLAP)
+
+    @staticmethod
+    def _merge_candidates(partials: List[List[Subtask]]) -> List[Subtask]:
+        return dedupe_subtasks([subtask for subtasks in partials for subtask in subtasks])
+
+    @staticmethod
+    def _merged_subtasks(candidates: List[Subtask], completion) -> List[Subtask]:
+        # 合并请求失败时退回本地去重后的候选
+        resp = completion.choices[0].message.parsed if completion is not None else None
+        if resp and resp.subtasks:
+            return finalize_subtasks(resp.subtasks)
+        return finalize_subtasks(candidates)
+
+    def _knowledges_messages(self, subtask: Subtask):
+        prompt = self._read_prompt_from_md("prompts/get_knowledge.md")
+        return [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": subtask.subtask_content},
+        ]
+
+    def _visualization_messages(self, knowledge_item: KnowledgeItem):
+        prompt = self._read_prompt_from_md("prompts/generate_visualization.md")
+        # 只提取 knowledge_content 和 data_insight 两个字段
+        content = knowledge_item.model_dump_json(include={"knowledge_content", "data_insight"})
+        return [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": content},
+        ]
+
+    def _visualization_batch_messages(self, knowledge_items: List[KnowledgeItem]):
+        prompt = self._read_prompt_from_md("prompts/generate_visualization.md")
+        batch_prompt = self._read_prompt_from_md("prompts/generate_visualization_batch.md")
+        items = [
+            {"index": i, **item.model_dump(include={"knowledge_content", "data_insight"})}
+            for i, item in enumerate(knowledge_items)
+        ]
+        return [
+            {"role": "system", "content": f"{prompt}\n\n{batch_prompt}"},
+            {"role": "user", "content": json.dumps(items, ensure_ascii=False)},
+        ]
+
+    def generate_title(self):
+        completion = self.llm_cache.create(
+            self.client, "title",
             model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": self.question},
-            ],
+            messages=self._title_messages(),
+            bypass=self.bypass_cache,
         )
 
         Title = completion.choices[0].message.content
         return Title or "No title generated"
 
     def generate_subtasks(self) -> List[Subtask]:
-        system_prompt = self._read_prompt_from_md("prompts/generate_subtasks.md")
-        user_prompt = f"""
-        Text: {self.pdf_text}
-        Question: {self.question}
-        """
-        completion = self.client.beta.chat.completions.parse(
+        retrieved = self._retrieved_text()
+        if retrieved is not None:
+            return self._decompose(retrieved)
+        if self._use_map_reduce():
+            return self.generate_subtasks_map_reduce()
+        return self._decompose(self.pdf_text)
+
+    def _decompose(self, text: str) -> List[Subtask]:
+        completion = self.llm_cache.parse(
+            self.client, "subtasks",
             model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
+            messages=self._subtasks_messages(text),
             response_format=TaskDecompositionOutput,
+            bypass=self.bypass_cache,
         )
 
         resp =  completion.choices[0].message.parsed
@@ -122,15 +316,38 @@ class PdfParser:
             return resp.subtasks
         return []
 
+    def generate_subtasks_map_reduce(self) -> List[Subtask]:
+        """
+        长文档的子任务拆解：按 token 预算切成重叠窗口并发拆解（map），
+        再把所有候选子任务交给模型去重合并为不超过 10 个（reduce）。
+        """
+        windows = self._subtask_windows()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            partials = list(executor.map(self._decompose, windows))
+        candidates = self._merge_candidates(partials)
+        print(f"子任务 map-reduce：{len(windows)} 个窗口，去重后 {len(candidates)} 个候选子任务")
+        if len(candidates) <= 1:
+            return finalize_subtasks(candidates)
+        try:
+            completion = self.llm_cache.parse(
+                self.client, "subtasks",
+                model=self.model,
+                messages=self._merge_subtasks_messages(candidates),
+                response_format=TaskDecompositionOutput,
+                bypass=self.bypass_cache,
+            )
+        except Exception as e:
+            print(f"合并子任务失败，使用本地去重结果：{e}")
+            completion = None
+        return self._merged_subtasks(candidates, completion)
+
     def get_knowledges(self, subtask: Subtask)->List[KnowledgeItem]:
-        prompt = self._read_prompt_from_md("prompts/get_knowledge.md")
-        completion = self.client.beta.chat.completions.parse(
+        completion = self.llm_cache.parse(
+            self.client, "knowledges",
             model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": subtask.subtask_content},
-            ],
+            messages=self._knowledges_messages(subtask),
             response_format=KnowledgeResponse,
+            bypass=self.bypass_cache,
         )
         resp = completion.choices[0].message.parsed
         if resp:
@@ -138,38 +355,369 @@ class PdfParser:
         return []
     
     def generate_visualization(self, knowledge_item: KnowledgeItem):
-        prompt = self._read_prompt_from_md("prompts/generate_visualization.md")
-        # 只提取 knowledge_content 和 data_insight 两个字段
-        content = knowledge_item.model_dump_json(include={"knowledge_content", "data_insight"})
-        completion = self.client.beta.chat.completions.parse(
+        completion = self.llm_cache.parse(
+            self.client, "visualization",
             model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": content},
-            ],
+            messages=self._visualization_messages(knowledge_item),
             response_format=Visualization,  # 如果你使用的是新的 Visualization 模型
+            bypass=self.bypass_cache,
         )
         return completion.choices[0].message.parsed
 
+    @staticmethod
+    def _complete_batch(knowledge_items: List[KnowledgeItem]):
+        """批量结果条数与知识点一致时才写入 LLM 缓存，否则下次仍会重新请求批量分类。"""
+        return lambda resp: len(resp.visualizations) == len(knowledge_items)
 
+    def _accept_visualization_batch(self, knowledge_items: List[KnowledgeItem], messages, completion) -> Optional[List[Visualization]]:
+        """
+        校验批量分类结果并记录节省的调用次数与 prompt tokens。
+
+        返回:
+            与 knowledge_items 按下标对齐的 Visualization 列表；结果缺失或条数不符时返回 None，由调用方退回逐条请求
+        """
+        # 命中缓存的结果没有发出请求，不计入批量调用、prompt tokens 和节省量
+        cached = getattr(completion, "cached", False)
+        usage = getattr(completion, "usage", None)
+        prompt_tokens = usage.prompt_tokens if usage else 0
+        if not cached:
+            self.batch_stats.batch_calls += 1
+            self.batch_stats.prompt_tokens += prompt_tokens
+
+        resp = completion.choices[0].message.parsed
+        if resp is None or len(resp.visualizations) != len(knowledge_items):
+            print(f"批量可视化分类结果不完整，退回逐条请求（{len(knowledge_items)} 条）")
+            self.batch_stats.fallback_items += len(knowledge_items)
+            return None
+        if cached:
+            return resp.visualizations
+
+        # 按字符数把批量请求的实际 tokens 折算到逐条请求上，估算节省量
+        batch_chars = sum(len(m["content"]) for m in messages)
+        single_chars = sum(
+            len(m["content"])
+            for item in knowledge_items
+            for m in self._visualization_messages(item)
+        )
+        if batch_chars:
+            estimated = round(prompt_tokens * single_chars / batch_chars)
+            self.batch_stats.prompt_tokens_saved += max(estimated - prompt_tokens, 0)
+        self.batch_stats.batched_items += len(knowledge_items)
+        self.batch_stats.calls_saved += len(knowledge_items) - 1
+        return resp.visualizations
+
+    def generate_visualizations(self, knowledge_items: List[KnowledgeItem]) -> List[Optional[Visualization]]:
+        """
+        一次请求为多个知识点分类可视化，结果按下标与 knowledge_items 对齐；
+        请求失败或返回条数不符时退回逐条调用 generate_visualization。
+        """
+        if not knowledge_items:
+            return []
+        messages = self._visualization_batch_messages(knowledge_items)
+        try:
+            completion = self.llm_cache.parse(
+                self.client, "visualization",
+                model="gpt-4o-mini",
+                messages=messages,
+                response_format=VisualizationBatch,
+                bypass=self.bypass_cache,
+                validate=self._complete_batch(knowledge_items),
+            )
+            visualizations = self._accept_visualization_batch(knowledge_items, messages, completion)
+        except Exception as e:
+            print(f"批量可视化分类请求失败：{e}")
+            self.batch_stats.fallback_items += len(knowledge_items)
+            visualizations = None
+        if visualizations is None:
+            return [self.generate_visualization(item) for item in knowledge_items]
+        return visualizations
+
+    @staticmethod
+    def _split_by_lengths(items: list, groups: List[list]) -> List[list]:
+        result, start = [], 0
+        for group in groups:
+            result.append(items[start:start + len(group)])
+            start += len(group)
+        return result
+
+    @staticmethod
+    def _build_result_item(subtask: Subtask, knowledges: List[KnowledgeItem], vis_list) -> ParserResultItem:
+        konwledges_vis: list[knowledgeItemViz] = [
+            knowledgeItemViz(**knowledge.model_dump(), visualization=vis)
+            for knowledge, vis in zip(knowledges, vis_list)
+            if vis
+        ]
+        return ParserResultItem(**subtask.model_dump(), knowledges=konwledges_vis)
+
+    def _report_batch_stats(self):
+        if self.visualization_batch != "none":
+            print(f"可视化批处理统计: {self.batch_stats.model_dump_json()}")
 
     def run(self):
         title = self.generate_title()
-        data: List[ParserResultItem] = []
-        
+
         subtasks = self.generate_subtasks()
-        for subtask in subtasks:
-            knowledges = self.get_knowledges(subtask)
-            konwledges_vis:list[knowledgeItemViz]=[]
-            for knowledge in knowledges:
-                vis = self.generate_visualization(knowledge)
-                if not vis:
-                    continue
-                konwledges_vis.append(knowledgeItemViz(**knowledge.model_dump(),visualization=vis))
-            data.append(ParserResultItem(**subtask.model_dump(), knowledges=konwledges_vis))
+        knowledges_list = [self.get_knowledges(subtask) for subtask in subtasks]
+        if self.visualization_batch == "document":
+            all_knowledges = [knowledge for knowledges in knowledges_list for knowledge in knowledges]
+            vis_lists = self._split_by_lengths(self.generate_visualizations(all_knowledges), knowledges_list)
+        elif self.visualization_batch == "subtask":
+            vis_lists = [self.generate_visualizations(knowledges) for knowledges in knowledges_list]
+        else:
+            vis_lists = [
+                [self.generate_visualization(knowledge) for knowledge in knowledges]
+                for knowledges in knowledges_list
+            ]
+        data: List[ParserResultItem] = [
+            self._build_result_item(subtask, knowledges, vis_list)
+            for subtask, knowledges, vis_list in zip(subtasks, knowledges_list, vis_lists)
+        ]
+        self._report_batch_stats()
 
         return ParserResult(title=title, data=data)
-    
+
+    def _get_async_client(self) -> "AsyncOpenAI":
+        # 未显式传入时，沿用同步 client 的配置构造 AsyncOpenAI
+        if self.async_client is None:
+            from openai import AsyncOpenAI
+
+            self.async_client = AsyncOpenAI(
+                api_key=self.client.api_key,
+                base_url=self.client.base_url,
+            )
+        return self.async_client
+
+    async def agenerate_title(self):
+        completion = await self.llm_cache.acreate(
+            self._get_async_client(), "title",
+            model=self.model,
+            messages=self._title_messages(),
+            bypass=self.bypass_cache,
+        )
+        Title = completion.choices[0].message.content
+        return Title or "No title generated"
+
+    async def agenerate_subtasks(self) -> List[Subtask]:
+        retrieved = await asyncio.to_thread(self._retrieved_text)
+        if retrieved is not None:
+            return await self._limited(self._adecompose, retrieved)
+        if self._use_map_reduce():
+            return await self.agenerate_subtasks_map_reduce()
+        return await self._limited(self._adecompose, self.pdf_text)
+
+    async def _adecompose(self, text: str) -> List[Subtask]:
+        completion = await self.llm_cache.aparse(
+            self._get_async_client(), "subtasks",
+            model=self.model,
+            messages=self._subtasks_messages(text),
+            response_format=TaskDecompositionOutput,
+            bypass=self.bypass_cache,
+        )
+        resp = completion.choices[0].message.parsed
+        if resp:
+            return resp.subtasks
+        return []
+
+    async def agenerate_subtasks_map_reduce(self) -> List[Subtask]:
+        windows = self._subtask_windows()
+        partials = await asyncio.gather(*(self._limited(self._adecompose, window) for window in windows))
+        candidates = self._merge_candidates(partials)
+        print(f"子任务 map-reduce：{len(windows)} 个窗口，去重后 {len(candidates)} 个候选子任务")
+        if len(candidates) <= 1:
+            return finalize_subtasks(candidates)
+        try:
+            completion = await self._limited(
+                self.llm_cache.aparse,
+                self._get_async_client(), "subtasks",
+                model=self.model,
+                messages=self._merge_subtasks_messages(candidates),
+                response_format=TaskDecompositionOutput,
+                bypass=self.bypass_cache,
+            )
+        except Exception as e:
+            print(f"合并子任务失败，使用本地去重结果：{e}")
+            completion = None
+        return self._merged_subtasks(candidates, completion)
+
+    async def aget_knowledges(self, subtask: Subtask) -> List[KnowledgeItem]:
+        completion = await self.llm_cache.aparse(
+            self._get_async_client(), "knowledges",
+            model="gpt-4o-mini",
+            messages=self._knowledges_messages(subtask),
+            response_format=KnowledgeResponse,
+            bypass=self.bypass_cache,
+        )
+        resp = completion.choices[0].message.parsed
+        if resp:
+            return resp.knowledges
+        return []
+
+    async def agenerate_visualization(self, knowledge_item: KnowledgeItem):
+        completion = await self.llm_cache.aparse(
+            self._get_async_client(), "visualization",
+            model="gpt-4o-mini",
+            messages=self._visualization_messages(knowledge_item),
+            response_format=Visualization,
+            bypass=self.bypass_cache,
+        )
+        return completion.choices[0].message.parsed
+
+    async def _limited(self, func, *args, **kwargs):
+        # 不在 astream 中调用时没有并发上限
+        semaphore = _request_limit.get()
+        if semaphore is None:
+            return await func(*args, **kwargs)
+        async with semaphore:
+            return await func(*args, **kwargs)
+
+    async def _aparse_visualization_batch(self, knowledge_items: List[KnowledgeItem]) -> Optional[List[Visualization]]:
+        messages = self._visualization_batch_messages(knowledge_items)
+        try:
+            completion = await self.llm_cache.aparse(
+                self._get_async_client(), "visualization",
+                model="gpt-4o-mini",
+                messages=messages,
+                response_format=VisualizationBatch,
+                bypass=self.bypass_cache,
+                validate=self._complete_batch(knowledge_items),
+            )
+        except Exception as e:
+            print(f"批量可视化分类请求失败：{e}")
+            self.batch_stats.fallback_items += len(knowledge_items)
+            return None
+        return self._accept_visualization_batch(knowledge_items, messages, completion)
+
+    async def agenerate_visualizations(self, knowledge_items: List[KnowledgeItem]) -> List[Optional[Visualization]]:
+        """
+        generate_visualizations 的异步版本，只能在 arun 中调用；批量请求与退回的逐条请求都计入并发上限。
+        """
+        if not knowledge_items:
+            return []
+        visualizations = await self._limited(self._aparse_visualization_batch, knowledge_items)
+        if visualizations is None:
+            return list(await asyncio.gather(
+                *(self._limited(self.agenerate_visualization, item) for item in knowledge_items)
+            ))
+        return visualizations
+
+    async def astream(self):
+        """
+        以事件流的形式逐步产出 ParserResult：标题与子任务拆解并发执行，所有子任务的 get_knowledges 同时发出，
+        每个知识点的可视化分类一完成就产出对应事件（visualization_batch 为 subtask / document 时按批产出）。
+        在途请求数受 max_concurrency 限制。
+
+        产出的事件（均为可直接 JSON 序列化的 dict）:
+            {"event": "title", "title": str}
+            {"event": "subtask", "index": int, "subtask": Subtask}
+            {"event": "knowledge", "subtask_index": int, "knowledge_index": int, "knowledge": knowledgeItemViz}
+            {"event": "done", "result": ParserResult}
+        knowledge_index 为知识点在 get_knowledges 返回列表中的下标；没有可视化结果的知识点不产出事件，
+        与 run 的结果保持一致。最后的 done 事件携带完整结果，顺序与 run 完全一致。
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def emit_knowledge(subtask_index: int, knowledge_index: int, knowledge: KnowledgeItem, vis):
+            if vis:
+                item = knowledgeItemViz(**knowledge.model_dump(), visualization=vis)
+                queue.put_nowait({
+                    "event": "knowledge",
+                    "subtask_index": subtask_index,
+                    "knowledge_index": knowledge_index,
+                    "knowledge": item.model_dump(),
+                })
+
+        def emit_knowledges(subtask_index: int, knowledges: List[KnowledgeItem], vis_list):
+            for j, (knowledge, vis) in enumerate(zip(knowledges, vis_list)):
+                emit_knowledge(subtask_index, j, knowledge, vis)
+
+        async def title_stage():
+            title = await self._limited(self.agenerate_title)
+            queue.put_nowait({"event": "title", "title": title})
+            return title
+
+        async def classify(subtask_index: int, knowledge_index: int, knowledge: KnowledgeItem):
+            vis = await self._limited(self.agenerate_visualization, knowledge)
+            emit_knowledge(subtask_index, knowledge_index, knowledge, vis)
+            return vis
+
+        async def process_subtask(index: int, subtask: Subtask):
+            knowledges = await self._limited(self.aget_knowledges, subtask)
+            if self.visualization_batch == "document":
+                return knowledges, None
+            if self.visualization_batch == "subtask":
+                vis_list = await self.agenerate_visualizations(knowledges)
+                emit_knowledges(index, knowledges, vis_list)
+                return knowledges, vis_list
+            vis_list = await asyncio.gather(
+                *(classify(index, j, knowledge) for j, knowledge in enumerate(knowledges))
+            )
+            return knowledges, vis_list
+
+        async def pipeline():
+            # pipeline 运行在独立的任务上下文中，其中创建的子任务都继承这个信号量
+            _request_limit.set(asyncio.Semaphore(self.max_concurrency))
+            title_task = asyncio.ensure_future(title_stage())
+            try:
+                # agenerate_subtasks 内部自行限流（map-reduce 时会发出多个请求）
+                subtasks = await self.agenerate_subtasks()
+                for i, subtask in enumerate(subtasks):
+                    queue.put_nowait({"event": "subtask", "index": i, "subtask": subtask.model_dump()})
+                processed = await asyncio.gather(
+                    *(process_subtask(i, subtask) for i, subtask in enumerate(subtasks))
+                )
+                knowledges_list = [knowledges for knowledges, _ in processed]
+                if self.visualization_batch == "document":
+                    all_knowledges = [knowledge for knowledges in knowledges_list for knowledge in knowledges]
+                    vis_lists = self._split_by_lengths(
+                        await self.agenerate_visualizations(all_knowledges), knowledges_list
+                    )
+                    for i, (knowledges, vis_list) in enumerate(zip(knowledges_list, vis_lists)):
+                        emit_knowledges(i, knowledges, vis_list)
+                else:
+                    vis_lists = [vis_list for _, vis_list in processed]
+                title = await title_task
+            finally:
+                title_task.cancel()
+
+            data = [
+                self._build_result_item(subtask, knowledges, vis_list)
+                for subtask, knowledges, vis_list in zip(subtasks, knowledges_list, vis_lists)
+            ]
+            self._report_batch_stats()
+            result = ParserResult(title=title, data=data)
+            queue.put_nowait({"event": "done", "result": result.model_dump()})
+
+        task = asyncio.ensure_future(pipeline())
+        # 无论成功还是异常，流水线结束后都放入结束标记
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while (event := await queue.get()) is not None:
+                yield event
+            task.result()
+        finally:
+            task.cancel()
+
+    @staticmethod
+    def result_events(result: ParserResult):
+        """把已有的 ParserResult（如缓存命中）拆成与 astream 相同格式的事件序列。"""
+        yield {"event": "title", "title": result.title}
+        for i, item in enumerate(result.data):
+            yield {"event": "subtask", "index": i, "subtask": Subtask(**item.model_dump()).model_dump()}
+        for i, item in enumerate(result.data):
+            for j, knowledge in enumerate(item.knowledges):
+                yield {"event": "knowledge", "subtask_index": i, "knowledge_index": j, "knowledge": knowledge.model_dump()}
+        yield {"event": "done", "result": result.model_dump()}
+
+    async def arun(self) -> ParserResult:
+        """
+        run 的异步版本，消费 astream 的事件流并返回最终结果，结果顺序与 run 完全一致。
+        """
+        result = None
+        async for event in self.astream():
+            if event["event"] == "done":
+                result = ParserResult.model_validate(event["result"])
+        return result
+
     @staticmethod
     def extract_knowledge_from_parser_result(parser_result:ParserResult):
 
@@ -186,7 +734,13 @@ class PdfParser:
         return result.strip()
     
     @staticmethod
-    def generate_colors(text: str, client: OpenAI, model: str = "gpt-4o-mini") -> ColorScheme:
+    def generate_colors(
+        text: str,
+        client: "OpenAI",
+        model: str = "gpt-4o-mini",
+        llm_cache: Optional[LLMCache] = None,
+        bypass_cache: bool = False,
+    ) -> ColorScheme:
         """
         根据提供的文本内容生成适合信息图表的配色方案和字体推荐
 
@@ -194,6 +748,8 @@ class PdfParser:
             text (str): 用于生成配色方案的文本内容
             client (OpenAI): OpenAI 客户端实例
             model (str): 使用的模型名称，默认为 "gpt-4o-mini"
+            llm_cache (LLMCache): LLM 调用缓存，默认使用进程级共享缓存
+            bypass_cache (bool): 为 True 时跳过缓存读取，强制重新生成
 
         返回:
             ColorScheme: 包含主题颜色、背景颜色、一级强调颜色和字体、二级强调颜色和字体、文本颜色和字体的对象
@@ -205,13 +761,15 @@ class PdfParser:
         user_prompt = f"{text}"
 
         # 调用 OpenAI API 并解析结果
-        completion = client.beta.chat.completions.parse(
+        completion = (llm_cache or default_llm_cache()).parse(
+            client, "colors",
             model=model,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            response_format=ColorScheme
+            response_format=ColorScheme,
+            bypass=bypass_cache,
         )
 
         # 返回解析后的结果
@@ -234,6 +792,8 @@ class PdfParser:
         return rank_infographic(parser_result.model_dump(), infographic_size)
 
 if __name__ == "__main__":
+     from openai import OpenAI
+
      client = OpenAI(
          api_key=os.getenv("OPENAI_KEY")
          )
@@ -0,0 +1,708 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from math import inf, sqrt
+
+import numpy as np
+
+# Candidate image aspect ratios (width / height), in search order
+ASPECT_RATIOS = [1.0, 1.333, 0.75, 1.5, 0.667, 1.777, 0.562, 0.5, 2.0, 1.4, 0.714, 0.8, 1.25, 0.6, 1.667]
+_RATIOS = np.array(ASPECT_RATIOS, dtype=np.float64)
+_RATIOS_A = _RATIOS[:, None]  # Icon ratio varies along axis 0
+_RATIOS_B = _RATIOS[None, :]  # Visualization ratio varies along axis 1
+
+# The scoring below evaluates every candidate with the same float operations, in the same order, as the
+# original per-candidate helpers, so overflow values (and therefore the chosen placement) are bit-identical.
+# Terms whose condition does not hold add 0.0, which leaves the running sum unchanged; for the edge terms
+# np.maximum(d, 0.0) * w equals the conditional (d > 0 exactly when the edge is crossed) and is cheaper than np.where.
+
+
+class KGBox:
+    """Geometry of a knowledge group that images are placed into."""
+
+    def __init__(self, kg_x, kg_width, y_KG, h_KG, w_highlight, h_highlight):
+        self.kg_x = kg_x
+        self.kg_width = kg_width
+        self.y_KG = y_KG
+        self.h_KG = h_KG
+        self.w_highlight = w_highlight
+        self.h_highlight = h_highlight
+        self.right = kg_x + kg_width
+        self.bottom = y_KG + h_KG
+        self.highlight_right = kg_x + w_highlight
+        self.highlight_bottom = y_KG + h_highlight
+
+
+def _highlight_overlap(g, x1, y1, x2, w, h, h_limit):
+    """Overlap of an image with the Highlight block (zero where they do not intersect)."""
+    overlap = np.where(
+        x2 > g.highlight_right,
+        (np.minimum(x2, g.highlight_right) - x1) * np.minimum(h, h_limit),
+        w * np.minimum(h, h_limit),
+    )
+    return np.where((x1 < g.highlight_right) & (y1 < g.highlight_bottom), overlap, 0.0)
+
+
+def _below(g, y2, w):
+    return np.maximum(y2 - g.bottom, 0.0) * w
+
+
+def _right_of(g, x2, h):
+    return np.maximum(x2 - g.right, 0.0) * h
+
+
+def combination_1(g, w_a, h_a, w_b, h_b):
+    """Icon top-right, Visualization to the left of it, both top-aligned."""
+    x1_a = g.right - w_a
+    y1_a = g.y_KG
+    x2_a = g.right
+    y2_a = g.y_KG + h_a
+    x1_b = g.right - w_a - w_b
+    y1_b = g.y_KG
+    x2_b = g.right - w_a
+    y2_b = g.y_KG + h_b
+    overflow = 0.0 + _below(g, y2_a, w_a)
+    overflow = overflow + _below(g, y2_b, w_b)
+    overflow = overflow + _highlight_overlap(g, x1_a, y1_a, x2_a, w_a, h_a, g.h_highlight)
+    overflow = overflow + _highlight_overlap(g, x1_b, y1_b, x2_b, w_b, h_b, g.h_highlight)
+    return (x1_a, y1_a, x2_a, y2_a), (x1_b, y1_b, x2_b, y2_b), overflow
+
+
+def combination_2(g, w_a, h_a, w_b, h_b, image_overlap=True):
+    """Icon top-right, Visualization below the Highlight on the left."""
+    x1_a = g.right - w_a
+    y1_a = g.y_KG
+    x2_a = g.right
+    y2_a = g.y_KG + h_a
+    x1_b = g.kg_x
+    y1_b = g.highlight_bottom
+    x2_b = g.kg_x + w_b
+    y2_b = g.highlight_bottom + h_b
+    overflow = 0.0 + _below(g, y2_a, w_a)
+    overflow = overflow + _below(g, y2_b, w_b)
+    overflow = overflow + _highlight_overlap(g, x1_a, y1_a, x2_a, w_a, h_a, g.h_highlight)
+    overflow = overflow + _right_of(g, x2_b, h_b)
+    if image_overlap:
+        # Visualization's top-right corner overlaps Icon's bottom-left corner
+        overlap = (np.minimum(x2_b, x2_a) - x1_a) * (np.minimum(y2_a, y2_b) - y1_b)
+        overflow = overflow + np.where((x2_b > x1_a) & (y1_b < y2_a), overlap, 0.0)
+    return (x1_a, y1_a, x2_a, y2_a), (x1_b, y1_b, x2_b, y2_b), overflow
+
+
+def combination_3(g, w_a, h_a, w_b, h_b):
+    """Icon top-right, Visualization right-aligned directly below it."""
+    x1_a = g.right - w_a
+    y1_a = g.y_KG
+    x2_a = g.right
+    y2_a = g.y_KG + h_a
+    x1_b = g.right - w_b
+    y1_b = g.y_KG + h_a
+    x2_b = g.right
+    y2_b = g.y_KG + h_a + h_b
+    overflow = 0.0 + _below(g, y2_a, w_a)
+    overflow = overflow + _below(g, y2_b, w_b)
+    overflow = overflow + _highlight_overlap(g, x1_a, y1_a, x2_a, w_a, h_a, g.h_highlight)
+    overflow = overflow + _highlight_overlap(g, x1_b, y1_b, x2_b, w_b, h_b, g.h_highlight - (y1_b - g.y_KG))
+    return (x1_a, y1_a, x2_a, y2_a), (x1_b, y1_b, x2_b, y2_b), overflow
+
+
+def combination_4(g, w_a, h_a, w_b, h_b, clamp_b=False, image_overlap=False):
+    """
+    Icon below the Highlight on the left, Visualization bottom-right.
+    clamp_b charges the Visualization for crossing the KG's left/top edges instead of its bottom edge,
+    image_overlap additionally charges for the Icon overlapping the Visualization.
+    """
+    x1_a = g.kg_x
+    y1_a = g.highlight_bottom
+    x2_a = g.kg_x + w_a
+    y2_a = g.highlight_bottom + h_a
+    x1_b = g.right - w_b
+    y1_b = g.bottom - h_b
+    x2_b = g.right
+    y2_b = g.bottom
+    overflow = 0.0 + _below(g, y2_a, w_a)
+    overflow = overflow + _right_of(g, x2_a, h_a)
+    if clamp_b:
+        overflow = overflow + np.maximum(g.kg_x - x1_b, 0.0) * h_b
+        overflow = overflow + np.maximum(g.y_KG - y1_b, 0.0) * w_b
+    else:
+        overflow = overflow + _below(g, y2_b, w_b)
+    overflow = overflow + _highlight_overlap(g, x1_b, y1_b, x2_b, w_b, h_b, g.h_highlight - (y1_b - g.y_KG))
+    if image_overlap:
+        # Icon's bottom-right corner overlaps Visualization's top-left corner
+        overlap = (np.minimum(x2_a, x2_b) - x1_b) * (np.minimum(y2_a, y2_b) - y1_b)
+        overflow = overflow + np.where((x2_a > x1_b) & (y2_a > y1_b), overlap, 0.0)
+    return (x1_a, y1_a, x2_a, y2_a), (x1_b, y1_b, x2_b, y2_b), overflow
+
+
+COMBINATIONS = (combination_1, combination_2, combination_3, combination_4)
+
+
+def placement_a(g, w, h):
+    """Image in the top-right corner."""
+    x1 = g.right - w
+    y1 = g.y_KG
+    x2 = g.right
+    y2 = g.y_KG + h
+    overlap = np.where(x2 > g.highlight_right, (np.minimum(x2, g.highlight_right) - x1) * h, w * h)
+    overflow = 0.0 + _below(g, y2, w)
+    overflow = overflow + np.where(x1 < g.highlight_right, overlap, 0.0)
+    return (x1, y1, x2, y2), overflow
+
+
+def placement_b(g, w, h):
+    """Image below the Highlight on the left."""
+    x1 = g.kg_x
+    y1 = g.highlight_bottom
+    x2 = g.kg_x + w
+    y2 = g.highlight_bottom + h
+    overflow = 0.0 + _below(g, y2, w)
+    overflow = overflow + _right_of(g, x2, h)
+    return (x1, y1, x2, y2), overflow
+
+
+PLACEMENTS = (placement_a, placement_b)
+
+
+def _pick(value, index):
+    """Element of value at index, where value is a scalar or an array broadcastable to the candidate grid."""
+    if not isinstance(value, np.ndarray):
+        return float(value)
+    return value.item(tuple(i if n > 1 else 0 for i, n in zip(index, value.shape)))
+
+
+def _corners(box, index):
+    """Corner points of the candidate at index, from (x1, y1, x2, y2)."""
+    x1, y1, x2, y2 = (_pick(value, index) for value in box)
+    return [[x1, y1], [x2, y1], [x1, y2], [x2, y2]]
+
+
+def _scalar_placement_a(g, w, h):
+    """placement_a for a single candidate with plain floats: (coords, overflow)."""
+    x1 = g.right - w
+    y1 = g.y_KG
+    x2 = g.right
+    y2 = g.y_KG + h
+    overflow = 0.0
+    if y2 > g.bottom:
+        overflow = overflow + (y2 - g.bottom) * w
+    if x1 < g.highlight_right:
+        overflow = overflow + ((min(x2, g.highlight_right) - x1) * h if x2 > g.highlight_right else w * h)
+    return [[x1, y1], [x2, y1], [x1, y2], [x2, y2]], overflow
+
+
+def _scalar_placement_b(g, w, h):
+    """placement_b for a single candidate with plain floats: (coords, overflow)."""
+    x1 = g.kg_x
+    y1 = g.highlight_bottom
+    x2 = g.kg_x + w
+    y2 = g.highlight_bottom + h
+    overflow = 0.0
+    if y2 > g.bottom:
+        overflow = overflow + (y2 - g.bottom) * w
+    if x2 > g.right:
+        overflow = overflow + (x2 - g.right) * h
+    return [[x1, y1], [x2, y1], [x1, y2], [x2, y2]], overflow
+
+
+# With only 2 x 15 candidates a plain loop is faster than NumPy's per-call overhead
+_SCALAR_PLACEMENTS = {placement_a: _scalar_placement_a, placement_b: _scalar_placement_b}
+
+
+def enumerate_single_placement(A_img, g, placements=PLACEMENTS):
+    """
+    Searches all placements x ASPECT_RATIOS for one image, candidate by candidate.
+    The first candidate without overflow wins, otherwise the first candidate with the smallest overflow.
+    Args:
+        A_img: Image area.
+        g: KGBox.
+        placements: Placement scoring functions in search order.
+    Returns:
+        (coords, r, placement_idx, overflow); overflow is 0 for a fitting candidate.
+    """
+    best = None
+    for idx, placement in enumerate(placements):
+        place = _SCALAR_PLACEMENTS[placement]
+        for r in ASPECT_RATIOS:
+            coords, overflow = place(g, sqrt(A_img * r), sqrt(A_img / r))
+            if overflow == 0:
+                return coords, r, idx, 0
+            if best is None or overflow < best[3]:
+                best = (coords, r, idx, overflow)
+    return best
+
+
+def enumerate_pair_placement(A_icon, A_vis, g, combinations=COMBINATIONS):
+    """
+    Searches all combinations x ASPECT_RATIOS x ASPECT_RATIOS for Icon and Visualization with one NumPy
+    broadcast per combination, with the same first-fit / minimum-overflow choice as enumerate_single_placement.
+    Args:
+        A_icon: Icon area.
+        A_vis: Visualization area.
+        g: KGBox.
+        combinations: Combination scoring functions in search order.
+    Returns:
+        (coords_a, coords_b, r_a, r_b, comb_idx, overflow); overflow is 0 for a fitting candidate.
+    """
+    w_a = np.sqrt(A_icon * _RATIOS_A)
+    h_a = np.sqrt(A_icon / _RATIOS_A)
+    w_b = np.sqrt(A_vis * _RATIOS_B)
+    h_b = np.sqrt(A_vis / _RATIOS_B)
+    best = None
+    for idx, combination in enumerate(combinations):
+        box_a, box_b, overflow = combination(g, w_a, h_a, w_b, h_b)
+        overflow = np.broadcast_to(overflow, (len(_RATIOS), len(_RATIOS)))
+        fits = overflow == 0
+        if fits.any():
+            index = np.unravel_index(int(fits.argmax()), overflow.shape)
+            overflow_value = 0
+        else:
+            index = np.unravel_index(int(overflow.argmin()), overflow.shape)
+            overflow_value = float(overflow[index])
+            if best is not None and not overflow_value < best[5]:
+                continue
+        result = (_corners(box_a, index), _corners(box_b, index),
+                  ASPECT_RATIOS[index[0]], ASPECT_RATIOS[index[1]], idx, overflow_value)
+        if overflow_value == 0:
+            return result
+        best = result
+    return best
+
+
+# Variants used by individual layout engines
+combination_2_no_image_overlap = partial(combination_2, image_overlap=False)
+combination_4_clamped = partial(combination_4, clamp_b=True)
+combination_4_clamped_image_overlap = partial(combination_4, clamp_b=True, image_overlap=True)
+
+
+# Placement modes, selected per call with use_placement:
+#   enumerate: search ASPECT_RATIOS exhaustively (the original behaviour)
+#   analytic:  solve the fit constraints in closed form for the aspect ratio closest to square;
+#              when nothing fits, shrink the images to the largest box that fits, also in closed form,
+#              instead of enumerating and resizing the minimum-overflow candidate
+PLACEMENT_ENUMERATE = "enumerate"
+PLACEMENT_ANALYTIC = "analytic"
+PLACEMENT_MODES = (PLACEMENT_ENUMERATE, PLACEMENT_ANALYTIC)
+
+_active_mode: ContextVar[str] = ContextVar("placement_mode", default=PLACEMENT_ENUMERATE)
+
+
+@contextmanager
+def use_placement(mode=PLACEMENT_ENUMERATE):
+    """Places images with the given mode (one of PLACEMENT_MODES) inside the block."""
+    if mode not in PLACEMENT_MODES:
+        raise ValueError(f"Unknown placement mode: {mode}")
+    token = _active_mode.set(mode)
+    try:
+        yield
+    finally:
+        _active_mode.reset(token)
+
+
+# Analytic placement.
+# Each placement / combination is described by its fit constraints: overflow is zero exactly when the
+# image boxes satisfy a set of rectangle inequalities. With the area fixed, every bound on one image's
+# width or height is an interval of its aspect ratio r (w = sqrt(A * r), h = sqrt(A / r)); images that
+# share a row or column add one coupled constraint on the sum of their widths or heights. Constraints of
+# the form "either clear the Highlight horizontally or vertically" become alternative branches.
+# Ratios are limited to the range of ASPECT_RATIOS, and interval ends are pulled in by _SLACK so that
+# rounding in sqrt never turns a boundary solution into a tiny overflow.
+_R_MIN = min(ASPECT_RATIOS)
+_R_MAX = max(ASPECT_RATIOS)
+_SLACK = 1e-9
+
+
+class _Fit:
+    """Size limits of one image; None when the limits leave no aspect ratio."""
+
+    def __init__(self, A, w_max=inf, h_max=inf, w_min=0.0, h_min=0.0):
+        self.A = A
+        self.w_max = w_max
+        self.h_max = h_max
+        self.w_min = w_min
+        self.h_min = h_min
+
+    def tighten(self, **limits):
+        fit = _Fit(self.A, self.w_max, self.h_max, self.w_min, self.h_min)
+        for name, value in limits.items():
+            bound = min if name.endswith("max") else max
+            setattr(fit, name, bound(getattr(fit, name), value))
+        return fit
+
+    def ratios(self):
+        """Interval (lo, hi) of feasible aspect ratios, or None."""
+        # x * x rather than x ** 2: pow() is not correctly rounded, and the layout cache relies on the result
+        # scaling exactly with the canvas for power-of-two factors
+        A = self.A
+        lo = max(_R_MIN, self.w_min * self.w_min / A, A / (self.h_max * self.h_max) if self.h_max > 0 else inf)
+        hi = min(_R_MAX, self.w_max * self.w_max / A if self.w_max > 0 else -inf,
+                 A / (self.h_min * self.h_min) if self.h_min > 0 else inf)
+        lo, hi = lo * (1 + _SLACK), hi * (1 - _SLACK)
+        return (lo, hi) if lo <= hi else None
+
+
+def _square(interval):
+    """Ratio closest to 1 inside the interval."""
+    lo, hi = interval
+    return min(max(1.0, lo), hi)
+
+
+def _solve_coupled(fits, intervals, axis, limit):
+    """
+    Ratios for images whose widths (axis "w") or heights (axis "h") must sum to at most limit.
+    Starts from the squarest ratios and, if they are too large together, moves every image the same
+    fraction of the way towards its narrowest (or flattest) ratio.
+    """
+    def size(fit, r):
+        return sqrt(fit.A * r) if axis == "w" else sqrt(fit.A / r)
+
+    preferred = [_square(interval) for interval in intervals]
+    sizes = [size(fit, r) for fit, r in zip(fits, preferred)]
+    limit *= 1 - _SLACK
+    if sum(sizes) <= limit:
+        return preferred
+    smallest = [size(fit, lo if axis == "w" else hi) for fit, (lo, hi) in zip(fits, intervals)]
+    if sum(smallest) > limit:
+        return None
+    t = (sum(sizes) - limit) / (sum(sizes) - sum(smallest))
+    ratios = []
+    for fit, (lo, hi), s, s_min in zip(fits, intervals, sizes, smallest):
+        s = s - t * (s - s_min)
+        r = s * s / fit.A if axis == "w" else fit.A / (s * s)
+        ratios.append(min(max(r, lo), hi))
+    return ratios
+
+
+def _solve_branch(fits, coupled=None):
+    """Aspect ratios satisfying one branch, or None. coupled is (axis, limit) or None."""
+    intervals = [fit.ratios() for fit in fits]
+    if None in intervals:
+        return None
+    if coupled is None:
+        return [_square(interval) for interval in intervals]
+    return _solve_coupled(fits, intervals, *coupled)
+
+
+def _top_width(g):
+    """Width available to images in the top row right of the Highlight (the whole row when there is none)."""
+    return g.kg_width - g.w_highlight if g.h_highlight > 0 else g.kg_width
+
+
+def _limits_a(g):
+    """(w_max, h_max) of an image in placement a."""
+    return g.kg_width - g.w_highlight, g.h_KG
+
+
+def _limits_b(g):
+    """(w_max, h_max) of an image in placement b."""
+    return g.kg_width, g.h_KG - g.h_highlight
+
+
+def _branches_a(g, A):
+    w_max, h_max = _limits_a(g)
+    return [([_Fit(A, w_max=w_max, h_max=h_max)], None)]
+
+
+def _branches_b(g, A):
+    w_max, h_max = _limits_b(g)
+    return [([_Fit(A, w_max=w_max, h_max=h_max)], None)]
+
+
+def _branches_1(g, A_a, A_b):
+    a = _Fit(A_a, w_max=_top_width(g), h_max=g.h_KG)
+    b = _Fit(A_b, h_max=g.h_KG)
+    return [([a, b], ("w", _top_width(g)))]
+
+
+def _branches_2(g, A_a, A_b, image_overlap=True):
+    a = _Fit(A_a, w_max=_top_width(g), h_max=g.h_KG)
+    b = _Fit(A_b, w_max=g.kg_width, h_max=g.h_KG - g.h_highlight)
+    if not image_overlap:
+        return [([a, b], None)]
+    # The Visualization clears the Icon if the Icon ends above it, or if they fit side by side
+    return [([a.tighten(h_max=g.h_highlight), b], None), ([a, b], ("w", g.kg_width))]
+
+
+def _branches_3(g, A_a, A_b):
+    a = _Fit(A_a, w_max=_top_width(g))
+    b = _Fit(A_b, w_max=g.kg_width)
+    # The Visualization clears the Highlight horizontally, or starts below it
+    return [([a, b.tighten(w_max=g.kg_width - g.w_highlight)], ("h", g.h_KG)),
+            ([a.tighten(h_min=g.h_highlight), b], ("h", g.h_KG))]
+
+
+def _branches_4(g, A_a, A_b, clamp_b=False, image_overlap=False):
+    a = _Fit(A_a, w_max=g.kg_width, h_max=g.h_KG - g.h_highlight)
+    b = _Fit(A_b, w_max=g.kg_width, h_max=g.h_KG)
+    # The Visualization clears the Highlight horizontally, or starts below it
+    highlight = [b.tighten(w_max=g.kg_width - g.w_highlight), b.tighten(h_max=g.h_KG - g.h_highlight)]
+    if not image_overlap:
+        return [([a, b_fit], None) for b_fit in highlight]
+    # The Icon clears the Visualization if they fit side by side, or one above the other
+    return [([a, b_fit], coupled) for b_fit in highlight
+            for coupled in (("w", g.kg_width), ("h", g.h_KG - g.h_highlight))]
+
+
+# A single image only has to stay inside one box, so its placements are solved from these limits directly
+_SINGLE_LIMITS = {placement_a: _limits_a, placement_b: _limits_b}
+
+_BRANCHES = {
+    placement_a: _branches_a, placement_b: _branches_b,
+    combination_1: _branches_1, combination_2: _branches_2,
+    combination_3: _branches_3, combination_4: _branches_4,
+}
+
+
+def _branches(scorer, g, *areas):
+    """Fit branches of a scoring function or of a functools.partial variant of one."""
+    options = getattr(scorer, "keywords", {})
+    return _BRANCHES[getattr(scorer, "func", scorer)](g, *areas, **options)
+
+
+def _has_room(g, *areas):
+    """
+    False when some image cannot fit the KG at any allowed aspect ratio. Every branch bounds each image by
+    the KG's width and height or tighter, so this decides most no-fit cases without solving the branches.
+    """
+    return all(_Fit(A, w_max=g.kg_width, h_max=g.h_KG).ratios() is not None for A in areas)
+
+
+def analytic_single_placement(A_img, g, placements=PLACEMENTS):
+    """
+    Places one image with the aspect ratio closest to square that fits, trying placements in order.
+    Each candidate is checked with the placement's own scoring function.
+    Returns:
+        (coords, r, placement_idx, 0) like enumerate_single_placement, or None when nothing fits.
+    """
+    for idx, placement in enumerate(placements):
+        w_max, h_max = _SINGLE_LIMITS[placement](g)
+        interval = _Fit(A_img, w_max=w_max, h_max=h_max).ratios()
+        if interval is None:
+            continue
+        r = _square(interval)
+        coords, overflow = _SCALAR_PLACEMENTS[placement](g, sqrt(A_img * r), sqrt(A_img / r))
+        if overflow == 0:
+            return coords, r, idx, 0
+    return None
+
+
+def analytic_pair_placement(A_icon, A_vis, g, combinations=COMBINATIONS):
+    """
+    Places Icon and Visualization with the first combination whose fit constraints can be met,
+    using the aspect ratios closest to square. Each candidate is checked with the combination's own
+    scoring function.
+    Returns:
+        (coords_a, coords_b, r_a, r_b, comb_idx, 0) like enumerate_pair_placement, or None when nothing fits.
+    """
+    if not _has_room(g, A_icon, A_vis):
+        return None
+    for idx, combination in enumerate(combinations):
+        for fits, coupled in _branches(combination, g, A_icon, A_vis):
+            ratios = _solve_branch(fits, coupled)
+            if ratios is None:
+                continue
+            r_a, r_b = ratios
+            box_a, box_b, overflow = combination(g, sqrt(A_icon * r_a), sqrt(A_icon / r_a),
+                                                 sqrt(A_vis * r_b), sqrt(A_vis / r_b))
+            if overflow == 0:
+                return _corners(box_a, ()), _corners(box_b, ()), r_a, r_b, idx, 0
+    return None
+
+
+# Largest feasible box.
+# When nothing fits at the requested areas, every image of a branch is scaled by a common factor s (areas by
+# s * s) and the largest s that satisfies the branch is found in closed form. At scale s an image's width is
+# bounded below and above by terms c * s**k: the ratio range gives k = 1, fixed widths k = 0, and height
+# limits k = 2 (w = s * s * A / h). Each lower term must stay below each upper term, which bounds s directly,
+# and a coupled row or column needs the sum of the lower bounds to stay within its limit, a piecewise
+# quadratic in s. The branch is then solved at that scale like a fitting one.
+_SHRINK_MARGIN = 1e-6
+
+
+def _term(c, k, s):
+    return c if k == 0 else c * s if k == 1 else c * s * s
+
+
+def _root(x, n):
+    return x if n == 1 else sqrt(x)
+
+
+def _width_terms(fit):
+    """Lower and upper bounds on the width of a scaled image, as (coefficient, power of s) terms."""
+    A = fit.A
+    lower = [(sqrt(A * _R_MIN), 1)]
+    upper = [(sqrt(A * _R_MAX), 1)]
+    if fit.w_min > 0:
+        lower.append((fit.w_min, 0))
+    if fit.h_max < inf:
+        lower.append((A / fit.h_max, 2))
+    if fit.w_max < inf:
+        upper.append((fit.w_max, 0))
+    if fit.h_min > 0:
+        upper.append((A / fit.h_min, 2))
+    return lower, upper
+
+
+def _min_height_terms(fit):
+    """Lower bound on the height of a scaled image, as (coefficient, power of s) terms."""
+    A = fit.A
+    lower = [(sqrt(A / _R_MAX), 1)]
+    if fit.h_min > 0:
+        lower.append((fit.h_min, 0))
+    if fit.w_max < inf:
+        lower.append((A / fit.w_max, 2))
+    return lower
+
+
+def _scale_bounds(lower, upper):
+    """Interval (lo, hi) of scales where every lower term stays below every upper term, or None."""
+    lo, hi = 0.0, inf
+    for c_l, k_l in lower:
+        for c_u, k_u in upper:
+            if k_l > k_u:
+                hi = min(hi, _root(c_u / c_l, k_l - k_u))
+            elif k_l < k_u:
+                lo = max(lo, _root(c_l / c_u, k_u - k_l))
+            elif c_l > c_u:
+                return None
+    return lo, hi
+
+
+def _sum_scale(terms, limit):
+    """Largest scale at which the images' lower bounds (max of their terms) sum to at most limit, or None."""
+    def total(s):
+        return sum(max(_term(c, k, s) for c, k in image) for image in terms)
+
+    if total(0.0) > limit:
+        return None
+    # Scales where an image's largest term changes; between them the sum is a fixed quadratic
+    breaks = sorted({_root(c_1 / c_2, k_2 - k_1) for image in terms
+                     for c_1, k_1 in image for c_2, k_2 in image if k_1 < k_2})
+    prev = 0.0
+    for end in breaks + [inf]:
+        if end < inf and total(end) <= limit:
+            prev = end
+            continue
+        inside = prev * 2 + 1 if end == inf else (prev + end) / 2
+        coefficients = [0.0, 0.0, 0.0]
+        for image in terms:
+            c, k = max(image, key=lambda term: _term(*term, inside))
+            coefficients[k] += c
+        c, b, a = coefficients
+        c -= limit
+        if a > 0:
+            s = (-b + sqrt(b * b - 4 * a * c)) / (2 * a)
+        elif b > 0:
+            s = -c / b
+        else:
+            s = inf
+        return min(max(s, prev), end)
+    return None
+
+
+def _largest_scale(fits, coupled=None):
+    """Largest common scale (at most 1) of the images' sizes that satisfies one branch, or None."""
+    lo, hi = 0.0, 1.0
+    for fit in fits:
+        if fit.w_max <= 0 or fit.h_max <= 0:
+            return None
+        bounds = _scale_bounds(*_width_terms(fit))
+        if bounds is None:
+            return None
+        lo, hi = max(lo, bounds[0]), min(hi, bounds[1])
+    if coupled is not None:
+        axis, limit = coupled
+        terms = [_width_terms(fit)[0] if axis == "w" else _min_height_terms(fit) for fit in fits]
+        s = _sum_scale(terms, limit * (1 - _SLACK))
+        if s is None:
+            return None
+        hi = min(hi, s)
+    hi *= 1 - _SHRINK_MARGIN
+    return hi if 0 < hi and lo <= hi else None
+
+
+def _shrunk_candidates(branches):
+    """
+    (scale, index, scaled areas, ratios) of every solvable shrunk branch, largest scale first and in search
+    order among equal scales.
+    """
+    candidates = []
+    for idx, (fits, coupled) in branches:
+        s = _largest_scale(fits, coupled)
+        if s is None:
+            continue
+        scaled = [_Fit(fit.A * s * s, fit.w_max, fit.h_max, fit.w_min, fit.h_min) for fit in fits]
+        ratios = _solve_branch(scaled, coupled)
+        if ratios is not None:
+            candidates.append((s, idx, [fit.A for fit in scaled], ratios))
+    candidates.sort(key=lambda candidate: -candidate[0])
+    return candidates
+
+
+def _single_scale(A, w_max, h_max):
+    """_largest_scale of a single image bounded by w_max x h_max, written out."""
+    if w_max <= 0 or h_max <= 0:
+        return None
+    s = min(1.0, w_max / sqrt(A * _R_MIN), sqrt(A * _R_MAX) / (A / h_max), sqrt(w_max / (A / h_max)))
+    return s * (1 - _SHRINK_MARGIN)
+
+
+def largest_single_placement(A_img, g, placements=PLACEMENTS):
+    """
+    Shrinks an image that fits nowhere to the largest box that fits, over all placements.
+    Returns:
+        (coords, r, placement_idx, 0) like enumerate_single_placement, or None when no box fits at all.
+    """
+    candidates = []
+    for idx, placement in enumerate(placements):
+        w_max, h_max = _SINGLE_LIMITS[placement](g)
+        s = _single_scale(A_img, w_max, h_max)
+        if s is not None:
+            candidates.append((s, idx, w_max, h_max))
+    candidates.sort(key=lambda candidate: -candidate[0])
+    for s, idx, w_max, h_max in candidates:
+        A = A_img * s * s
+        interval = _Fit(A, w_max=w_max, h_max=h_max).ratios()
+        if interval is None:
+            continue
+        r = _square(interval)
+        coords, overflow = _SCALAR_PLACEMENTS[placements[idx]](g, sqrt(A * r), sqrt(A / r))
+        if overflow == 0:
+            return coords, r, idx, 0
+    return None
+
+
+def largest_pair_placement(A_icon, A_vis, g, combinations=COMBINATIONS):
+    """
+    Shrinks Icon and Visualization that fit nowhere by a common factor to the largest pair of boxes that
+    fits, over all combinations.
+    Returns:
+        (coords_a, coords_b, r_a, r_b, comb_idx, 0) like enumerate_pair_placement, or None when nothing fits.
+    """
+    branches = [(idx, branch) for idx, combination in enumerate(combinations)
+                for branch in _branches(combination, g, A_icon, A_vis)]
+    for _, idx, (A_a, A_b), (r_a, r_b) in _shrunk_candidates(branches):
+        box_a, box_b, overflow = combinations[idx](g, sqrt(A_a * r_a), sqrt(A_a / r_a),
+                                                   sqrt(A_b * r_b), sqrt(A_b / r_b))
+        if overflow == 0:
+            return _corners(box_a, ()), _corners(box_b, ()), r_a, r_b, idx, 0
+    return None
+
+
+def best_single_placement(A_img, g, placements=PLACEMENTS):
+    """Single-image placement with the active mode (see use_placement)."""
+    if _active_mode.get() == PLACEMENT_ANALYTIC:
+        result = analytic_single_placement(A_img, g, placements) or largest_single_placement(A_img, g, placements)
+        if result is not None:
+            return result
+    return enumerate_single_placement(A_img, g, placements)
+
+
+def best_pair_placement(A_icon, A_vis, g, combinations=COMBINATIONS):
+    """Icon and Visualization placement with the active mode (see use_placement)."""
+    if _active_mode.get() == PLACEMENT_ANALYTIC:
+        result = (analytic_pair_placement(A_icon, A_vis, g, combinations)
+                  or largest_pair_placement(A_icon, A_vis, g, combinations))
+        if result is not None:
+            return result
+    return enumerate_pair_placement(A_icon, A_vis, g, combinations)
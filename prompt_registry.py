@@ -0,0 +1,82 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Optional
+
+PROMPT_DIR = "prompts"
+
+
+class PromptRegistry:
+    """
+    启动时一次性加载 prompts/*.md 到内存，并为每个提示词计算内容哈希。
+    读取时最多每 check_interval 秒检查一次文件 mtime，只有 mtime 变化时才重新读盘。
+    """
+
+    def __init__(self, prompt_dir: str = PROMPT_DIR, check_interval: float = 1.0):
+        self.prompt_dir = prompt_dir
+        self.check_interval = check_interval
+        # 路径 -> (mtime_ns, 内容, sha256, 上次检查时间)
+        self._entries: dict[str, tuple[int, str, str, float]] = {}
+        self._lock = threading.Lock()
+        self.load_all()
+
+    def load_all(self):
+        for name in sorted(os.listdir(self.prompt_dir)):
+            if name.endswith(".md"):
+                self._load(os.path.normpath(os.path.join(self.prompt_dir, name)))
+
+    def _load(self, path: str) -> tuple[int, str, str, float]:
+        mtime_ns = os.stat(path).st_mtime_ns
+        with open(path, "r", encoding="utf-8") as file:
+            text = file.read()
+        entry = (mtime_ns, text, hashlib.sha256(text.encode("utf-8")).hexdigest(), time.monotonic())
+        with self._lock:
+            self._entries[path] = entry
+        return entry
+
+    def _entry(self, path: str) -> tuple[int, str, str, float]:
+        path = os.path.normpath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is None:
+            return self._load(path)
+        now = time.monotonic()
+        if now - entry[3] < self.check_interval:
+            return entry
+        if os.stat(path).st_mtime_ns != entry[0]:
+            return self._load(path)
+        entry = (entry[0], entry[1], entry[2], now)
+        with self._lock:
+            self._entries[path] = entry
+        return entry
+
+    def read(self, path: str) -> str:
+        """按路径读取提示词，如 prompts/generate_title.md。"""
+        return self._entry(path)[1]
+
+    def content_hash(self, path: str) -> str:
+        return self._entry(path)[2]
+
+    def version(self) -> str:
+        """prompt_dir 下所有提示词的整体哈希，任一提示词改动都会变化，可用于缓存键。"""
+        prefix = os.path.normpath(self.prompt_dir) + os.sep
+        with self._lock:
+            paths = sorted(path for path in self._entries if path.startswith(prefix))
+        digest = hashlib.sha256()
+        for path in paths:
+            digest.update(os.path.basename(path).encode("utf-8"))
+            digest.update(self.content_hash(path).encode("ascii"))
+        return digest.hexdigest()
+
+
+_default_registry: Optional[PromptRegistry] = None
+_default_lock = threading.Lock()
+
+
+def default_prompt_registry() -> PromptRegistry:
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = PromptRegistry()
+        return _default_registry
@@ -0,0 +1,194 @@
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from collections import Counter, OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from chunking import estimate_tokens, split_token_windows
+
+RETRIEVAL_PASSAGE_TOKENS = int(os.getenv("RETRIEVAL_PASSAGE_TOKENS", 256))  # 每个段落的 token 上限
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", 6000))  # 送入子任务拆解的 token 预算
+
+# 英文/数字按词切分，中日韩文字按单字切分
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_CJK_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]")
+
+
+def tokenize(text: str) -> List[str]:
+    terms = []
+    for word in _TOKEN_RE.findall(text.casefold()):
+        if _CJK_RE.search(word):
+            # 混合串中的非 CJK 部分仍按词保留
+            terms.extend(part for part in _CJK_RE.split(word) if part)
+            terms.extend(_CJK_RE.findall(word))
+        else:
+            terms.append(word)
+    return terms
+
+
+class BM25Index:
+    """
+    基于 NumPy 的 BM25 倒排索引。段落为 pdf_text 的连续切片（无重叠），
+    按列压缩存储：term_ptr[t]:term_ptr[t+1] 为词 t 的倒排区间，doc_ids / tfs 为对应的段落下标和词频。
+    """
+
+    def __init__(self, vocab: List[str], term_ptr: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray,
+                 doc_len: np.ndarray, offsets: np.ndarray, k1: float = 1.5, b: float = 0.75):
+        self.vocab = vocab
+        self.term_index = {term: i for i, term in enumerate(vocab)}
+        self.term_ptr = term_ptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.offsets = offsets  # 段落在原文中的字符偏移，长度为段落数 + 1
+        self.k1 = k1
+        self.b = b
+        n = len(doc_len)
+        df = np.diff(term_ptr)
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = doc_len.mean() if n else 1.0
+        # 每个段落的长度归一化项，查询时直接复用
+        self.norm = (k1 * (1 - b + b * doc_len / max(avgdl, 1e-9))).astype(np.float32)
+
+    @classmethod
+    def build(cls, text: str, passage_tokens: int = RETRIEVAL_PASSAGE_TOKENS) -> "BM25Index":
+        passages = split_token_windows(text, passage_tokens, 0)
+        offsets = np.zeros(len(passages) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(passage) for passage in passages])
+
+        postings: dict[str, list[tuple[int, int]]] = {}
+        doc_len = np.zeros(len(passages), dtype=np.float32)
+        for doc_id, passage in enumerate(passages):
+            counts = Counter(tokenize(passage))
+            doc_len[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        vocab = sorted(postings)
+        term_ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        term_ptr[1:] = np.cumsum([len(postings[term]) for term in vocab])
+        pairs = np.array([pair for term in vocab for pair in postings[term]], dtype=np.int64).reshape(-1, 2)
+        return cls(vocab, term_ptr, pairs[:, 0].astype(np.int32), pairs[:, 1].astype(np.float32), doc_len, offsets)
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term, qtf in Counter(tokenize(query)).items():
+            t = self.term_index.get(term)
+            if t is None:
+                continue
+            start, end = self.term_ptr[t], self.term_ptr[t + 1]
+            docs, tf = self.doc_ids[start:end], self.tfs[start:end]
+            # 每个段落在倒排区间内最多出现一次，可以直接按下标累加
+            scores[docs] += qtf * self.idf[t] * tf * (self.k1 + 1) / (tf + self.norm[docs])
+        return scores
+
+    def passage(self, text: str, i: int) -> str:
+        return text[self.offsets[i]:self.offsets[i + 1]]
+
+    def select(self, text: str, query: str, token_budget: int = RETRIEVAL_TOKEN_BUDGET) -> str:
+        """
+        按 BM25 得分从高到低选取与查询相关的段落，直到用完 token 预算，再按原文顺序拼接返回。
+        查询与文档没有共同词时按原文顺序截取开头部分。
+        """
+        scores = self.scores(query)
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) == 0:
+            candidates = np.arange(len(self))
+        # 得分降序，同分时保持原文顺序
+        order = candidates[np.lexsort((candidates, -scores[candidates]))]
+        chosen, used = [], 0
+        for i in order:
+            tokens = estimate_tokens(self.passage(text, i))
+            # 第一个段落就超出预算时至少保留它
+            if chosen and used + tokens > token_budget:
+                continue
+            chosen.append(int(i))
+            used += tokens
+        chosen.sort()
+        return "".join(self.passage(text, i) for i in chosen)
+
+    def save(self, path: str):
+        directory = os.path.dirname(path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npz.part")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                np.savez(
+                    file, vocab=np.array(self.vocab, dtype=str), term_ptr=self.term_ptr, doc_ids=self.doc_ids,
+                    tfs=self.tfs, doc_len=self.doc_len, offsets=self.offsets,
+                    params=np.array([self.k1, self.b]),
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as data:
+            k1, b = data["params"]
+            return cls(
+                data["vocab"].tolist(), data["term_ptr"], data["doc_ids"], data["tfs"],
+                data["doc_len"], data["offsets"], k1=float(k1), b=float(b),
+            )
+
+
+class RetrievalIndexCache:
+    """按 (文档哈希, 提取后端) 缓存 BM25 索引：进程内 LRU + CACHE_DIR/retrieval 下的 npz 文件。"""
+
+    def __init__(self, cache_dir: str, memory_items: int = 32):
+        self.cache_dir = cache_dir
+        self.memory_items = memory_items
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, BM25Index] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: str, text: str) -> BM25Index:
+        with self._lock:
+            index = self._memory.get(key)
+            if index is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return index
+        path = os.path.join(self.cache_dir, f"{key}.npz")
+        try:
+            index = BM25Index.load(path)
+            hit = True
+        except (FileNotFoundError, EOFError, ValueError, KeyError, zipfile.BadZipFile):
+            # 文件缺失、被截断或内容损坏都视为未命中，重建后覆盖写入
+            index = BM25Index.build(text)
+            index.save(path)
+            hit = False
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._memory[key] = index
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+        return index
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self._memory)}
+
+
+_default_cache: Optional[RetrievalIndexCache] = None
+_default_lock = threading.Lock()
+
+
+def default_retrieval_cache() -> RetrievalIndexCache:
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = RetrievalIndexCache(os.path.join(os.getenv("CACHE_DIR", "cache"), "retrieval"))
+        return _default_cache
@@ -0,0 +1,136 @@
+import mmap
+import os
+import tempfile
+import threading
+from array import array
+from typing import Optional
+
+from chunking import estimate_tokens_utf8
+from pdf_extract import extract_pages, get_backend
+
+
+class MappedText:
+    """
+    以只读 mmap 方式打开的提取文本。文件内容由操作系统页缓存共享，
+    多个 worker 进程读取同一文档时不会各自复制一份；按页读取时只解码对应的字节区间。
+    """
+
+    def __init__(self, text_path: str, offsets: array):
+        self.path = text_path
+        self.offsets = offsets  # 各页在文件中的起始字节偏移，末尾追加文件总长度
+        with open(text_path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            # 空文件不能 mmap
+            self._mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def buffer(self, start: int = 0, stop: Optional[int] = None) -> memoryview:
+        """第 start 到 stop（不含）页的原始 UTF-8 字节，零拷贝视图；默认为全文。"""
+        if self._mm is None:
+            return memoryview(b"")
+        stop = len(self) if stop is None else stop
+        return memoryview(self._mm)[self.offsets[start]:self.offsets[stop]]
+
+    def page_bytes(self, index: int) -> memoryview:
+        """第 index 页的原始 UTF-8 字节，零拷贝视图。"""
+        return self.buffer(index, index + 1)
+
+    def text(self, start: int = 0, stop: Optional[int] = None) -> str:
+        """第 start 到 stop（不含）页的文本，默认为全文（各页按顺序直接拼接）。直接从映射区解码，不经过中间的 bytes 拷贝。"""
+        with self.buffer(start, stop) as view:
+            return str(view, "utf-8")
+
+    def page(self, index: int) -> str:
+        return self.text(index, index + 1)
+
+    def estimate_tokens(self, start: int = 0, stop: Optional[int] = None) -> int:
+        """与 chunking.estimate_tokens(self.text(start, stop)) 相同，但直接在映射的字节上计数，不解码。"""
+        with self.buffer(start, stop) as view:
+            return estimate_tokens_utf8(view)
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+class TextCache:
+    """
+    提取文本的磁盘缓存，按 (PDF 内容哈希, 提取后端) 命名：
+    <key>.txt 为各页文本的 UTF-8 拼接，<key>.offsets 为各页的字节偏移（uint64）。
+    offsets 文件最后写入，存在即表示该条缓存完整。
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _paths(self, doc_id: str, backend: str) -> tuple[str, str]:
+        base = os.path.join(self.cache_dir, f"{doc_id}.{backend}")
+        return base + ".txt", base + ".offsets"
+
+    def _write_atomic(self, path: str, data: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def open(self, doc_id: str, backend: Optional[str] = None) -> Optional[MappedText]:
+        backend = get_backend(backend).name
+        text_path, offsets_path = self._paths(doc_id, backend)
+        try:
+            offsets = array("Q")
+            with open(offsets_path, "rb") as file:
+                offsets.frombytes(file.read())
+            mapped = MappedText(text_path, offsets)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return mapped
+
+    def put(self, doc_id: str, pages: list[str], backend: Optional[str] = None) -> MappedText:
+        backend = get_backend(backend).name
+        text_path, offsets_path = self._paths(doc_id, backend)
+        encoded = [page.encode("utf-8") for page in pages]
+        offsets = array("Q", [0])
+        for data in encoded:
+            offsets.append(offsets[-1] + len(data))
+        self._write_atomic(text_path, b"".join(encoded))
+        self._write_atomic(offsets_path, offsets.tobytes())
+        return MappedText(text_path, offsets)
+
+    def get_or_extract(self, pdf_path: str, doc_id: str, backend: Optional[str] = None) -> MappedText:
+        """已缓存时直接映射文件，否则提取全部页面并写入缓存。"""
+        mapped = self.open(doc_id, backend)
+        if mapped is None:
+            mapped = self.put(doc_id, extract_pages(pdf_path, backend), backend)
+        return mapped
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_default_cache: Optional[TextCache] = None
+_default_lock = threading.Lock()
+
+
+def default_text_cache() -> TextCache:
+    """进程级共享的提取文本缓存，位于 CACHE_DIR/texts。"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = TextCache(os.path.join(os.getenv("CACHE_DIR", "cache"), "texts"))
+        return _default_cache
@@ -0,0 +1,188 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import numpy as np
+
+# Width of a character relative to the font height. Characters outside the table use DEFAULT_RATIO.
+DEFAULT_RATIO = 0.7
+CHAR_RATIOS = {
+    'B': 0.5, 'E': 0.5, 'F': 0.5, 'J': 0.5, 'L': 0.5, 'P': 0.5, 'S': 0.5,
+    'A': 0.8889, 'D': 0.8889, 'H': 0.8889, 'K': 0.8889, 'N': 0.8889,
+    'R': 0.8889, 'T': 0.8889, 'U': 0.8889, 'V': 0.8889, 'X': 0.8889,
+    'Y': 0.8889, 'Z': 0.8889, 'C': 1.0, 'G': 1.0, 'O': 1.0, 'Q': 1.0,
+    'M': 1.1111, 'W': 1.1111, 'b': 0.5, 'd': 0.5, 'f': 0.5, 'h': 0.5,
+    'k': 0.5, 'l': 0.5, 't': 0.5, 'c': 1.0, 'e': 1.0, 'o': 1.0, 's': 1.0,
+    'a': 0.7, 'g': 0.7, 'n': 0.7, 'p': 0.7, 'q': 0.7, 'r': 0.7, 'u': 0.7,
+    'v': 0.7, 'w': 0.7, 'x': 0.7, 'y': 0.7, 'z': 0.7, ' ': 0.4
+}
+
+# Width ratios indexed by code point; code points past the end of the table use DEFAULT_RATIO.
+WIDTH_TABLE = np.full(128, DEFAULT_RATIO, dtype=np.float64)
+for _char, _ratio in CHAR_RATIOS.items():
+    WIDTH_TABLE[ord(_char)] = _ratio
+
+_MAX_CACHED = 16384
+
+
+def _code_points(string: str) -> np.ndarray:
+    return np.frombuffer(string.encode("utf-32-le"), dtype=np.uint32)
+
+
+def char_ratios(codes: np.ndarray, table: np.ndarray = WIDTH_TABLE, default: float = DEFAULT_RATIO) -> np.ndarray:
+    """
+    Looks up the width ratio of every code point in a single vectorized pass.
+    Args:
+        codes: Array of code points.
+        table: Width ratios indexed by code point.
+        default: Ratio for code points not covered by the table.
+    Returns:
+        Array of ratios with the same shape as codes.
+    """
+    inside = codes < len(table)
+    return np.where(inside, table[np.where(inside, codes, 0)], default)
+
+
+class WidthMetrics:
+    """
+    Width ratios (relative to the font height) indexed by code point, with optional pair kerning.
+    Per-string ratio arrays and measured widths keyed by (string, font_height) are cached, since the
+    layout engines measure the same knowledge_content / first_level_highlight strings many times.
+    """
+
+    def __init__(self, table, default, kern_keys=None, kern_values=None, name="ratios"):
+        self.table = table
+        self.default = default
+        # Sorted (left << 21 | right) code point pairs and their kerning adjustments
+        self.kern_keys = kern_keys
+        self.kern_values = kern_values
+        self.name = name
+        self._ratio_cache: dict[str, np.ndarray] = {}
+        self._width_cache: dict[tuple[str, float], float] = {}
+
+    def kerning(self, codes):
+        """Returns the summed kerning adjustment of consecutive code point pairs."""
+        if self.kern_keys is None or len(codes) < 2:
+            return 0.0
+        pairs = (codes[:-1].astype(np.int64) << 21) | codes[1:].astype(np.int64)
+        idx = np.minimum(np.searchsorted(self.kern_keys, pairs), len(self.kern_keys) - 1)
+        return float(np.where(self.kern_keys[idx] == pairs, self.kern_values[idx], 0.0).sum())
+
+    def _ratios(self, strings):
+        """Returns the ratio array of each string, looking up all uncached strings in one pass."""
+        # Results are collected in a local dict, so another thread resetting the cache in between
+        # cannot make a lookup fail; full caches are replaced rather than cleared for the same reason.
+        cache = self._ratio_cache
+        found = {}
+        for s in strings:
+            if s not in found:
+                row = cache.get(s)
+                if row is not None:
+                    found[s] = row
+        missing = [s for s in dict.fromkeys(strings) if s not in found]
+        if len(cache) + len(missing) > _MAX_CACHED:
+            cache = self._ratio_cache = dict(found)
+        if missing:
+            codes = _code_points("".join(missing))
+            ratios = char_ratios(codes, self.table, self.default)
+            bounds = np.cumsum([len(s) for s in missing])[:-1]
+            if self.kern_keys is None:
+                found.update(zip(missing, np.split(ratios, bounds)))
+            else:
+                # Fold each string's kerning into its last entry so the running sum includes it
+                for s, row, row_codes in zip(missing, np.split(ratios, bounds), np.split(codes, bounds)):
+                    if len(row):
+                        row = row.copy()
+                        row[-1] += self.kerning(row_codes)
+                    found[s] = row
+            cache.update((s, found[s]) for s in missing)
+        return [found[s] for s in strings]
+
+    def text_widths(self, strings, font_height=1.0):
+        """
+        Measures many strings at once with a single NumPy pass over a zero-padded ratio matrix.
+        Each width is a running sum in character order, identical to adding up the per-character
+        widths one by one. Results are cached for later text_width calls.
+        Args:
+            strings: Iterable of strings.
+            font_height: Font height (float).
+        Returns:
+            NumPy array with the width of each string.
+        """
+        strings = list(strings)
+        rows = self._ratios(strings)
+        width = max((len(row) for row in rows), default=0)
+        if width == 0:
+            return np.zeros(len(strings), dtype=np.float64)
+        matrix = np.zeros((len(rows), width), dtype=np.float64)
+        for i, row in enumerate(rows):
+            matrix[i, :len(row)] = row
+        # cumsum adds strictly left to right; trailing zero padding leaves the sums unchanged
+        widths = np.cumsum(matrix * font_height, axis=1)[:, -1]
+        if len(self._width_cache) + len(strings) > _MAX_CACHED:
+            self._width_cache = {}
+        self._width_cache.update(zip(((s, font_height) for s in strings), widths.tolist()))
+        return widths
+
+    def text_width(self, string, font_height):
+        key = (string, font_height)
+        width = self._width_cache.get(key)
+        if width is None:
+            ratios = self._ratio_cache.get(string)
+            if ratios is None:
+                ratios = self._ratios([string])[0]
+            width = float(np.cumsum(ratios * font_height)[-1]) if len(ratios) else 0.0
+            if len(self._width_cache) >= _MAX_CACHED:
+                self._width_cache = {}
+            self._width_cache[key] = width
+        return width
+
+
+# Hard-coded ratio table used when no font metrics are active
+RATIO_METRICS = WidthMetrics(WIDTH_TABLE, DEFAULT_RATIO)
+
+# Metrics used by text_width (body text) and highlight_width (first-level highlight) in the current context
+_active_metrics: ContextVar[tuple[WidthMetrics, WidthMetrics]] = ContextVar(
+    "active_metrics", default=(RATIO_METRICS, RATIO_METRICS)
+)
+
+
+@contextmanager
+def use_metrics(text=None, highlight=None):
+    """
+    Measures body text and highlights with the given metrics inside the block, e.g. real font metrics
+    from font_metrics.load_font_metrics. None keeps the ratio table for that role.
+    """
+    token = _active_metrics.set((text or RATIO_METRICS, highlight or RATIO_METRICS))
+    try:
+        yield
+    finally:
+        _active_metrics.reset(token)
+
+
+def text_widths(strings, font_height=1.0):
+    """Measures many body-text strings at once with the active metrics."""
+    return _active_metrics.get()[0].text_widths(strings, font_height)
+
+
+def text_width(string, font_height):
+    """
+    Calculates the rendered width of body text with the active metrics.
+    Args:
+        string: Text to measure.
+        font_height: Font height (float).
+    Returns:
+        Width of the string (float).
+    """
+    return _active_metrics.get()[0].text_width(string, font_height)
+
+
+def highlight_width(string, font_height):
+    """Calculates the rendered width of a first-level highlight with the active metrics."""
+    return _active_metrics.get()[1].text_width(string, font_height)
+
+
+def prime_knowledge_widths(VGs):
+    """Measures every knowledge_content and first_level_highlight of a layout in one vectorized pass each."""
+    text_metrics, highlight_metrics = _active_metrics.get()
+    text_metrics.text_widths([KG["knowledge_content"] for VG in VGs for KG in VG["knowledges"]])
+    highlight_metrics.text_widths([KG["first_level_highlight"] for VG in VGs for KG in VG["knowledges"]])
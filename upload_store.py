@@ -0,0 +1,88 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import BinaryIO
+
+UPLOAD_DIR = "uploads"
+CHUNK_SIZE = 1024 * 1024  # 边读边哈希的分块大小（1 MB）
+
+
+def document_path(doc_id: str, upload_dir: str = UPLOAD_DIR) -> str:
+    """
+    按内容哈希计算文档的存储路径，使用两级分片目录避免单目录文件过多：
+    uploads/ab/cd/abcd....pdf
+    """
+    return os.path.join(upload_dir, doc_id[:2], doc_id[2:4], f"{doc_id}.pdf")
+
+
+def hash_file(path: str) -> str:
+    """分块计算已有文件的 SHA-256，作为文档 ID。"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_upload(file: BinaryIO, upload_dir: str = UPLOAD_DIR) -> tuple[str, str]:
+    """
+    将上传的文件流写入内容寻址存储，写入的同时计算 SHA-256。
+    相同内容只保存一份：目标文件已存在时直接丢弃本次写入的临时文件。
+
+    参数:
+        file (BinaryIO): 上传文件的二进制流（如 UploadFile.file）
+        upload_dir (str): 存储根目录
+
+    返回:
+        tuple[str, str]: (文档 ID，即内容的 SHA-256 十六进制串, 文档存储路径)
+    """
+    os.makedirs(upload_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=upload_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                tmp.write(chunk)
+        doc_id = digest.hexdigest()
+        path = document_path(doc_id, upload_dir)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 原子替换，并发上传同一文件时最多重复写入一次，结果一致
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return doc_id, path
+
+
+def migrate_flat_uploads(upload_dir: str = UPLOAD_DIR) -> dict[str, str]:
+    """
+    将旧版 uploads/<uuid4>.pdf 平铺文件迁移到分片存储，重复内容只保留一份。
+
+    返回:
+        dict[str, str]: 旧文件名到文档 ID 的映射
+    """
+    mapping = {}
+    for name in sorted(os.listdir(upload_dir)):
+        old_path = os.path.join(upload_dir, name)
+        if not (name.endswith(".pdf") and os.path.isfile(old_path)):
+            continue
+        doc_id = hash_file(old_path)
+        path = document_path(doc_id, upload_dir)
+        if os.path.exists(path):
+            os.remove(old_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.move(old_path, path)
+        mapping[name] = doc_id
+    return mapping
+
+
+if __name__ == "__main__":
+    mapping = migrate_flat_uploads()
+    print(f"迁移了 {len(mapping)} 个文件，去重后剩余 {len(set(mapping.values()))} 个文档")
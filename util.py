@@ -1,36 +1,47 @@
 import os
 from pprint import pprint
-import openai
-import pdfplumber
 import json
-from openai import OpenAI
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
 from math import sqrt
+from llm_cache import default_llm_cache
+from pdf_extract import PDFPLUMBER, extract_pages
+
+if TYPE_CHECKING:
+    # openai 导入较慢，只在第一次创建 client 时导入
+    from openai import OpenAI
 
 load_dotenv()
 
-client = OpenAI(
-    #base_url="https://pro.aiskt.com/v1",
-    api_key=os.getenv("OPENAI_KEY")
-    #api_key=os.getenv("DEEPSEEK_KEY")
-    )
+_client = None
 
 
-def extract_text_from_pdf(pdf_path):
-    full_text = ""
+def get_client() -> "OpenAI":
+    """返回共享的 OpenAI client；服务启动时由 set_client 注入连接池 client，脚本直接使用时按需创建。"""
+    global _client
+    if _client is None:
+        from openai import OpenAI
+
+        _client = OpenAI(
+            #base_url="https://pro.aiskt.com/v1",
+            api_key=os.getenv("OPENAI_KEY")
+            #api_key=os.getenv("DEEPSEEK_KEY")
+            )
+    return _client
 
+
+def set_client(client: "OpenAI"):
+    global _client
+    _client = client
+
+
+def extract_text_from_pdf(pdf_path):
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    full_text += page_text + "\n"
+        pages = extract_pages(pdf_path, PDFPLUMBER)
     except Exception as e:
         print(f"提取PDF文字时出错: {e}")
         return None
-    return full_text
+    return "".join(page_text + "\n" for page_text in pages if page_text)
 
 # AGENT1: TASK DECOPOSITION ASSISTANT
 # Define the function to generate subtasks
@@ -50,7 +61,7 @@ def generate_title(text):
     """
 
     # Call the OpenAI API
-    completion = client.chat.completions.create(
+    completion = default_llm_cache().create(get_client(), "title",
         model="gpt-4o-mini",  # Use the appropriate model
         #model = "deepseek-chat",
         messages=[
@@ -228,7 +239,7 @@ def generate_subtasks(text, question):
     """
 
     # Call the OpenAI API
-    completion = client.chat.completions.create(
+    completion = default_llm_cache().create(get_client(), "subtasks",
         model="gpt-4o",  # Use the appropriate model
         #model = "deepseek-chat",
         messages=[
@@ -353,7 +364,7 @@ def generate_Knowledge(text):
     """
 
     # Call the OpenAI API
-    completion = client.chat.completions.create(
+    completion = default_llm_cache().create(get_client(), "knowledges",
         #model="deepseek-chat",  # Use the appropriate model
         model="gpt-4o-mini",
         messages=[
@@ -482,7 +493,7 @@ def generate_Vis(content, insight):
     """
 
     # Call the OpenAI API
-    completion = client.chat.completions.create(
+    completion = default_llm_cache().create(get_client(), "visualization",
         model="gpt-4o",
         messages=[
             {"role": "system", "content": system_prompt},
@@ -597,7 +608,6 @@ def extract_knowledge_from_parser_result(parser_result):
     return result.strip()
 
 # AGENT2 - COLOR PALATTE DESIGNER
-import openai
 import json
 
 def generate_colors(text):
@@ -660,7 +670,7 @@ def generate_colors(text):
     {text}
     """
 
-    completion = client.chat.completions.create(
+    completion = default_llm_cache().create(get_client(), "colors",
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": system_prompt},